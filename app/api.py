@@ -1,17 +1,42 @@
 import os
-import boto3
+import atexit
 import time
 import json
 import logging
-from flask import Flask, request, jsonify
+import contextlib
+import contextvars
+import io
+import queue
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, request, jsonify, url_for, stream_with_context
 from werkzeug.utils import secure_filename
 import uuid
-import mlflow
 import tempfile
+from aws_clients import LazyClient, client_config_from_env, without_retries
+from block_store import BlockStore, iter_textract_blocks, merge_page_stores
+from comprehend_batch import ComprehendChunker
+from jobs import JobManager, JobQueueFull, JOB_QUEUED
+import metrics
+from metrics import instrumented
+import near_duplicates
+from near_duplicates import NearDuplicateIndex, minhash, relocate_entities
+import ner_backends
+from ocr_store import OcrStore, combine_keywords, extraction_from_record, make_record, reprocess
+import quota
+from quota import QuotaExceeded, QuotaScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from response_format import ResponseFormat, ResponseFormatError, compress_lines, dumps
+from result_cache import ResultCache, cache_version, read_and_hash
+from skill_index import SkillIndex, QueryError
+from skill_matcher import load_skill_matcher
+import text_layer
+from text_layer import route_pages, build_page_subset, split_pages, SOURCE_TEXTRACT
+from textract_poller import TextractPoller, InMemoryNotificationChannel, SQSNotificationChannel, estimate_page_count
+from tracking import BackgroundTracker
 
 # --- Flask App Setup ---
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 # 16 MB upload limit
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024))) # 16 MB upload limit
 
 # --- AWS Configuration (Read from Environment Variables) ---
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'resume-parser-waijian-20250525')
@@ -21,27 +46,242 @@ AWS_REGION = os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-1')
 # --- MLflow Configuration --- # <--- NEW SECTION
 MLFLOW_TRACKING_URI = os.environ.get('MLFLOW_TRACKING_URI')
 MLFLOW_EXPERIMENT_NAME = "Resume_Processing_API_V1"
+# Runs are queued and written by background threads; the response never waits on MLflow
+MLFLOW_QUEUE_SIZE = int(os.environ.get('MLFLOW_QUEUE_SIZE', '1000'))
+# 'drop' (default) discards runs when the queue is full; 'block' waits up to MLFLOW_BLOCK_TIMEOUT seconds
+MLFLOW_QUEUE_FULL_POLICY = os.environ.get('MLFLOW_QUEUE_FULL_POLICY', 'drop')
+MLFLOW_BLOCK_TIMEOUT = float(os.environ.get('MLFLOW_BLOCK_TIMEOUT', '1'))
+MLFLOW_FLUSH_THREADS = int(os.environ.get('MLFLOW_FLUSH_THREADS', '2'))
+MLFLOW_SHUTDOWN_TIMEOUT = float(os.environ.get('MLFLOW_SHUTDOWN_TIMEOUT', '10'))
 
 if not S3_BUCKET_NAME or not TEXTRACT_ROLE_ARN:
     logging.error("FATAL ERROR: S3_BUCKET_NAME or TEXTRACT_ROLE_ARN environment variables not set.")
     # In a real app, you might exit or handle this more gracefully.
 
-if MLFLOW_TRACKING_URI:
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-    logging.info(f"MLflow tracking URI set to: {MLFLOW_TRACKING_URI}")
+# --- Skill Taxonomy Configuration ---
+SKILLS_CONFIG_PATH = os.environ.get(
+    'SKILLS_CONFIG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.yaml'))
 
-mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
-logging.info(f"MLflow experiment set to: {MLFLOW_EXPERIMENT_NAME}")
+# --- Async Job Configuration ---
+ASYNC_MODE_DEFAULT = os.environ.get('ASYNC_MODE_DEFAULT', 'false').lower() in ('1', 'true', 'yes')
+ASYNC_MAX_WORKERS = int(os.environ.get('ASYNC_MAX_WORKERS', '32'))
+ASYNC_MAX_PENDING = int(os.environ.get('ASYNC_MAX_PENDING', '500'))
+ASYNC_RESULT_TTL_SECONDS = int(os.environ.get('ASYNC_RESULT_TTL_SECONDS', '3600'))
+ASYNC_MAX_WAIT_SECONDS = float(os.environ.get('ASYNC_MAX_WAIT_SECONDS', '30'))
+ASYNC_STATE_DIR = os.environ.get('ASYNC_STATE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_jobs'))
+
+# --- Textract Polling Configuration ---
+TEXTRACT_POLL_MIN_DELAY = float(os.environ.get('TEXTRACT_POLL_MIN_DELAY', '1'))
+TEXTRACT_POLL_MAX_DELAY = float(os.environ.get('TEXTRACT_POLL_MAX_DELAY', '10'))
+TEXTRACT_JOB_TIMEOUT = float(os.environ.get('TEXTRACT_JOB_TIMEOUT', '300'))
+# Set both to get completion notifications (SNS topic -> SQS queue) instead of polling
+TEXTRACT_SNS_TOPIC_ARN = os.environ.get('TEXTRACT_SNS_TOPIC_ARN')
+TEXTRACT_SQS_QUEUE_URL = os.environ.get('TEXTRACT_SQS_QUEUE_URL')
+# 'sqs' (default when the vars above are set), 'memory' (local testing) or 'none'
+TEXTRACT_NOTIFICATION_MODE = os.environ.get(
+    'TEXTRACT_NOTIFICATION_MODE', 'sqs' if TEXTRACT_SNS_TOPIC_ARN and TEXTRACT_SQS_QUEUE_URL else 'none')
+
+# --- Result Cache Configuration ---
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RESULT_CACHE_MAX_ITEMS = int(os.environ.get('RESULT_CACHE_MAX_ITEMS', '256'))
+RESULT_CACHE_MAX_MEMORY_BYTES = int(os.environ.get('RESULT_CACHE_MAX_MEMORY_BYTES', str(64 * 1024 * 1024)))
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_cache'))
+RESULT_CACHE_MAX_DISK_BYTES = int(os.environ.get('RESULT_CACHE_MAX_DISK_BYTES', str(1024 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+# 'disk' (default) or 's3' to share the persistent tier across pods via S3_BUCKET_NAME
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'disk')
+
+# --- Local Text Layer Configuration ---
+TEXT_LAYER_ENABLED = os.environ.get('TEXT_LAYER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TEXT_LAYER_MIN_CHARS = int(os.environ.get('TEXT_LAYER_MIN_CHARS', '32'))
+TEXT_LAYER_MIN_CLEAN_RATIO = float(os.environ.get('TEXT_LAYER_MIN_CLEAN_RATIO', '0.85'))
+# Born-digital resumes never need S3 for OCR; set this to still keep a copy there
+TEXT_LAYER_ARCHIVE_UPLOADS = os.environ.get('TEXT_LAYER_ARCHIVE_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+
+# --- Synchronous Textract Configuration ---
+# Small documents skip S3 + async jobs: each page goes to DetectDocumentText as bytes, concurrently
+TEXTRACT_SYNC_ENABLED = os.environ.get('TEXTRACT_SYNC_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TEXTRACT_SYNC_MAX_PAGES = int(os.environ.get('TEXTRACT_SYNC_MAX_PAGES', '2'))
+TEXTRACT_SYNC_MAX_BYTES = int(os.environ.get('TEXTRACT_SYNC_MAX_BYTES', str(5 * 1024 * 1024))) # API limit is 10 MB per page
+TEXTRACT_SYNC_MAX_CONCURRENCY = int(os.environ.get('TEXTRACT_SYNC_MAX_CONCURRENCY', '8'))
+# 'background' (default) still keeps the original in S3 for audit, off the request path; 'off' skips it
+TEXTRACT_SYNC_ARCHIVE = os.environ.get('TEXTRACT_SYNC_ARCHIVE', 'background')
+
+# --- Page-Parallel Processing ---
+# Longer documents we can split are OCR'd one page per DetectDocumentText call, every page at once, instead of
+# through one async job whose time grows with page count; the pages are merged back in page order
+PAGE_PARALLEL_ENABLED = os.environ.get('PAGE_PARALLEL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Pages to OCR per document sent this way (each is a DetectDocumentText call against its TPS quota)
+PAGE_PARALLEL_MAX_PAGES = int(os.environ.get('PAGE_PARALLEL_MAX_PAGES', '8'))
+# ?stream=true uploads processed at once per worker (each holds a thread while its events are written)
+PAGE_STREAM_MAX_CONCURRENCY = int(os.environ.get('PAGE_STREAM_MAX_CONCURRENCY', '16'))
+
+# --- Comprehend Configuration ---
+# Batches of 25 chunks kept in flight at once per worker
+COMPREHEND_MAX_CONCURRENCY = int(os.environ.get('COMPREHEND_MAX_CONCURRENCY', '4'))
+
+# --- Entity Extraction ---
+# 'comprehend' (default), 'local' (spaCy in-process, no network) or 'hybrid' (spaCy, with Comprehend for the
+# lines holding entities it scores under NER_MIN_CONFIDENCE or can't map to a Comprehend type)
+NER_BACKEND = os.environ.get('NER_BACKEND', 'comprehend').lower()
+NER_SPACY_MODEL = os.environ.get('NER_SPACY_MODEL', 'en_core_web_sm')
+NER_MIN_CONFIDENCE = float(os.environ.get('NER_MIN_CONFIDENCE', '0.8'))
+# Beam width used to score spaCy's entities; 1 skips scoring (every Score is 1.0, so 'hybrid' never falls back)
+NER_SPACY_BEAM_WIDTH = int(os.environ.get('NER_SPACY_BEAM_WIDTH', '8'))
+
+# --- Batch Endpoint Configuration ---
+BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', str(512 * 1024 * 1024)))
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '500'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '16'))
+# Guards against zip bombs: total uncompressed PDF bytes accepted from one archive
+BATCH_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('BATCH_MAX_UNCOMPRESSED_BYTES', str(1024 * 1024 * 1024)))
+
+# --- Response Encoding ---
+# Parse responses at least this big are compressed when the client sends Accept-Encoding: gzip / zstd
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+
+# --- AWS Quotas ---
+# Account-level limits (per region) the scheduler keeps us under. Workers on one host share them through
+# QUOTA_STATE_DIR; when several hosts or deployments use the same account, QUOTA_SHARE is this one's fraction.
+QUOTA_SHARE = float(os.environ.get('QUOTA_SHARE', '1'))
+TEXTRACT_START_TPS = float(os.environ.get('TEXTRACT_START_TPS', '2'))
+TEXTRACT_GET_TPS = float(os.environ.get('TEXTRACT_GET_TPS', '5'))
+TEXTRACT_DETECT_TPS = float(os.environ.get('TEXTRACT_DETECT_TPS', '5'))
+TEXTRACT_MAX_CONCURRENT_JOBS = int(os.environ.get('TEXTRACT_MAX_CONCURRENT_JOBS', '25'))
+COMPREHEND_BATCH_TPS = float(os.environ.get('COMPREHEND_BATCH_TPS', '10'))
+COMPREHEND_DETECT_TPS = float(os.environ.get('COMPREHEND_DETECT_TPS', '20'))
+QUOTA_STATE_DIR = os.environ.get('QUOTA_STATE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_quota'))
+# How long a call may queue for quota before the request is answered with 429 + Retry-After
+QUOTA_MAX_WAIT_INTERACTIVE = float(os.environ.get('QUOTA_MAX_WAIT_INTERACTIVE', '10'))
+QUOTA_MAX_WAIT_BULK = float(os.environ.get('QUOTA_MAX_WAIT_BULK', '300'))
+
+# --- Skill Search Index ---
+# Every parsed resume's combined keywords go into an on-disk inverted index behind /search; workers share it
+SKILL_INDEX_ENABLED = os.environ.get('SKILL_INDEX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SKILL_INDEX_DIR = os.environ.get('SKILL_INDEX_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_index'))
+# Resumes held in the update log before it's folded into the memory-mapped segment
+SKILL_INDEX_COMPACT_AFTER = int(os.environ.get('SKILL_INDEX_COMPACT_AFTER', '5000'))
+SEARCH_MAX_LIMIT = int(os.environ.get('SEARCH_MAX_LIMIT', '100'))
+
+# --- Near-Duplicate Detection ---
+# Resubmissions with small edits (new date, phone number) miss the exact-hash cache; MinHash/LSH catches them
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+NEAR_DUPLICATE_DIR = os.environ.get(
+    'NEAR_DUPLICATE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_near_duplicates'))
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', str(near_duplicates.DEFAULT_THRESHOLD)))
+# Take a near-duplicate's Comprehend entities from the original's cached result instead of calling Comprehend
+NEAR_DUPLICATE_REUSE_ENTITIES = os.environ.get('NEAR_DUPLICATE_REUSE_ENTITIES', 'true').lower() in ('1', 'true', 'yes')
+
+# --- OCR Output Store ---
+# Every parsed resume's extracted lines and entities, gzipped by PDF hash, so a taxonomy or COMPREHEND_EXCLUDE
+# change can be applied to them (POST /reprocess, or re-uploads) without running Textract again
+OCR_STORE_ENABLED = os.environ.get('OCR_STORE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OCR_STORE_DIR = os.environ.get('OCR_STORE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_ocr'))
+# Processes re-deriving keywords during a /reprocess job, and documents handed to each at a time
+REPROCESS_WORKERS = int(os.environ.get('REPROCESS_WORKERS', '2'))
+REPROCESS_BATCH_SIZE = int(os.environ.get('REPROCESS_BATCH_SIZE', '200'))
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --- Boto3 Clients ---
-s3_client = boto3.client('s3', region_name=AWS_REGION)
-textract_client = boto3.client('textract', region_name=AWS_REGION)
-comprehend_client = boto3.client('comprehend', region_name=AWS_REGION)
+# Created on first use in each process (see init_worker), instrumented for the AWS counters on /metrics.
+# One client per service is shared by every thread (and by the asyncio pipeline), so its connection
+# pool (AWS_MAX_POOL_CONNECTIONS) should be at least the largest number of calls a worker makes at once.
+AWS_CLIENT_CONFIG = client_config_from_env()
+s3_client = LazyClient('s3', region_name=AWS_REGION, wrap=metrics.instrument_boto_client, config=AWS_CLIENT_CONFIG)
+# Textract and Comprehend are wrapped by the quota scheduler below, which does their retrying
+textract_client = LazyClient('textract', region_name=AWS_REGION, wrap=metrics.instrument_boto_client,
+                             config=without_retries(AWS_CLIENT_CONFIG))
+comprehend_client = LazyClient('comprehend', region_name=AWS_REGION, wrap=metrics.instrument_boto_client,
+                               config=without_retries(AWS_CLIENT_CONFIG))
+
+# --- Quota Scheduler ---
+# Textract and Comprehend calls wait for a token (interactive uploads first) instead of being throttled
+quota_scheduler = QuotaScheduler(
+    quotas={
+        'textract_start': TEXTRACT_START_TPS * QUOTA_SHARE,
+        'textract_get': TEXTRACT_GET_TPS * QUOTA_SHARE,
+        'textract_detect': TEXTRACT_DETECT_TPS * QUOTA_SHARE,
+        'comprehend_batch': COMPREHEND_BATCH_TPS * QUOTA_SHARE,
+        'comprehend_detect': COMPREHEND_DETECT_TPS * QUOTA_SHARE,
+    },
+    slots={'textract_jobs': max(1, int(TEXTRACT_MAX_CONCURRENT_JOBS * QUOTA_SHARE))},
+    state_dir=QUOTA_STATE_DIR,
+    max_wait={PRIORITY_INTERACTIVE: QUOTA_MAX_WAIT_INTERACTIVE, PRIORITY_BULK: QUOTA_MAX_WAIT_BULK},
+    instrument=metrics.stage,
+)
+TEXTRACT_OPERATIONS = {
+    'start_document_text_detection': 'textract_start',
+    'get_document_text_detection': 'textract_get',
+    'detect_document_text': 'textract_detect',
+}
+COMPREHEND_OPERATIONS = {
+    'batch_detect_entities': 'comprehend_batch',
+    'detect_entities': 'comprehend_detect',
+}
+textract_client = quota_scheduler.wrap(textract_client, TEXTRACT_OPERATIONS)
+comprehend_client = quota_scheduler.wrap(comprehend_client, COMPREHEND_OPERATIONS)
+
+# --- MLflow Tracking (buffered, off the request path) ---
+tracker = BackgroundTracker(
+    tracking_uri=MLFLOW_TRACKING_URI,
+    max_queue=MLFLOW_QUEUE_SIZE,
+    policy=MLFLOW_QUEUE_FULL_POLICY,
+    block_timeout=MLFLOW_BLOCK_TIMEOUT,
+    num_threads=MLFLOW_FLUSH_THREADS,
+    s3_client=s3_client,
+    instrument=metrics.stage,
+)
+atexit.register(tracker.close, MLFLOW_SHUTDOWN_TIMEOUT)
+logging.info(f"MLflow tracking URI: {MLFLOW_TRACKING_URI or 'default'}, experiment: {MLFLOW_EXPERIMENT_NAME}")
+
+# --- Comprehend (full-document, batched) ---
+comprehend_chunker = ComprehendChunker(comprehend_client, max_concurrency=COMPREHEND_MAX_CONCURRENCY)
+
+# --- Entity Backend (loaded per worker in init_worker) ---
+if NER_BACKEND != 'comprehend' and not ner_backends.is_available():
+    logging.error(f"NER_BACKEND={NER_BACKEND} needs spaCy (pip install spacy && python -m spacy download "
+                  f"{NER_SPACY_MODEL}); using Comprehend")
+    NER_BACKEND = 'comprehend'
+entity_backend = ner_backends.build_backend(NER_BACKEND, comprehend_chunker, model=NER_SPACY_MODEL,
+                                            min_confidence=NER_MIN_CONFIDENCE, beam_width=NER_SPACY_BEAM_WIDTH)
+
+# --- Synchronous Textract pages and background S3 archiving ---
+textract_sync_executor = ThreadPoolExecutor(max_workers=TEXTRACT_SYNC_MAX_CONCURRENCY, thread_name_prefix="textract-sync")
+archive_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="s3-archive")
+
+# --- Streaming uploads: the pipeline runs off the request thread, page 1 is detected on its own ---
+stream_executor = ThreadPoolExecutor(max_workers=PAGE_STREAM_MAX_CONCURRENCY, thread_name_prefix="page-stream")
+first_page_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="first-page")
+
+# --- Shared Textract Poller ---
+if TEXTRACT_NOTIFICATION_MODE == 'sqs':
+    textract_notifications = SQSNotificationChannel(
+        LazyClient('sqs', region_name=AWS_REGION, wrap=metrics.instrument_boto_client, config=AWS_CLIENT_CONFIG),
+        TEXTRACT_SQS_QUEUE_URL)
+elif TEXTRACT_NOTIFICATION_MODE == 'memory':
+    textract_notifications = InMemoryNotificationChannel()
+else:
+    textract_notifications = None
+# Polls don't queue for a textract_get token: a poll turned away is rescheduled like a throttled one
+textract_poller = TextractPoller(
+    textract_client.without_waiting(),
+    min_delay=TEXTRACT_POLL_MIN_DELAY,
+    max_delay=TEXTRACT_POLL_MAX_DELAY,
+    notification_channel=textract_notifications,
+)
 
-# --- Skill Keywords (You can load this from a file later) ---
+# --- Background Job Pool (used by async mode) ---
+job_manager = JobManager(
+    max_workers=ASYNC_MAX_WORKERS,
+    max_pending=ASYNC_MAX_PENDING,
+    result_ttl=ASYNC_RESULT_TTL_SECONDS,
+    state_dir=ASYNC_STATE_DIR,
+)
+
+# --- Skill Keywords ---
+# The taxonomy lives in config/config.yaml; this list is only used if that file is missing.
 SKILL_KEYWORDS = [
     'python', 'java', 'c++', 'sql', 'aws', 'azure', 'gcp', 's3', 'ec2',
     'lambda', 'react', 'angular', 'vue', 'django', 'flask', 'machine learning',
@@ -51,72 +291,785 @@ SKILL_KEYWORDS = [
 ]
 COMPREHEND_EXCLUDE = ['PERSON', 'LOCATION', 'DATE', 'ORGANIZATION', 'QUANTITY']
 
+# Built once per process; matches the whole taxonomy in a single pass over the text
+skill_matcher = load_skill_matcher(SKILLS_CONFIG_PATH, fallback_skills=SKILL_KEYWORDS)
+
+# Everything that decides what a result looks like; results derived under another version are stale
+result_version = cache_version(skill_matcher.fingerprint(), COMPREHEND_EXCLUDE,
+                               ner_fingerprint=entity_backend.fingerprint())
+
+# --- Result Cache (keyed by PDF hash + skill list / code version) ---
+result_cache = None
+if RESULT_CACHE_ENABLED:
+    result_cache = ResultCache(
+        result_version,
+        max_items=RESULT_CACHE_MAX_ITEMS,
+        max_memory_bytes=RESULT_CACHE_MAX_MEMORY_BYTES,
+        directory=RESULT_CACHE_DIR if RESULT_CACHE_BACKEND == 'disk' else None,
+        max_disk_bytes=RESULT_CACHE_MAX_DISK_BYTES,
+        ttl=RESULT_CACHE_TTL_SECONDS,
+        s3_client=s3_client if RESULT_CACHE_BACKEND == 's3' else None,
+        s3_bucket=S3_BUCKET_NAME,
+    )
+
+# --- Skill Search Index ---
+skill_index = SkillIndex(SKILL_INDEX_DIR, compact_after=SKILL_INDEX_COMPACT_AFTER) if SKILL_INDEX_ENABLED else None
+
+# --- OCR Output Store ---
+ocr_store = OcrStore(OCR_STORE_DIR) if OCR_STORE_ENABLED else None
+
+# --- Near-Duplicate Index ---
+near_duplicate_index = None
+if NEAR_DUPLICATE_ENABLED:
+    near_duplicate_index = NearDuplicateIndex(NEAR_DUPLICATE_DIR, threshold=NEAR_DUPLICATE_THRESHOLD)
+
+# --- Per-Worker Startup ---
+def init_worker():
+    """
+    Builds this process's AWS clients ahead of the first request. Called from
+    gunicorn's post_worker_init hook; everything here is otherwise created
+    lazily, so the module itself imports fast and is safe to load before fork
+    (gunicorn --preload) with the skill matcher shared copy-on-write.
+    """
+    start = time.perf_counter()
+    for client in (s3_client, textract_client, comprehend_client):
+        client = getattr(client, 'wrapped', client)
+        if isinstance(client, LazyClient):
+            client.get()
+    # The spaCy pipeline too, after the fork: its first load takes a second or two
+    entity_backend.load()
+    logging.info(f"Worker {os.getpid()} initialised AWS clients and the {entity_backend.name} entity backend "
+                 f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def readiness_checks():
+    """Local-only checks (no AWS/MLflow calls) that decide whether this worker should get traffic."""
+    jobs = job_manager.stats()
+    tracking = tracker.snapshot()
+    return {
+        "skill_matcher": len(skill_matcher) > 0,
+        "job_queue": jobs["pending"] < jobs["max_pending"],
+        "tracking_queue": tracking["policy"] == 'drop' or tracking["queued"] < tracking["max_queue"],
+        "s3_bucket": bool(S3_BUCKET_NAME),
+    }
+
 # --- Helper Functions (Copied/Adapted from Notebook) ---
+@instrumented("textract_start")
 def start_textract_job(bucket, document_key):
     logging.info(f"Starting Textract job for: {document_key}")
+    params = {'DocumentLocation': {'S3Object': {'Bucket': bucket, 'Name': document_key}}}
+    if TEXTRACT_NOTIFICATION_MODE == 'sqs':
+        params['NotificationChannel'] = {'SNSTopicArn': TEXTRACT_SNS_TOPIC_ARN, 'RoleArn': TEXTRACT_ROLE_ARN}
     try:
-        response = textract_client.start_document_text_detection(
-            DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': document_key}}
-        )
+        response = textract_client.start_document_text_detection(**params)
         return response['JobId']
+    except QuotaExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error starting Textract job for {document_key}: {e}")
         return None
 
-def wait_for_job_completion(job_id, delay=5, timeout=300):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            response = textract_client.get_document_text_detection(JobId=job_id)
-            status = response['JobStatus']
-            logging.info(f"Job {job_id} Status: {status}")
-            if status == 'SUCCEEDED': return True
-            if status in ['FAILED', 'PARTIAL_SUCCESS']: return False
-            time.sleep(delay)
-        except Exception as e:
-            logging.error(f"Error checking job {job_id}: {e}")
-            return False
-    logging.error(f"Job {job_id} timed out.")
-    return False
+@instrumented("textract_wait")
+def wait_for_job_completion(job_id, timeout=TEXTRACT_JOB_TIMEOUT, pages=1):
+    # One shared poller thread watches every outstanding job and wakes us when ours finishes
+    return textract_poller.wait(job_id, timeout=timeout, pages=pages)
 
+@instrumented("textract_get_results")
 def get_textract_results(job_id):
-    all_blocks = []
-    next_token = None
-    try:
-        while True:
-            params = {'JobId': job_id}
-            if next_token: params['NextToken'] = next_token
-            response = textract_client.get_document_text_detection(**params)
-            all_blocks.extend(response.get('Blocks', []))
-            next_token = response.get('NextToken')
-            if not next_token: break
-        return all_blocks
+    # Result pages are streamed into the columnar store; the raw block dicts are never accumulated
+    try:
+        return BlockStore().add_textract_blocks(iter_textract_blocks(textract_client, job_id))
+    except QuotaExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error getting results for {job_id}: {e}")
         return None
 
 def extract_text_from_blocks(blocks):
-    return "\n".join([b['Text'] for b in blocks if b['BlockType'] == 'LINE']) if blocks else ""
+    return blocks.text() if blocks else ""
 
-def find_skills_keyword_based(text, skills_list):
-    found = set([skill for skill in skills_list if skill in text.lower()]) if text else set()
-    return list(found)
+@instrumented("skills")
+def find_skills_keyword_based(text, matcher):
+    return matcher.find_skills(text) if text else []
 
+@instrumented("comprehend")
 def find_entities_comprehend(text):
+    # Whole document through the NER_BACKEND policy (Comprehend by default, chunked and batched); offsets are
+    # document-wide and the entities are Comprehend-shaped whichever backend found them
     if not text: return []
     try:
-        response = comprehend_client.detect_entities(Text=text[:4900], LanguageCode='en')
-        return response.get('Entities', [])
+        return entity_backend.detect(text)
+    except QuotaExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error calling Comprehend: {e}")
         return []
 
+@instrumented("combine")
 def combine_results(rule_skills, comp_entities, exclude_types):
-    combined = set([s.lower() for s in rule_skills])
-    combined.update([
-        e['Text'].lower() for e in comp_entities if e['Type'] not in exclude_types
-    ])
-    return list(combined)
+    return combine_keywords(rule_skills, comp_entities, exclude_types)
+
+# --- Text Extraction (local text layer first, Textract for the rest) ---
+@instrumented("s3_upload")
+def upload_to_s3(pdf_bytes, s3_key):
+    s3_client.upload_fileobj(io.BytesIO(pdf_bytes), S3_BUCKET_NAME, s3_key)
+
+
+class ExtractionError(Exception):
+    """Text extraction failed; the message is returned to the caller as-is."""
+
+def run_textract(pdf_bytes, s3_key, num_pages):
+    """Uploads the PDF and runs an async Textract job over it. Returns (job_id, BlockStore)."""
+    upload_to_s3(pdf_bytes, s3_key)
+    logging.info(f"File uploaded to S3: s3://{S3_BUCKET_NAME}/{s3_key}")
+
+    # Held until the results are read, so we never have more jobs open than the account allows
+    with quota_scheduler.slot('textract_jobs'):
+        job_id = start_textract_job(S3_BUCKET_NAME, s3_key)
+        if not job_id:
+            raise ExtractionError("Failed to start Textract job")
+        if not wait_for_job_completion(job_id, pages=num_pages):
+            raise ExtractionError("Textract job failed or timed out")
+        blocks = get_textract_results(job_id)
+    if not blocks:
+        raise ExtractionError("Failed to get Textract results")
+    return job_id, blocks
+
+def use_sync_textract(pdf_bytes, page_numbers, num_pages):
+    # A document we can't read locally can't be split into pages, so only a single-page one qualifies
+    can_split = page_numbers is not None or num_pages == 1
+    max_pages = PAGE_PARALLEL_MAX_PAGES if PAGE_PARALLEL_ENABLED and page_numbers is not None else TEXTRACT_SYNC_MAX_PAGES
+    return (TEXTRACT_SYNC_ENABLED and can_split and 0 < num_pages <= max_pages
+            and len(pdf_bytes) <= TEXTRACT_SYNC_MAX_BYTES)
+
+def sync_archive_path(pdf_bytes, s3_key):
+    return archive_upload(pdf_bytes, s3_key) if TEXTRACT_SYNC_ARCHIVE != 'off' else None
+
+@instrumented("textract_sync_page")
+def detect_page_sync(page_bytes, page_index):
+    response = textract_client.detect_document_text(Document={'Bytes': page_bytes})
+    return BlockStore().add_textract_blocks(response.get('Blocks', []), page=page_index)
+
+@instrumented("textract_sync")
+def run_textract_sync(pdf_bytes, page_numbers, on_page=None):
+    """
+    OCRs the given 1-based pages with DetectDocumentText, one single-page call
+    per page in parallel. Returns a BlockStore whose pages are positions in
+    'page_numbers' (1..n), matching what an async job over the page subset returns.
+    'on_page(page_number, store)' is called with each page as it arrives.
+    """
+    if page_numbers is None:
+        # Unreadable locally, so it can't be split; the caller only sends single-page documents here
+        page_numbers, pages = [1], [pdf_bytes]
+    else:
+        pages = split_pages(pdf_bytes, page_numbers)
+    if len(pages) == 1:
+        store = detect_page_sync(pages[0], 1)
+        if on_page is not None:
+            on_page(page_numbers[0], store)
+        return store
+    # Each page call runs in a copy of our context, so it keeps the caller's quota priority
+    futures = {textract_sync_executor.submit(contextvars.copy_context().run, detect_page_sync, page, i): i
+               for i, page in enumerate(pages, start=1)}
+    page_stores = [None] * len(pages)
+    for future in as_completed(futures):
+        position = futures[future]
+        page_stores[position - 1] = future.result()
+        if on_page is not None:
+            on_page(page_numbers[position - 1], page_stores[position - 1])
+    return merge_pages(page_stores)
+
+def merge_pages(page_stores):
+    """One BlockStore of single-page stores, in page order whichever page finished first."""
+    store = BlockStore()
+    for page_store in page_stores:
+        store.extend(page_store)
+    return store
+
+def archive_upload(pdf_bytes, s3_key):
+    """Keeps the original in S3 without holding up the response. Returns the S3 path it will have."""
+    def upload():
+        try:
+            upload_to_s3(pdf_bytes, s3_key)
+            logging.info(f"Archived upload to S3: s3://{S3_BUCKET_NAME}/{s3_key}")
+        except Exception as e:
+            logging.error(f"Error archiving {s3_key} to S3: {e}")
+
+    archive_executor.submit(upload)
+    return f"s3://{S3_BUCKET_NAME}/{s3_key}"
+
+def plan_ocr(pdf_bytes, s3_key, page_numbers, total_pages):
+    """
+    How ocr_pages goes about 'page_numbers': (pages to OCR, whether to try the
+    sync API first, S3 key for an async job over just those pages or None when
+    the job can take the whole document).
+    """
+    num_pages = len(page_numbers) if page_numbers is not None else total_pages
+    subset_key = None
+    if page_numbers is not None and len(page_numbers) != total_pages:
+        subset_key = f"{s3_key[:-len('.pdf')]}-ocr-pages.pdf"
+    return num_pages, use_sync_textract(pdf_bytes, page_numbers, num_pages), subset_key
+
+@contextlib.contextmanager
+def falling_back_to_async_job(s3_key):
+    """Around a sync Textract attempt: any failure but running out of quota is left to an async job."""
+    try:
+        yield
+    except QuotaExceeded:
+        raise  # out of quota: answered with a 429, not worked around with an async job
+    except Exception as e:
+        logging.warning(f"Synchronous Textract failed for {s3_key} ({e}); falling back to an async job")
+
+def ocr_pages(pdf_bytes, s3_key, page_numbers, total_pages, on_page=None):
+    """
+    OCRs 'page_numbers' (None = the whole, locally unreadable document) through
+    the sync API, page by page, when the document is small enough, else an
+    async job. Returns (BlockStore with subset page numbers, job_id, s3_path,
+    mode). 'on_page' only sees pages from the sync API (see run_textract_sync).
+    """
+    num_pages, sync, subset_key = plan_ocr(pdf_bytes, s3_key, page_numbers, total_pages)
+    if sync:
+        with falling_back_to_async_job(s3_key):
+            blocks = run_textract_sync(pdf_bytes, page_numbers, on_page)
+            return blocks, None, sync_archive_path(pdf_bytes, s3_key), "sync"
+
+    if subset_key is None:
+        job_id, blocks = run_textract(pdf_bytes, s3_key, num_pages)
+    else:
+        # Keep the original for the record, but only OCR the pages that need it
+        upload_to_s3(pdf_bytes, s3_key)
+        job_id, blocks = run_textract(build_page_subset(pdf_bytes, page_numbers), subset_key, num_pages)
+    return blocks, job_id, f"s3://{S3_BUCKET_NAME}/{s3_key}", "async"
+
+def route_document(pdf_bytes):
+    """Decides per page between the embedded text layer and Textract. Returns (decisions or None, ms)."""
+    start = time.perf_counter()
+    decisions = None
+    if TEXT_LAYER_ENABLED:
+        with metrics.stage("text_layer"):
+            decisions = route_pages(pdf_bytes, TEXT_LAYER_MIN_CHARS, TEXT_LAYER_MIN_CLEAN_RATIO)
+    return decisions, (time.perf_counter() - start) * 1000
+
+def pages_to_ocr(pdf_bytes, decisions):
+    """Returns (page_numbers, total_pages) for ocr_pages(), or None when every page has usable text."""
+    if decisions is None:
+        # Can't read the PDF's text locally (or the fast path is off): OCR the whole thing
+        total_pages = text_layer.count_pages(pdf_bytes) if text_layer.is_available() else None
+        if total_pages is None:
+            # No PDF library, or it can't open the file: guess from the raw bytes (too low when the page objects
+            # sit in compressed object streams), so send it whole rather than split it into the guessed pages
+            return None, estimate_page_count(pdf_bytes)
+        if PAGE_PARALLEL_ENABLED and total_pages > 1:
+            # ...still a page at a time; if it can't be split, ocr_pages falls back to one async job
+            return list(range(1, total_pages + 1)), total_pages
+        return None, total_pages
+    ocr_page_numbers = [d["page"] for d in decisions if d["source"] == SOURCE_TEXTRACT]
+    return (ocr_page_numbers, len(decisions)) if ocr_page_numbers else None
+
+
+def assemble_extraction(pdf_bytes, s3_key, decisions, text_layer_ms, ocr=None, textract_ms=0.0):
+    """
+    Merges text-layer pages with the OCR result ((blocks, job_id, s3_path, mode)
+    from ocr_pages, or None) into the extraction record the pipeline works from.
+    """
+    blocks, job_id, s3_path, textract_mode = ocr if ocr is not None else (None, None, None, None)
+    if decisions is None:
+        decisions = [{"page": p, "source": SOURCE_TEXTRACT, "reason": "text_layer_unavailable"}
+                     for p in blocks.page_numbers()]
+    else:
+        ocr_page_numbers = [d["page"] for d in decisions if d["source"] == SOURCE_TEXTRACT]
+        if not ocr_page_numbers and TEXT_LAYER_ARCHIVE_UPLOADS:
+            s3_path = archive_upload(pdf_bytes, s3_key)
+        blocks = merge_page_stores(decisions, blocks, ocr_page_numbers)
+
+    num_ocr_pages = sum(1 for d in decisions if d["source"] == SOURCE_TEXTRACT)
+    logging.info(f"Extracted {len(decisions)} page(s) for {s3_key}: {len(decisions) - num_ocr_pages} from text layer "
+                 f"({text_layer_ms:.0f} ms), {num_ocr_pages} via {textract_mode or 'no'} Textract ({textract_ms:.0f} ms)")
+    return {
+        "blocks": blocks,
+        "s3_path": s3_path,
+        "textract_job_id": job_id,
+        "num_ocr_pages": num_ocr_pages,
+        "num_text_layer_pages": len(decisions) - num_ocr_pages,
+        "routing": {
+            "pages": [{k: v for k, v in d.items() if k != "text"} for d in decisions],
+            "text_layer_ms": round(text_layer_ms, 2),
+            "textract_mode": textract_mode,
+            "textract_ms": round(textract_ms, 2),
+        },
+    }
+
+def extract_document(pdf_bytes, s3_key, on_first_page=None):
+    """
+    Gets the lines of every page as a BlockStore, reading the embedded text
+    layer locally and only sending pages without a usable one (scans, broken
+    fonts) to Textract. Rows are in page order whichever source they came from.
+    'on_first_page(text)' is called if page 1's text is known before the rest
+    of the document's (streaming uploads).
+    """
+    decisions, text_layer_ms = route_document(pdf_bytes)
+    ocr, textract_ms = None, 0.0
+    to_ocr = pages_to_ocr(pdf_bytes, decisions)
+    if to_ocr is not None:
+        on_page = None
+        if on_first_page is not None:
+            first_page_text, on_page = early_first_page(decisions, *to_ocr, on_first_page)
+            if first_page_text is not None:
+                on_first_page(first_page_text)
+        start = time.perf_counter()
+        ocr = ocr_pages(pdf_bytes, s3_key, *to_ocr, on_page=on_page)
+        textract_ms = (time.perf_counter() - start) * 1000
+    return assemble_extraction(pdf_bytes, s3_key, decisions, text_layer_ms, ocr, textract_ms)
+
+def early_first_page(decisions, page_numbers, total_pages, on_first_page):
+    """
+    How page 1 of a document with pages still to OCR can reach on_first_page
+    ahead of the others. Returns (page 1's text if it's ready now, on_page
+    callback for ocr_pages or None); neither when the document is one page.
+    """
+    if page_numbers is None or total_pages < 2:
+        return None, None
+    if 1 not in page_numbers:
+        # Page 1 has a usable text layer, so it needn't wait for the pages being OCR'd
+        page_one = BlockStore()
+        page_one.add_text_layer_page(decisions[0]["text"], 1)
+        return page_one.text(), None
+
+    def on_page(page_number, store):
+        if page_number == 1:
+            on_first_page(store.text())
+    return None, on_page
+
+# --- Resume Pipeline ---
+def process_resume(file, filename, category=None, on_event=None):
+    """
+    Runs the full upload -> Textract -> Comprehend chain for one PDF and queues its MLflow run.
+    'file' is any readable binary file object. Returns (response_data, http_status).
+    Re-uploads of a PDF we've already parsed are answered from the result cache, or,
+    once it's been dropped or the config changed, re-derived from the OCR store.
+    The keywords are added to the search index, under 'category' if given.
+    'on_event(dict)', if given, gets the streaming events ahead of the result:
+    the header, then page 1's keywords (see stream_events).
+    """
+    with metrics.stage("read"):
+        pdf_bytes, content_hash = read_and_hash(file)
+    metrics.observe_document(num_bytes=len(pdf_bytes))
+    cached = cached_result(content_hash, filename)
+    if cached is not None:
+        if on_event is not None:
+            for event in cache_hit_events(filename, content_hash, cached):
+                on_event(event)
+        return build_response(cached, content_hash, cache_hit=True), 200
+
+    unique_filename = upload_key(filename)
+    on_first_page, early_first_page_futures = None, []
+    if on_event is not None:
+        on_event(header_event(filename, content_hash))
+
+        def on_first_page(page_text):
+            early_first_page_futures.append(start_first_page(page_text, on_event))
+
+    run = start_tracking_run(filename, unique_filename, content_hash)
+    try:
+        extraction, stored_entities = stored_extraction(content_hash, run)
+        if extraction is None:
+            extraction = extract_document(pdf_bytes, unique_filename, on_first_page)
+
+        extracted_text = extract_text_from_blocks(extraction["blocks"])
+        signature, near_duplicate = check_near_duplicate(content_hash, extracted_text)
+        rule_skills = find_skills_keyword_based(extracted_text, skill_matcher)
+        comp_entities = reused_entities(stored_entities, near_duplicate)
+        if comp_entities is None:
+            comp_entities = find_entities_comprehend(extracted_text)
+        result = save_result(run, content_hash, filename, category, extraction, extracted_text, rule_skills,
+                             comp_entities, near_duplicate, signature)
+        # Page 1 always goes out before the result: wait for the early one, or take it from the result
+        if on_event is not None and not any(future.result() for future in early_first_page_futures):
+            on_event(first_page_from_result(extraction["blocks"], result))
+        return build_response(result, content_hash), 200
+    except Exception as e:
+        return failed_response(run, filename, e)
+    finally:
+        submit_run(run)
+
+# Steps of process_resume that the asyncio pipeline (async_pipeline.py) runs too, so both
+# entry points answer the same way; only how the steps are scheduled differs between them
+def cached_result(content_hash, filename):
+    """The cached result for the document, or None (also when the cache is off)."""
+    if result_cache is None:
+        return None
+    with metrics.stage("cache_get"):
+        cached = result_cache.get(content_hash)
+    if cached is not None:
+        logging.info(f"Cache hit for {filename} (sha256 {content_hash[:12]}), skipping Textract/Comprehend")
+    return cached
+
+def cache_hit_events(filename, content_hash, cached):
+    """The streaming events ahead of a cached result: the header, then page 1's keywords."""
+    return [header_event(filename, content_hash, cache_hit=True),
+            first_page_from_result(BlockStore.from_dict(cached["textract_blocks"]), cached)]
+
+def upload_key(filename):
+    """A fresh S3 key for an upload of 'filename'."""
+    unique_filename = f"uploads/{uuid.uuid4()}-{filename}"
+    logging.info(f"Received file: {filename}, saving to S3 as {unique_filename}")
+    return unique_filename
+
+def reused_entities(stored_entities, near_duplicate):
+    """Entities that needn't be detected again: the OCR store's, else a near-duplicate's. None if neither."""
+    if stored_entities is not None:
+        return stored_entities
+    if near_duplicate and near_duplicate["entities"] is not None:
+        return near_duplicate["entities"]
+    return None
+
+def save_result(run, content_hash, filename, category, extraction, extracted_text, rule_skills, comp_entities,
+                near_duplicate, signature):
+    """Records the result on the run, stores it and indexes its keywords. Returns the result."""
+    result = record_result(run, content_hash, extraction, extracted_text, rule_skills, comp_entities, near_duplicate)
+    store_result(content_hash, filename, category, result)
+    index_result(content_hash, filename, category, result["combined_keywords"], signature)
+    return result
+
+def failed_response(run, filename, error):
+    """(response_data, http_status) for a resume whose processing raised 'error'; marks its run as failed."""
+    run.log_metric("status", 0)
+    if isinstance(error, QuotaExceeded):
+        logging.warning(f"Out of AWS quota for {filename}: {error}")
+        return quota_error(error), 429
+    if isinstance(error, ExtractionError):
+        return {"error": str(error)}, 500
+    logging.error(f"An error occurred during processing: {error}")
+    run.status = "FAILED"
+    return {"error": f"Internal server error: {error}"}, 500
+
+@instrumented("mlflow_submit")
+def submit_run(run):
+    tracker.submit(run)
+
+def process_resume_in_background(file, filename, category=None):
+    """process_resume for async jobs and batch items: bulk priority, so interactive uploads get quota first."""
+    with quota.priority(PRIORITY_BULK):
+        return process_resume(file, filename, category)
+
+# --- Streaming (?stream=true): header and page 1 ahead of the result ---
+def header_event(filename, content_hash, cache_hit=False):
+    return {"event": "header", "filename": filename, "content_sha256": content_hash, "cache_hit": cache_hit}
+
+def first_page_event(page_text, rule_skills, comp_entities, early):
+    return {
+        "event": "first_page",
+        "page": 1,
+        # True when page 1 was detected on its own, ahead of the rest of the document
+        "early": early,
+        "combined_keywords": combine_results(rule_skills, comp_entities, COMPREHEND_EXCLUDE),
+        "rule_based_skills": rule_skills,
+        "comprehend_entities": comp_entities,
+        "text_snippet": page_text[:500] + "...",
+    }
+
+@instrumented("first_page")
+def detect_first_page(page_text):
+    """Page 1's keywords on their own (one extra Comprehend call), while the other pages are still being OCR'd."""
+    return first_page_event(page_text, skill_matcher.find_skills(page_text) if page_text else [],
+                            find_entities_comprehend(page_text), early=True)
+
+def first_page_from_result(blocks, result):
+    """Page 1's keywords taken out of the whole document's: page 1 is where the extracted text starts."""
+    page_text = blocks.page_text(blocks.page_numbers()[0]) if len(blocks) else ""
+    rule_skills = skill_matcher.find_skills(page_text) if page_text else []
+    comp_entities = [e for e in result["comprehend_entities"] if e.get('EndOffset', 0) <= len(page_text)]
+    return first_page_event(page_text, rule_skills, comp_entities, early=False)
+
+def start_first_page(page_text, on_event):
+    """Sends page 1's keywords from a pool thread. The future's result says whether they were sent."""
+    def detect_and_send():
+        try:
+            on_event(detect_first_page(page_text))
+            return True
+        except Exception as e:
+            logging.warning(f"Early first-page detection failed ({e}); sending page 1 with the result")
+            return False
+    # In a copy of our context, so it keeps the caller's quota priority
+    return first_page_executor.submit(contextvars.copy_context().run, detect_and_send)
+
+def stream_events(file, filename, category, response_format):
+    """
+    Runs process_resume off the request thread and yields NDJSON lines: a
+    'header' event, a 'first_page' event with page 1's keywords as soon as
+    they're known, then a 'result' event carrying what /parse_resume returns
+    (or its error, projected to 'response_format's fields) and the HTTP status
+    it would have had.
+    """
+    events = queue.Queue()
+    future = stream_executor.submit(contextvars.copy_context().run, process_resume, file, filename, category,
+                                    events.put)
+    future.add_done_callback(lambda _: events.put(None))
+    while (event := events.get()) is not None:
+        yield dumps(event) + b"\n"
+    try:
+        response_data, http_status = future.result()
+    except Exception as e:
+        logging.error(f"Streaming upload {filename} crashed: {e}")
+        response_data, http_status = {"error": f"Internal server error: {e}"}, 500
+    event = {"event": "result", "status": http_status}
+    if http_status < 400:
+        event["result"] = response_format.project(response_data)
+    else:
+        event.update(response_data)
+    yield dumps(event) + b"\n"
+
+def quota_error(error):
+    return {"error": f"AWS capacity is used up, retry later ({error})", "retry_after": error.retry_after}
+
+def start_tracking_run(filename, s3_key, content_hash):
+    # MLflow run is collected in memory and handed to the background tracker when we're done
+    run = tracker.start_run(f"api_upload_{filename}", MLFLOW_EXPERIMENT_NAME)
+    run.log_param("source", "api_upload")
+    run.log_param("original_filename", filename)
+    run.log_param("s3_key", s3_key)
+    run.log_param("s3_bucket", S3_BUCKET_NAME)
+    run.log_param("content_sha256", content_hash)
+    return run
+
+def check_near_duplicate(content_hash, extracted_text):
+    """
+    Looks the text up among the resumes parsed before. Returns (MinHash
+    signature, near-duplicate or None), the near-duplicate being
+    {"content_sha256", "similarity", "entities"}: the closest earlier resume and
+    its Comprehend entities if they can be reused (None otherwise). Reused
+    entities are re-located in this text (relocate_entities); those it no
+    longer contains are left out.
+    """
+    if near_duplicate_index is None:
+        return None, None
+    with metrics.stage("near_duplicate"):
+        signature = minhash(extracted_text)
+        match = near_duplicate_index.query(signature, exclude=content_hash)
+    if match is None:
+        return signature, None
+    original, score = match
+    entities = None
+    if NEAR_DUPLICATE_REUSE_ENTITIES and result_cache is not None:
+        cached = result_cache.get(original)
+        if cached is not None:
+            entities = relocate_entities(cached["comprehend_entities"], extracted_text)
+    logging.info(f"sha256 {content_hash[:12]} is a near-duplicate of {original[:12]} (similarity {score:.2f})"
+                 f"{', reusing its Comprehend entities' if entities is not None else ''}")
+    return signature, {"content_sha256": original, "similarity": round(score, 3), "entities": entities}
+
+def stored_extraction(content_hash, run):
+    """
+    A PDF already in the OCR store (parsed before the taxonomy or config
+    changed) isn't OCR'd again. Returns (extraction as extract_document's, its
+    entities if the current entity backend found them, else None), or (None, None).
+    """
+    if ocr_store is None:
+        return None, None
+    with metrics.stage("ocr_store_get"):
+        record = ocr_store.get(content_hash)
+    if record is None:
+        return None, None
+    logging.info(f"sha256 {content_hash[:12]} is in the OCR store, skipping Textract")
+    run.log_param("extraction_source", "ocr_store")
+    entities = record["comprehend_entities"] if record["ner"] == entity_backend.fingerprint() else None
+    return extraction_from_record(record), entities
+
+def store_result(content_hash, filename, category, result):
+    """Keeps the result's OCR output and entities for /reprocess. Never fails the request."""
+    if ocr_store is None:
+        return
+    try:
+        with metrics.stage("ocr_store_put"):
+            ocr_store.put(content_hash, make_record(result, filename, category, entity_backend.fingerprint()),
+                          result_version)
+    except Exception as e:
+        logging.error(f"Could not add {filename} to the OCR store: {e}")
+
+def run_reprocess(limit=None):
+    """
+    Re-derives the keywords of every stored resume whose result version isn't
+    the current one, from its stored text (see ocr_store.reprocess). Runs as a
+    /reprocess job; entities are only detected again, at bulk priority, for
+    documents whose entities came from another entity backend.
+    """
+    with quota.priority(PRIORITY_BULK):
+        summary = reprocess(ocr_store, result_version, entity_backend.fingerprint(), COMPREHEND_EXCLUDE,
+                            SKILLS_CONFIG_PATH, fallback_skills=SKILL_KEYWORDS, skill_index=skill_index,
+                            detect_entities=entity_backend.detect, workers=REPROCESS_WORKERS,
+                            batch_size=REPROCESS_BATCH_SIZE, limit=limit)
+    return summary, 200
+
+def record_result(run, content_hash, extraction, extracted_text, rule_skills, comp_entities, near_duplicate=None):
+    """Combines the keywords, logs the run's params/metrics/artifacts and caches the result, which it returns."""
+    blocks = extraction["blocks"]
+    job_id = extraction["textract_job_id"]
+    if job_id:
+        run.log_param("textract_job_id", job_id)
+    if extraction["routing"]["textract_mode"]:
+        run.log_param("textract_mode", extraction["routing"]["textract_mode"])
+        run.log_metric("textract_ms", extraction["routing"]["textract_ms"])
+    metrics.observe_document(pages=len(extraction["routing"]["pages"]), text_chars=len(extracted_text))
+    combined_kws = combine_results(rule_skills, comp_entities, COMPREHEND_EXCLUDE)
+
+    # Metrics and artifacts - mlflow (written by the tracker's flusher thread)
+    run.log_metric("text_length_chars", len(extracted_text))
+    run.log_metric("num_textract_blocks", len(blocks))
+    ocr_confidence = blocks.mean_confidence()
+    if ocr_confidence is not None:
+        run.log_metric("mean_ocr_confidence", ocr_confidence)
+    run.log_metric("num_text_layer_pages", extraction["num_text_layer_pages"])
+    run.log_metric("num_ocr_pages", extraction["num_ocr_pages"])
+    run.log_metric("num_rule_based_skills", len(rule_skills))
+    run.log_metric("num_comprehend_entities", len(comp_entities))
+    run.log_metric("num_combined_keywords", len(combined_kws))
+    if near_duplicate:
+        run.log_param("near_duplicate_of", near_duplicate["content_sha256"])
+        run.log_metric("near_duplicate_similarity", near_duplicate["similarity"])
+    run.log_param("ner_backend", entity_backend.name)
+    run.log_metric("status", 1) # 1 for success
+    run.log_text(json.dumps(combined_kws, indent=4), "results/combined_keywords.json")
+    run.log_text(extracted_text, "results/extracted_text.txt")
+
+    result = {
+        "s3_path": extraction["s3_path"],
+        "textract_job_id": job_id,
+        "extraction": extraction["routing"],
+        "textract_blocks": blocks.to_dict(),
+        "extracted_text": extracted_text,
+        "rule_based_skills": rule_skills,
+        "comprehend_entities": comp_entities,
+        "combined_keywords": combined_kws,
+        "near_duplicate": near_duplicate and {
+            "content_sha256": near_duplicate["content_sha256"],
+            "similarity": near_duplicate["similarity"],
+            "entities_reused": near_duplicate["entities"] is not None,
+        },
+    }
+    if result_cache is not None:
+        result_cache.put(content_hash, result)
+    return result
+
+def index_result(content_hash, filename, category, combined_keywords, signature=None):
+    """
+    Adds a parsed resume to the search and near-duplicate indexes. Never fails
+    the request: the result is already cached.
+    """
+    try:
+        with metrics.stage("index_add"):
+            if skill_index is not None:
+                skill_index.add(content_hash, combined_keywords, name=filename, category=category)
+            if near_duplicate_index is not None:
+                near_duplicate_index.add(content_hash, signature)
+    except Exception as e:
+        logging.error(f"Could not add {filename} to the search indexes: {e}")
+
+def build_response(result, content_hash, cache_hit=False):
+    return {
+        "s3_path": result["s3_path"],
+        "textract_job_id": result["textract_job_id"],
+        "combined_keywords": result["combined_keywords"],
+        "rule_based_skills": result["rule_based_skills"],
+        "comprehend_entities": result["comprehend_entities"], # Send full details
+        "text_snippet": result["extracted_text"][:500] + "...",
+        "extraction": result.get("extraction"),
+        "near_duplicate": result.get("near_duplicate"),
+        "content_sha256": content_hash,
+        "cache_hit": cache_hit,
+        # Only sent when asked for (?fields=extracted_text), see response_format.py
+        "extracted_text": result["extracted_text"],
+    }
+
+def is_async_request():
+    """Async mode is opt-in per request (?async=true) or server-wide via ASYNC_MODE_DEFAULT."""
+    flag = request.args.get('async')
+    if flag is None:
+        return ASYNC_MODE_DEFAULT
+    return flag.lower() in ('1', 'true', 'yes')
+
+def is_stream_request():
+    return request.args.get('stream', 'false').lower() in ('1', 'true', 'yes')
+
+class BatchInputError(Exception):
+    """The batch upload itself is unusable (as opposed to one bad document in it)."""
+
+def collect_batch_documents(uploads):
+    """
+    Reads every uploaded document for /parse_resumes into memory, expanding ZIP
+    archives. 'uploads' are (filename, binary file object) pairs. Returns
+    [(filename, pdf_bytes or None, error or None), ...] so a bad entry becomes
+    a per-item error instead of failing the batch.
+    """
+    documents = []
+    for name, upload in uploads:
+        name = name or ''
+        if name.lower().endswith('.zip'):
+            try:
+                documents.extend(read_zip_documents(upload))
+            except zipfile.BadZipFile as e:
+                documents.append((secure_filename(name), None, f"Invalid ZIP archive: {e}"))
+        elif name.lower().endswith('.pdf'):
+            documents.append((secure_filename(name), upload.read(), None))
+        else:
+            documents.append((secure_filename(name) or '<unnamed>', None, "Only PDF or ZIP files are allowed"))
+        if len(documents) > BATCH_MAX_FILES:
+            raise BatchInputError(f"Too many documents in one batch (max {BATCH_MAX_FILES})")
+    return documents
+
+def read_zip_documents(upload):
+    documents, total_bytes = [], 0
+    with zipfile.ZipFile(upload) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or info.filename.startswith('__MACOSX/'):
+                continue
+            if not name.lower().endswith('.pdf'):
+                documents.append((secure_filename(name), None, "Only PDF files are allowed"))
+                continue
+            total_bytes += info.file_size
+            if total_bytes > BATCH_MAX_UNCOMPRESSED_BYTES:
+                raise BatchInputError("ZIP archive expands past the allowed size")
+            if len(documents) >= BATCH_MAX_FILES:
+                raise BatchInputError(f"Too many documents in one batch (max {BATCH_MAX_FILES})")
+            documents.append((secure_filename(name), archive.read(info), None))
+    return documents
+
+def process_batch_item(index, filename, pdf_bytes):
+    try:
+        response_data, http_status = process_resume_in_background(io.BytesIO(pdf_bytes), filename)
+    except Exception as e:
+        logging.error(f"Batch item {index} ({filename}) crashed: {e}")
+        response_data, http_status = {"error": f"Internal server error: {e}"}, 500
+    return index, filename, response_data, http_status
+
+def batch_item_line(index, filename, response_data, http_status, response_format):
+    item = {"index": index, "filename": filename, "status": http_status}
+    if http_status < 400:
+        item["result"] = response_format.project(response_data)
+    else:
+        item["error"] = response_data.get("error", "Unknown error")
+    return dumps(item) + b"\n"
+
+def request_response_format():
+    """The fields/encoding this request asked for (see response_format.py). Raises ResponseFormatError."""
+    return ResponseFormat.from_request(request.args, request.headers, RESPONSE_COMPRESS_MIN_BYTES)
+
+@app.before_request
+def start_request_timing():
+    g.request_started = metrics.begin_request()
+
+@app.after_request
+def add_server_timing(response):
+    # Stage timings of this request (batch items run on pool threads and only show up in /metrics)
+    started = g.pop('request_started', None)
+    if started is not None:
+        response.headers['Server-Timing'] = metrics.end_request(request.endpoint or 'unknown', response.status_code, started)
+    return response
+
+@app.before_request
+def apply_route_upload_limits():
+    # Batches get their own (larger) body limit; everything else keeps MAX_CONTENT_LENGTH
+    if request.endpoint == 'parse_resumes':
+        request.max_content_length = BATCH_MAX_CONTENT_LENGTH
 
 # --- API Endpoint ---
 @app.route('/parse_resume', methods=['POST'])
@@ -131,90 +1084,218 @@ def parse_resume():
 
     if file and file.filename.lower().endswith('.pdf'):
         filename = secure_filename(file.filename)
-        unique_filename = f"uploads/{uuid.uuid4()}-{filename}"
-        logging.info(f"Received file: {filename}, saving to S3 as {unique_filename}")
-
-        # <--- START MLFLOW RUN ---
-        with mlflow.start_run(run_name=f"api_upload_{filename}") as run:
-            run_id = run.info.run_id
-            logging.info(f"Started MLflow Run ID: {run_id}")
-            mlflow.log_param("source", "api_upload")
-            mlflow.log_param("original_filename", filename)
-            mlflow.log_param("s3_key", unique_filename)
-            mlflow.log_param("s3_bucket", S3_BUCKET_NAME)
-        
+        category = request.form.get('category') or None
+        try:
+            response_format = request_response_format()
+        except ResponseFormatError as e:
+            return jsonify({"error": str(e)}), e.status
+
+        if is_async_request():
+            # The request stream is gone once we return, so hand the worker an in-memory copy
+            pdf_bytes = io.BytesIO(file.read())
             try:
-                # Upload to S3
-                s3_client.upload_fileobj(file, S3_BUCKET_NAME, unique_filename)
-                logging.info(f"File uploaded to S3: s3://{S3_BUCKET_NAME}/{unique_filename}")
-    
-                # Start Textract
-                job_id = start_textract_job(S3_BUCKET_NAME, unique_filename)
-                if not job_id:
-                    mlflow.log_metric("status", 0)
-                    return jsonify({"error": "Failed to start Textract job"}), 500
-                mlflow.log_param("textract_job_id", job_id)
-    
-                # Wait for Textract
-                if not wait_for_job_completion(job_id):
-                    mlflow.log_metric("status", 0)
-                    return jsonify({"error": "Textract job failed or timed out"}), 500
-    
-                # Get Results & Process
-                blocks = get_textract_results(job_id)
-                if not blocks:
-                    mlflow.log_metric("status", 0)
-                    return jsonify({"error": "Failed to get Textract results"}), 500
-    
-                extracted_text = extract_text_from_blocks(blocks)
-                rule_skills = find_skills_keyword_based(extracted_text, SKILL_KEYWORDS)
-                comp_entities = find_entities_comprehend(extracted_text)
-                combined_kws = combine_results(rule_skills, comp_entities, COMPREHEND_EXCLUDE)
-
-                # Log Metrics - mlflow
-                logging.info("Logging metrics...")
-                mlflow.log_metric("text_length_chars", len(extracted_text))
-                mlflow.log_metric("num_textract_blocks", len(blocks))
-                mlflow.log_metric("num_rule_based_skills", len(rule_skills))
-                mlflow.log_metric("num_comprehend_entities", len(comp_entities))
-                mlflow.log_metric("num_combined_keywords", len(combined_kws))
-                mlflow.log_metric("status", 1) # 1 for success
-                logging.info("Metrics logged.")
-
-                # Log Artifacts - mlflow
-                logging.info("Logging artifacts...")
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    # Save combined keywords
-                    keywords_path = os.path.join(tmpdir, "combined_keywords.json")
-                    with open(keywords_path, "w") as f:
-                        json.dump(combined_kws, f, indent=4)
-                    mlflow.log_artifact(keywords_path, "results")
-
-                    # Save extracted text
-                    text_path = os.path.join(tmpdir, "extracted_text.txt")
-                    with open(text_path, "w", encoding='utf-8') as f:
-                        f.write(extracted_text)
-                    mlflow.log_artifact(text_path, "results")
-                logging.info("Artifacts logged.")
-                
-                # Prepare Response
-                response_data = {
-                    "s3_path": f"s3://{S3_BUCKET_NAME}/{unique_filename}",
-                    "textract_job_id": job_id,
-                    "combined_keywords": combined_kws,
-                    "rule_based_skills": rule_skills,
-                    "comprehend_entities": comp_entities, # Send full details
-                    "text_snippet": extracted_text[:500] + "..."
-                }
-                return jsonify(response_data), 200
-    
-            except Exception as e:
-                logging.error(f"An error occurred during processing: {e}")
-                return jsonify({"error": f"Internal server error: {e}"}), 500
+                job_id = job_manager.submit(process_resume_in_background, pdf_bytes, filename, category)
+            except JobQueueFull as e:
+                logging.warning(f"Rejecting async upload {filename}: {e}")
+                response = jsonify({"error": "Too many resumes in flight, retry later"})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            status_url = url_for('get_job', job_id=job_id)
+            response = jsonify({"job_id": job_id, "status": JOB_QUEUED, "status_url": status_url})
+            response.headers['Location'] = status_url
+            return response, 202
+
+        if is_stream_request():
+            # NDJSON: header and page 1's keywords first, then the usual response (see stream_events)
+            events = stream_events(io.BytesIO(file.read()), filename, category, response_format)
+            events, headers = compress_lines(events, response_format)
+            return Response(stream_with_context(events), status=200, mimetype='application/x-ndjson', headers=headers)
+
+        response_data, http_status = process_resume(file, filename, category)
+        with metrics.stage("encode"):
+            body, headers = response_format.encode(response_data)
+        response = Response(body, status=http_status, headers=headers)
+        if http_status == 429:
+            response.headers['Retry-After'] = str(response_data["retry_after"])
+        return response, http_status
 
     else:
         return jsonify({"error": "Only PDF files are allowed"}), 400
 
+@app.route('/parse_resumes', methods=['POST'])
+def parse_resumes():
+    """
+    Bulk parsing: accepts many 'resumes' files and/or ZIP archives of PDFs and
+    streams one NDJSON line per document as each finishes (completion order,
+    not upload order), followed by a summary line. ?concurrency=N lowers the
+    per-request cap (at most BATCH_MAX_CONCURRENCY).
+    """
+    try:
+        uploads = request.files.getlist('resumes') + request.files.getlist('resume')
+        documents = collect_batch_documents([(upload.filename, upload) for upload in uploads])
+    except BatchInputError as e:
+        return jsonify({"error": str(e)}), 400
+    if not documents:
+        return jsonify({"error": "No files in the request (use the 'resumes' field)"}), 400
+    try:
+        concurrency = max(1, min(int(request.args.get('concurrency', BATCH_MAX_CONCURRENCY)), BATCH_MAX_CONCURRENCY))
+    except ValueError:
+        return jsonify({"error": "'concurrency' must be an integer"}), 400
+    try:
+        response_format = request_response_format()
+    except ResponseFormatError as e:
+        return jsonify({"error": str(e)}), e.status
+    logging.info(f"Batch of {len(documents)} document(s), concurrency {concurrency}")
+
+    def generate():
+        start = time.time()
+        succeeded = failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-item") as executor:
+            futures = []
+            for index, (filename, pdf_bytes, error) in enumerate(documents):
+                if error:
+                    failed += 1
+                    yield batch_item_line(index, filename, {"error": error}, 400, response_format)
+                else:
+                    futures.append(executor.submit(process_batch_item, index, filename, pdf_bytes))
+            for future in as_completed(futures):
+                index, filename, response_data, http_status = future.result()
+                if http_status < 400:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield batch_item_line(index, filename, response_data, http_status, response_format)
+        summary = {"total": len(documents), "succeeded": succeeded, "failed": failed,
+                   "elapsed_seconds": round(time.time() - start, 3)}
+        yield dumps({"summary": summary}) + b"\n"
+
+    lines, headers = compress_lines(generate(), response_format)
+    return Response(stream_with_context(lines), status=200, mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # ?wait=N long-polls for up to N seconds (capped) before answering
+    try:
+        wait = min(float(request.args.get('wait', 0)), ASYNC_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "'wait' must be a number of seconds"}), 400
+
+    try:
+        response_format = request_response_format()
+    except ResponseFormatError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    job = job_manager.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": f"Unknown job id: {job_id}"}), 404
+    if "combined_keywords" in (job.get("result") or {}):
+        # A parse result (not, say, a /reprocess summary): same fields and encodings as /parse_resume
+        job["result"] = response_format.project(job["result"])
+    body, headers = response_format.encode(job, project=False)
+    return Response(body, status=200, headers=headers)
+
+def run_search(args):
+    """
+    /search over the skill index. 'args' is the query string: q (boolean
+    expression, see skill_index.parse_query), category (repeatable), limit,
+    offset. Returns (response_data, http_status).
+    """
+    if skill_index is None:
+        return {"error": "Search is disabled (SKILL_INDEX_ENABLED=false)"}, 404
+    query = args.get('q', '')
+    try:
+        limit = max(1, min(int(args.get('limit', 20)), SEARCH_MAX_LIMIT))
+        offset = max(0, int(args.get('offset', 0)))
+    except ValueError:
+        return {"error": "'limit' and 'offset' must be integers"}, 400
+    start = time.perf_counter()
+    try:
+        with metrics.stage("search"):
+            found = skill_index.search(query, categories=args.getlist('category') or None, limit=limit, offset=offset)
+    except QueryError as e:
+        return {"error": f"Invalid query: {e}"}, 400
+    return {"query": query, **found, "limit": limit, "offset": offset,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)}, 200
+
+@app.route('/search', methods=['GET'])
+def search():
+    # e.g. /search?q=python AND (aws OR gcp) AND NOT java&category=INFORMATION-TECHNOLOGY
+    response_data, http_status = run_search(request.args)
+    return jsonify(response_data), http_status
+
+@app.route('/search/stats', methods=['GET'])
+def search_stats():
+    if skill_index is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **skill_index.stats()}), 200
+
+@app.route('/quota/stats', methods=['GET'])
+def quota_stats():
+    # This worker's queues and counters; token levels are shared by every worker on the host
+    return jsonify(quota_scheduler.snapshot()), 200
+
+@app.route('/ner/stats', methods=['GET'])
+def ner_stats():
+    # For 'hybrid', how much text this worker sent on to Comprehend
+    stats = entity_backend.snapshot() if hasattr(entity_backend, 'snapshot') else {}
+    return jsonify({"backend": entity_backend.name, **stats}), 200
+
+@app.route('/reprocess', methods=['POST'])
+def start_reprocess():
+    """
+    Applies the current skill taxonomy and config to every stored resume whose
+    results were derived under an older version, without OCR, as an async job
+    (poll the returned status_url). ?limit=N only takes the first N.
+    """
+    if ocr_store is None:
+        return jsonify({"error": "The OCR store is disabled (OCR_STORE_ENABLED=false)"}), 404
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    try:
+        job_id = job_manager.submit(run_reprocess, limit)
+    except JobQueueFull:
+        response = jsonify({"error": "Too many jobs in flight, retry later"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    status_url = url_for('get_job', job_id=job_id)
+    response = jsonify({"job_id": job_id, "status": JOB_QUEUED, "status_url": status_url, "version": result_version})
+    response.headers['Location'] = status_url
+    return response, 202
+
+@app.route('/ocr_store/stats', methods=['GET'])
+def ocr_store_stats():
+    if ocr_store is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **ocr_store.stats(result_version)}), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if result_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **result_cache.info()}), 200
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the worker is up and serving; deliberately checks nothing else
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = readiness_checks()
+    ready = all(checks.values())
+    return jsonify({"status": "ready" if ready else "not_ready", "checks": checks}), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, mimetype=content_type)
+
+@app.route('/tracking/stats', methods=['GET'])
+def tracking_stats():
+    return jsonify(tracker.snapshot()), 200
+
 # --- Run the App (for local testing only) ---
 if __name__ == '__main__':
     # For local testing, you might need to set env vars manually or use a .env file
@@ -0,0 +1,373 @@
+"""
+ASGI entry point: the Flask app's endpoints (api.py) with /parse_resume and
+/parse_resumes on the asyncio pipeline (async_pipeline.py). Both share the same
+stage functions, clients, cache, job state and tracker, so either can answer
+GET /jobs/<id> for a job the other accepted (with a shared ASYNC_STATE_DIR).
+Async jobs (?async=true, /reprocess) run on api.job_manager's threads as they
+do under Flask.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import io
+import os
+import time
+import asyncio
+import logging
+import functools
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.utils import secure_filename
+
+import api
+import metrics
+import quota
+from async_pipeline import AsyncPipeline, PipelineOverloaded
+from jobs import JobQueueFull, JOB_QUEUED
+from response_format import ResponseFormat, ResponseFormatError, dumps
+
+# Resumes accepted at once per worker; past this, uploads get a 503 with Retry-After
+ASYNC_MAX_IN_FLIGHT = int(os.environ.get('ASYNC_MAX_IN_FLIGHT', '500'))
+MAX_CONTENT_LENGTH = api.app.config['MAX_CONTENT_LENGTH']
+
+pipeline = AsyncPipeline(max_in_flight=ASYNC_MAX_IN_FLIGHT)
+
+
+def timed(endpoint):
+    """Records the request on /metrics and adds its Server-Timing header."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            started = metrics.begin_request()
+            response = await handler(request)
+            response.headers['Server-Timing'] = metrics.end_request(endpoint, response.status_code, started)
+            return response
+        return wrapper
+    return decorator
+
+
+class UploadTooLarge(Exception):
+    """The request body went past its size limit while being read."""
+
+
+def limit_body(request, max_bytes):
+    """
+    'request' with a body that raises UploadTooLarge once more than 'max_bytes'
+    have been read. Content-Length is checked up front too, but a chunked
+    upload doesn't send one, so the limit has to hold while the body arrives.
+    """
+    if int(request.headers.get('content-length') or 0) > max_bytes:
+        raise UploadTooLarge(f"Content-Length over {max_bytes} bytes")
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > max_bytes:
+                raise UploadTooLarge(f"Body over {max_bytes} bytes")
+        return message
+    return Request(request.scope, receive)
+
+
+def is_flag_set(request, name, default=False):
+    flag = request.query_params.get(name)
+    if flag is None:
+        return default
+    return flag.lower() in ('1', 'true', 'yes')
+
+
+def retry_later(message):
+    return JSONResponse({"error": message}, status_code=503, headers={'Retry-After': '5'})
+
+
+def job_accepted(job_id, **fields):
+    status_url = app.url_path_for('get_job', job_id=job_id)
+    return JSONResponse({"job_id": job_id, "status": JOB_QUEUED, "status_url": status_url, **fields},
+                        status_code=202, headers={'Location': status_url})
+
+
+@timed('parse_resume')
+async def parse_resume(request):
+    try:
+        async with limit_body(request, MAX_CONTENT_LENGTH).form(max_files=1) as form:
+            file = form.get('resume')
+            if file is None or isinstance(file, str):
+                return JSONResponse({"error": "No file part in the request"}, status_code=400)
+            if not file.filename:
+                return JSONResponse({"error": "No file selected for uploading"}, status_code=400)
+            if not file.filename.lower().endswith('.pdf'):
+                return JSONResponse({"error": "Only PDF files are allowed"}, status_code=400)
+            filename = secure_filename(file.filename)
+            category = form.get('category') or None
+            pdf_bytes = await file.read()
+    except UploadTooLarge:
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    try:
+        response_format = ResponseFormat.from_request(request.query_params, request.headers,
+                                                      api.RESPONSE_COMPRESS_MIN_BYTES)
+    except ResponseFormatError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+
+    if is_flag_set(request, 'async', api.ASYNC_MODE_DEFAULT):
+        try:
+            job_id = api.job_manager.submit(api.process_resume_in_background, io.BytesIO(pdf_bytes), filename,
+                                            category)
+        except JobQueueFull as e:
+            logging.warning(f"Rejecting async upload {filename}: {e}")
+            return retry_later("Too many resumes in flight, retry later")
+        return job_accepted(job_id)
+
+    if is_flag_set(request, 'stream'):
+        events, headers = compress_async_lines(stream_events(pdf_bytes, filename, category, response_format),
+                                               response_format)
+        return StreamingResponse(events, media_type='application/x-ndjson', headers=headers)
+    try:
+        response_data, http_status = await pipeline.process_resume(pdf_bytes, filename, category)
+    except PipelineOverloaded as e:
+        logging.warning(f"Rejecting upload {filename}: {e}")
+        return retry_later("Too many resumes in flight, retry later")
+    body, headers = response_format.encode(response_data)
+    if http_status == 429:
+        headers['Retry-After'] = str(response_data["retry_after"])
+    return Response(body, status_code=http_status, headers=headers)
+
+
+@timed('parse_resumes')
+async def parse_resumes(request):
+    """api.parse_resumes, with each document on the asyncio pipeline."""
+    try:
+        async with limit_body(request, api.BATCH_MAX_CONTENT_LENGTH).form(max_files=api.BATCH_MAX_FILES) as form:
+            uploads = [(upload.filename, upload.file) for upload in form.getlist('resumes') + form.getlist('resume')
+                       if not isinstance(upload, str)]
+            # Reads the spooled uploads and expands ZIPs, so off the loop
+            documents = await run_in_threadpool(api.collect_batch_documents, uploads)
+    except UploadTooLarge:
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    except api.BatchInputError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not documents:
+        return JSONResponse({"error": "No files in the request (use the 'resumes' field)"}, status_code=400)
+    try:
+        concurrency = max(1, min(int(request.query_params.get('concurrency', api.BATCH_MAX_CONCURRENCY)),
+                                 api.BATCH_MAX_CONCURRENCY))
+    except ValueError:
+        return JSONResponse({"error": "'concurrency' must be an integer"}, status_code=400)
+    try:
+        response_format = ResponseFormat.from_request(request.query_params, request.headers,
+                                                      api.RESPONSE_COMPRESS_MIN_BYTES)
+    except ResponseFormatError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+    logging.info(f"Batch of {len(documents)} document(s), concurrency {concurrency}")
+    lines, headers = compress_async_lines(batch_lines(documents, concurrency, response_format), response_format)
+    return StreamingResponse(lines, media_type='application/x-ndjson', headers=headers)
+
+
+async def batch_lines(documents, concurrency, response_format):
+    """The NDJSON lines of api.parse_resumes: one per document as it finishes, then a summary."""
+    start = time.time()
+    succeeded = failed = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def process(index, filename, pdf_bytes):
+        async with slots:
+            # Bulk priority, like the Flask batch items, so interactive uploads get quota first
+            with quota.priority(api.PRIORITY_BULK):
+                try:
+                    response_data, http_status = await pipeline.process_resume(pdf_bytes, filename)
+                except PipelineOverloaded as e:
+                    response_data, http_status = {"error": f"Too many resumes in flight, retry later ({e})"}, 503
+                except Exception as e:
+                    logging.error(f"Batch item {index} ({filename}) crashed: {e}")
+                    response_data, http_status = {"error": f"Internal server error: {e}"}, 500
+        return index, filename, response_data, http_status
+
+    tasks = []
+    for index, (filename, pdf_bytes, error) in enumerate(documents):
+        if error:
+            failed += 1
+            yield api.batch_item_line(index, filename, {"error": error}, 400, response_format)
+        else:
+            tasks.append(asyncio.ensure_future(process(index, filename, pdf_bytes)))
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            index, filename, response_data, http_status = await next_item
+            if http_status < 400:
+                succeeded += 1
+            else:
+                failed += 1
+            yield api.batch_item_line(index, filename, response_data, http_status, response_format)
+    finally:
+        # The client went away mid-batch: don't keep parsing for nobody
+        for task in tasks:
+            task.cancel()
+    summary = {"total": len(documents), "succeeded": succeeded, "failed": failed,
+               "elapsed_seconds": round(time.time() - start, 3)}
+    yield dumps({"summary": summary}) + b"\n"
+
+
+async def stream_events(pdf_bytes, filename, category, response_format):
+    """The NDJSON events of api.stream_events, from the asyncio pipeline."""
+    events = asyncio.Queue()
+    task = asyncio.ensure_future(pipeline.process_resume(pdf_bytes, filename, category, on_event=events.put_nowait))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    while (event := await events.get()) is not None:
+        yield dumps(event) + b"\n"
+    try:
+        response_data, http_status = task.result()
+    except PipelineOverloaded as e:
+        logging.warning(f"Rejecting upload {filename}: {e}")
+        response_data, http_status = {"error": "Too many resumes in flight, retry later", "retry_after": 5}, 503
+    except Exception as e:
+        logging.error(f"Streaming upload {filename} crashed: {e}")
+        response_data, http_status = {"error": f"Internal server error: {e}"}, 500
+    event = {"event": "result", "status": http_status}
+    if http_status < 400:
+        event["result"] = response_format.project(response_data)
+    else:
+        event.update(response_data)
+    yield dumps(event) + b"\n"
+
+
+def compress_async_lines(lines, response_format):
+    """compress_lines for an async generator of lines."""
+    encode, finish, headers = response_format.stream_encoder()
+    if encode is None:
+        return lines, headers
+
+    async def compressed():
+        async for line in lines:
+            yield encode(line)
+        yield finish()
+    return compressed(), headers
+
+
+async def get_job(request):
+    job_id = request.path_params['job_id']
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), api.ASYNC_MAX_WAIT_SECONDS)
+    except ValueError:
+        return JSONResponse({"error": "'wait' must be a number of seconds"}, status_code=400)
+    try:
+        response_format = ResponseFormat.from_request(request.query_params, request.headers,
+                                                      api.RESPONSE_COMPRESS_MIN_BYTES)
+    except ResponseFormatError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+
+    # A long poll blocks on the job's event, so it waits on a thread
+    job = await run_in_threadpool(api.job_manager.get, job_id, wait)
+    if job is None:
+        return JSONResponse({"error": f"Unknown job id: {job_id}"}, status_code=404)
+    if "combined_keywords" in (job.get("result") or {}):
+        job["result"] = response_format.project(job["result"])
+    body, headers = response_format.encode(job, project=False)
+    return Response(body, status_code=200, headers=headers)
+
+
+async def start_reprocess(request):
+    """api.start_reprocess."""
+    if api.ocr_store is None:
+        return JSONResponse({"error": "The OCR store is disabled (OCR_STORE_ENABLED=false)"}, status_code=404)
+    try:
+        limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+    except ValueError:
+        return JSONResponse({"error": "'limit' must be an integer"}, status_code=400)
+    try:
+        job_id = api.job_manager.submit(api.run_reprocess, limit)
+    except JobQueueFull:
+        return retry_later("Too many jobs in flight, retry later")
+    return job_accepted(job_id, version=api.result_version)
+
+
+@timed('search')
+async def search(request):
+    response_data, http_status = await run_in_threadpool(api.run_search, request.query_params)
+    return JSONResponse(response_data, status_code=http_status)
+
+
+async def search_stats(request):
+    if api.skill_index is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **await run_in_threadpool(api.skill_index.stats)})
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def readyz(request):
+    checks = await run_in_threadpool(api.readiness_checks)
+    ready = all(checks.values())
+    return JSONResponse({"status": "ready" if ready else "not_ready", "checks": checks},
+                        status_code=200 if ready else 503)
+
+
+async def prometheus_metrics(request):
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
+async def pipeline_stats(request):
+    return JSONResponse(pipeline.snapshot())
+
+
+async def quota_stats(request):
+    return JSONResponse(api.quota_scheduler.snapshot())
+
+
+async def tracking_stats(request):
+    return JSONResponse(api.tracker.snapshot())
+
+
+async def ner_stats(request):
+    stats = api.entity_backend.snapshot() if hasattr(api.entity_backend, 'snapshot') else {}
+    return JSONResponse({"backend": api.entity_backend.name, **stats})
+
+
+async def ocr_store_stats(request):
+    if api.ocr_store is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **await run_in_threadpool(api.ocr_store.stats, api.result_version)})
+
+
+async def cache_stats(request):
+    if api.result_cache is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **await run_in_threadpool(api.result_cache.info)})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Same per-worker setup and teardown gunicorn.conf.py does for the Flask workers
+    await run_in_threadpool(api.init_worker)
+    yield
+    pipeline.close()
+    await run_in_threadpool(api.tracker.close, api.MLFLOW_SHUTDOWN_TIMEOUT)
+
+
+app = Starlette(
+    routes=[
+        Route('/parse_resume', parse_resume, methods=['POST']),
+        Route('/parse_resumes', parse_resumes, methods=['POST']),
+        Route('/jobs/{job_id}', get_job, methods=['GET'], name='get_job'),
+        Route('/reprocess', start_reprocess, methods=['POST']),
+        Route('/search', search, methods=['GET']),
+        Route('/search/stats', search_stats, methods=['GET']),
+        Route('/healthz', healthz, methods=['GET']),
+        Route('/readyz', readyz, methods=['GET']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+        Route('/pipeline/stats', pipeline_stats, methods=['GET']),
+        Route('/quota/stats', quota_stats, methods=['GET']),
+        Route('/tracking/stats', tracking_stats, methods=['GET']),
+        Route('/ner/stats', ner_stats, methods=['GET']),
+        Route('/ocr_store/stats', ocr_store_stats, methods=['GET']),
+        Route('/cache/stats', cache_stats, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
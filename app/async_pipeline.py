@@ -0,0 +1,219 @@
+"""
+asyncio version of api.process_resume, served by asgi.py.
+
+It runs the same stage functions as the Flask app. boto3 is blocking, so every
+AWS call (and every CPU-bound step) still runs on a thread, but only while it
+holds a slot for its downstream service; a resume waiting on an async Textract
+job holds neither a thread nor a slot (the shared poller resolves a future),
+and one waiting for a slot is just a parked coroutine. That lets one worker
+keep hundreds of resumes in flight while each service only ever sees its own
+concurrency limit.
+"""
+import io
+import os
+import time
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import api
+import metrics
+
+# Downstream services with their own concurrency limit. 'local' covers work done
+# in-process: hashing, PDF parsing, cache I/O, skill matching, MLflow hand-off.
+SERVICES = ('s3', 'textract', 'comprehend', 'local')
+
+
+def limits_from_env():
+    return {
+        's3': int(os.environ.get('ASYNC_S3_CONCURRENCY', '32')),
+        'textract': int(os.environ.get('ASYNC_TEXTRACT_CONCURRENCY', '16')),
+        'comprehend': int(os.environ.get('ASYNC_COMPREHEND_CONCURRENCY', '8')),
+        'local': int(os.environ.get('ASYNC_LOCAL_CONCURRENCY', str(max(4, os.cpu_count() or 1)))),
+    }
+
+
+class PipelineOverloaded(Exception):
+    """More resumes are in flight than the worker accepts; the caller should retry later."""
+
+
+class AsyncPipeline:
+    def __init__(self, limits=None, max_in_flight=500):
+        self.limits = dict(limits or limits_from_env())
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._semaphores = {service: asyncio.Semaphore(self.limits[service]) for service in SERVICES}
+        # Never more threads busy than the slots handed out, so the pool can't become the bottleneck
+        self._executor = ThreadPoolExecutor(max_workers=sum(self.limits.values()), thread_name_prefix="async-pipeline")
+        self._read_and_hash = metrics.instrumented("read")(lambda pdf_bytes: api.read_and_hash(io.BytesIO(pdf_bytes)))
+
+    async def call(self, service, fn, *args):
+        """Runs a blocking fn(*args) on the pool once 'service' has a free slot."""
+        async with self._semaphores[service]:
+            loop = asyncio.get_running_loop()
+            # Carry the request's context over so the stage lands in its Server-Timing header
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args))
+
+    def snapshot(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "limits": self.limits,
+            # Semaphore._value is the number of free slots; there's no public accessor
+            "busy": {service: self.limits[service] - sem._value for service, sem in self._semaphores.items()},
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Pipeline ---
+    async def process_resume(self, pdf_bytes, filename, category=None, on_event=None):
+        """
+        Same contract as api.process_resume, for a document already read into
+        memory. 'on_event' is called on the event loop.
+        """
+        if self.in_flight >= self.max_in_flight:
+            raise PipelineOverloaded(f"{self.in_flight} resumes already in flight")
+        self.in_flight += 1
+        try:
+            return await self._process(pdf_bytes, filename, category, on_event)
+        finally:
+            self.in_flight -= 1
+
+    async def _process(self, pdf_bytes, filename, category, on_event):
+        # The steps are api.process_resume's; what's here is only which of them run concurrently, and where
+        pdf_bytes, content_hash = await self.call('local', self._read_and_hash, pdf_bytes)
+        metrics.observe_document(num_bytes=len(pdf_bytes))
+        cached = await self.call('local', api.cached_result, content_hash, filename)
+        if cached is not None:
+            if on_event is not None:
+                for event in await self.call('local', api.cache_hit_events, filename, content_hash, cached):
+                    on_event(event)
+            return api.build_response(cached, content_hash, cache_hit=True), 200
+
+        unique_filename = api.upload_key(filename)
+        on_first_page, early_first_page = None, []
+        if on_event is not None:
+            on_event(api.header_event(filename, content_hash))
+
+            def on_first_page(page_text):
+                early_first_page.append(asyncio.ensure_future(self.send_first_page(page_text, on_event)))
+
+        run = api.start_tracking_run(filename, unique_filename, content_hash)
+        try:
+            extraction, stored_entities = await self.call('local', api.stored_extraction, content_hash, run)
+            if extraction is None:
+                extraction = await self.extract_document(pdf_bytes, unique_filename, on_first_page)
+
+            extracted_text = api.extract_text_from_blocks(extraction["blocks"])
+            signature, near_duplicate = await self.call('local', api.check_near_duplicate, content_hash,
+                                                        extracted_text)
+            comp_entities = api.reused_entities(stored_entities, near_duplicate)
+            if comp_entities is not None:
+                rule_skills = await self.call('local', api.find_skills_keyword_based, extracted_text, api.skill_matcher)
+            else:
+                rule_skills, comp_entities = await asyncio.gather(
+                    self.call('local', api.find_skills_keyword_based, extracted_text, api.skill_matcher),
+                    # A local entity backend is CPU work, not a Comprehend call
+                    self.call('comprehend' if api.entity_backend.remote else 'local', api.find_entities_comprehend,
+                              extracted_text),
+                )
+            result = await self.call('local', api.save_result, run, content_hash, filename, category, extraction,
+                                     extracted_text, rule_skills, comp_entities, near_duplicate, signature)
+            # Page 1 always goes out before the result: wait for the early one, or take it from the result
+            if on_event is not None and not (early_first_page and await early_first_page[0]):
+                on_event(await self.call('local', api.first_page_from_result, extraction["blocks"], result))
+            return api.build_response(result, content_hash), 200
+        except Exception as e:
+            return api.failed_response(run, filename, e)
+        finally:
+            # Off the loop: with MLFLOW_QUEUE_FULL_POLICY=block, submit() can wait for queue space
+            await self.call('local', api.submit_run, run)
+
+    async def send_first_page(self, page_text, on_event):
+        """Sends page 1's keywords ahead of the other pages. Returns whether they were sent."""
+        try:
+            on_event(await self.call('comprehend' if api.entity_backend.remote else 'local', api.detect_first_page,
+                                     page_text))
+            return True
+        except Exception as e:
+            logging.warning(f"Early first-page detection failed ({e}); sending page 1 with the result")
+            return False
+
+    async def extract_document(self, pdf_bytes, s3_key, on_first_page=None):
+        decisions, text_layer_ms = await self.call('local', api.route_document, pdf_bytes)
+        to_ocr = await self.call('local', api.pages_to_ocr, pdf_bytes, decisions)
+        ocr, textract_ms = None, 0.0
+        if to_ocr is not None:
+            on_page = None
+            if on_first_page is not None:
+                first_page_text, on_page = api.early_first_page(decisions, *to_ocr, on_first_page)
+                if first_page_text is not None:
+                    on_first_page(first_page_text)
+            start = time.perf_counter()
+            ocr = await self.ocr_pages(pdf_bytes, s3_key, *to_ocr, on_page=on_page)
+            textract_ms = (time.perf_counter() - start) * 1000
+        return await self.call('local', api.assemble_extraction, pdf_bytes, s3_key, decisions, text_layer_ms, ocr,
+                               textract_ms)
+
+    async def ocr_pages(self, pdf_bytes, s3_key, page_numbers, total_pages, on_page=None):
+        """api.ocr_pages with the sync pages and the S3 uploads overlapped."""
+        num_pages, sync, subset_key = api.plan_ocr(pdf_bytes, s3_key, page_numbers, total_pages)
+        if sync:
+            with api.falling_back_to_async_job(s3_key):
+                blocks = await self.run_textract_sync(pdf_bytes, page_numbers, on_page)
+                return blocks, None, api.sync_archive_path(pdf_bytes, s3_key), "sync"
+
+        if subset_key is None:
+            job_id, blocks = await self.run_textract(pdf_bytes, s3_key, num_pages)
+        else:
+            # The original is only kept for the record, so upload it while the page subset is OCR'd
+            subset = await self.call('local', api.build_page_subset, pdf_bytes, page_numbers)
+            _, (job_id, blocks) = await asyncio.gather(
+                self.call('s3', api.upload_to_s3, pdf_bytes, s3_key),
+                self.run_textract(subset, subset_key, num_pages),
+            )
+        return blocks, job_id, f"s3://{api.S3_BUCKET_NAME}/{s3_key}", "async"
+
+    async def run_textract_sync(self, pdf_bytes, page_numbers, on_page=None):
+        """api.run_textract_sync; 'on_page' is called on the loop as each page arrives."""
+        async def detect(position, page):
+            return position, await self.call('textract', api.detect_page_sync, page, position)
+
+        with metrics.stage("textract_sync"):
+            if page_numbers is None:
+                page_numbers, pages = [1], [pdf_bytes]
+            else:
+                pages = await self.call('local', api.split_pages, pdf_bytes, page_numbers)
+            page_stores = [None] * len(pages)
+            for next_page in asyncio.as_completed([detect(i, page) for i, page in enumerate(pages, start=1)]):
+                position, page_store = await next_page
+                page_stores[position - 1] = page_store
+                if on_page is not None:
+                    on_page(page_numbers[position - 1], page_store)
+        return api.merge_pages(page_stores)
+
+    async def run_textract(self, pdf_bytes, s3_key, num_pages):
+        await self.call('s3', api.upload_to_s3, pdf_bytes, s3_key)
+        logging.info(f"File uploaded to S3: s3://{api.S3_BUCKET_NAME}/{s3_key}")
+
+        # Waiting for a job slot parks the coroutine, not a thread
+        slot = await api.quota_scheduler.acquire_async('textract_jobs')
+        try:
+            job_id = await self.call('textract', api.start_textract_job, api.S3_BUCKET_NAME, s3_key)
+            if not job_id:
+                raise api.ExtractionError("Failed to start Textract job")
+            with metrics.stage("textract_wait"):
+                succeeded = await api.textract_poller.wait_async(job_id, timeout=api.TEXTRACT_JOB_TIMEOUT,
+                                                                 pages=num_pages)
+            if not succeeded:
+                raise api.ExtractionError("Textract job failed or timed out")
+            blocks = await self.call('textract', api.get_textract_results, job_id)
+        finally:
+            api.quota_scheduler.release('textract_jobs', slot)
+        if not blocks:
+            raise api.ExtractionError("Failed to get Textract results")
+        return job_id, blocks
@@ -0,0 +1,72 @@
+import os
+import threading
+
+
+def client_config_from_env(prefix='AWS_'):
+    """
+    botocore Config options for the shared clients, overridable per deployment:
+    connection pool size, timeouts and retry behaviour. Adaptive retry mode adds
+    client-side rate limiting on top of the standard exponential backoff, so a
+    throttled service gets fewer requests instead of more retries.
+    """
+    return {
+        'max_pool_connections': int(os.environ.get(f'{prefix}MAX_POOL_CONNECTIONS', '64')),
+        'connect_timeout': float(os.environ.get(f'{prefix}CONNECT_TIMEOUT', '5')),
+        'read_timeout': float(os.environ.get(f'{prefix}READ_TIMEOUT', '60')),
+        'retries': {
+            'mode': os.environ.get(f'{prefix}RETRY_MODE', 'adaptive'),
+            'max_attempts': int(os.environ.get(f'{prefix}MAX_ATTEMPTS', '5')),
+        },
+        'tcp_keepalive': os.environ.get(f'{prefix}TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes'),
+    }
+
+
+def without_retries(config):
+    """
+    'config' with botocore's own retries turned off, for clients whose calls go
+    through the quota scheduler: it already retries throttling with backoff
+    (QuotaScheduler.call), and botocore retrying underneath would multiply both
+    the requests sent and the time spent backing off.
+    """
+    return dict(config, retries={'mode': 'standard', 'max_attempts': 1})
+
+
+class LazyClient:
+    """
+    Stands in for a boto3 client and builds the real one on first use, once
+    per process. Nothing touches boto3 at import time, and under gunicorn
+    --preload each forked worker gets its own client (and connection pool)
+    instead of sharing sockets inherited from the master.
+    """
+
+    def __init__(self, service_name, region_name=None, wrap=None, config=None, **client_kwargs):
+        self.service_name = service_name
+        self.region_name = region_name
+        self.wrap = wrap  # optional fn(client, service_name) applied once the client exists
+        self.config = config  # botocore Config options as a dict, so botocore isn't imported until it's needed
+        self.client_kwargs = client_kwargs
+        self._client = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None or self._owner_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._owner_pid != os.getpid():
+                    import boto3
+                    from botocore.config import Config
+                    kwargs = dict(self.client_kwargs)
+                    if self.config:
+                        kwargs['config'] = Config(**self.config)
+                    # A session per process: boto3's default session isn't safe to share across threads or forks
+                    client = boto3.session.Session().client(self.service_name, region_name=self.region_name, **kwargs)
+                    self._client = self.wrap(client, self.service_name) if self.wrap else client
+                    self._owner_pid = os.getpid()
+        return self._client
+
+    @property
+    def created(self):
+        return self._client is not None and self._owner_pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
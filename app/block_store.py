@@ -0,0 +1,185 @@
+import math
+from array import array
+
+from text_layer import SOURCE_TEXT_LAYER, SOURCE_TEXTRACT
+
+KIND_LINE = 0
+KIND_WORD = 1
+_KIND_CODES = {"LINE": KIND_LINE, "WORD": KIND_WORD}
+_SOURCES = [SOURCE_TEXT_LAYER, SOURCE_TEXTRACT]
+_SOURCE_CODES = {source: code for code, source in enumerate(_SOURCES)}
+_NO_BOX = (math.nan, math.nan, math.nan, math.nan)
+
+
+def iter_textract_blocks(textract_client, job_id):
+    """Yields the blocks of a finished async text-detection job one result page at a time."""
+    next_token = None
+    while True:
+        params = {'JobId': job_id}
+        if next_token:
+            params['NextToken'] = next_token
+        response = textract_client.get_document_text_detection(**params)
+        yield from response.get('Blocks', [])
+        next_token = response.get('NextToken')
+        if not next_token:
+            return
+
+
+class BlockStore:
+    """
+    Compact columnar store for the LINE and WORD blocks of a document.
+
+    Textract returns large nested dicts (polygons, relationships, ids) of which
+    we only use the text, page, confidence and bounding box. Texts live in one
+    string buffer addressed by end offsets; the rest sits in typed arrays
+    (float32 for confidences and Left/Top/Width/Height boxes). Rows keep the
+    order they were added in, which is page order for everything we build.
+    """
+
+    def __init__(self):
+        self._chunks = []            # pending text, joined into one buffer on first read
+        self._ends = array('L')      # end offset of each row's text in the buffer
+        self._size = 0
+        self.kinds = array('B')
+        self.pages = array('H')
+        self.sources = array('B')
+        self.confidences = array('f')
+        self.boxes = array('f')      # 4 per row: left, top, width, height
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # --- Building ---
+    def add(self, kind, text, page, source, confidence=math.nan, box=_NO_BOX):
+        self._chunks.append(text)
+        self._size += len(text)
+        self._ends.append(self._size)
+        self.kinds.append(kind)
+        self.pages.append(page)
+        self.sources.append(_SOURCE_CODES[source])
+        self.confidences.append(confidence)
+        self.boxes.extend(box)
+
+    def add_textract_blocks(self, blocks, page=None):
+        """
+        Keeps the LINE/WORD fields we need from an iterable of Textract blocks
+        (a generator is fine, nothing else is held on to). 'page' overrides the
+        blocks' own Page, e.g. for single-page synchronous calls. Returns self.
+        """
+        for block in blocks:
+            kind = _KIND_CODES.get(block['BlockType'])
+            if kind is None:
+                continue
+            bbox = block.get('Geometry', {}).get('BoundingBox')
+            box = (bbox['Left'], bbox['Top'], bbox['Width'], bbox['Height']) if bbox else _NO_BOX
+            self.add(kind, block.get('Text', ''), page or block.get('Page', 1), SOURCE_TEXTRACT,
+                     block.get('Confidence', math.nan), box)
+        return self
+
+    def add_text_layer_page(self, text, page):
+        """Adds embedded-text output as LINE rows, shaped like Textract lines."""
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
+                self.add(KIND_LINE, line, page, SOURCE_TEXT_LAYER)
+
+    def copy_row(self, other, index, page=None):
+        self.add(other.kinds[index], other.text_at(index), page or other.pages[index], _SOURCES[other.sources[index]],
+                 other.confidences[index], other.box(index))
+
+    def extend(self, other):
+        for index in range(len(other)):
+            self.copy_row(other, index)
+
+    # --- Reading ---
+    @property
+    def buffer(self):
+        if len(self._chunks) != 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0]
+
+    def text_at(self, index):
+        start = self._ends[index - 1] if index else 0
+        return self.buffer[start:self._ends[index]]
+
+    def box(self, index):
+        return tuple(self.boxes[index * 4:index * 4 + 4])
+
+    def rows(self, kind=KIND_LINE):
+        return (i for i, k in enumerate(self.kinds) if k == kind)
+
+    def lines(self):
+        """Yields (text, page) for every LINE row."""
+        for index in self.rows(KIND_LINE):
+            yield self.text_at(index), self.pages[index]
+
+    def text(self):
+        """The document text, one LINE per line (what extract_text_from_blocks used to build)."""
+        return "\n".join(text for text, _ in self.lines())
+
+    def page_text(self, page):
+        """One page's text, laid out as in text(); the first page's is where text() starts."""
+        return "\n".join(text for text, line_page in self.lines() if line_page == page)
+
+    def count(self, kind=KIND_LINE):
+        return sum(1 for k in self.kinds if k == kind)
+
+    def page_numbers(self):
+        return sorted({self.pages[i] for i in self.rows(KIND_LINE)})
+
+    def mean_confidence(self, source=SOURCE_TEXTRACT):
+        """Mean LINE confidence for rows from 'source', or None if there are none."""
+        code = _SOURCE_CODES[source]
+        values = [self.confidences[i] for i in self.rows(KIND_LINE) if self.sources[i] == code]
+        return sum(values) / len(values) if values else None
+
+    def nbytes(self):
+        arrays = (self._ends, self.kinds, self.pages, self.sources, self.confidences, self.boxes)
+        return sum(a.itemsize * len(a) for a in arrays) + len(self.buffer.encode('utf-8'))
+
+    # --- Serialisation (result cache) ---
+    def to_dict(self):
+        return {
+            "text": self.buffer,
+            "ends": self._ends.tolist(),
+            "kinds": self.kinds.tolist(),
+            "pages": self.pages.tolist(),
+            "sources": [_SOURCES[code] for code in self.sources],
+            "confidences": [None if math.isnan(c) else round(c, 3) for c in self.confidences],
+            "boxes": [None if math.isnan(v) else round(v, 5) for v in self.boxes],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        store = cls()
+        store._chunks = [data["text"]]
+        store._size = len(data["text"])
+        store._ends = array('L', data["ends"])
+        store.kinds = array('B', data["kinds"])
+        store.pages = array('H', data["pages"])
+        store.sources = array('B', [_SOURCE_CODES[s] for s in data["sources"]])
+        store.confidences = array('f', [math.nan if c is None else c for c in data["confidences"]])
+        store.boxes = array('f', [math.nan if v is None else v for v in data["boxes"]])
+        return store
+
+
+def merge_page_stores(decisions, ocr_store, ocr_page_numbers):
+    """
+    Merges text-layer pages with Textract output back into original page order.
+    'ocr_store' came from OCR over just 'ocr_page_numbers', so its page numbers
+    (1..n) are remapped to the original ones.
+    """
+    rows_by_page = {}
+    if ocr_store is not None:
+        for index, page in enumerate(ocr_store.pages):
+            rows_by_page.setdefault(page, []).append(index)
+    subset_page = {original: position for position, original in enumerate(ocr_page_numbers, start=1)}
+
+    merged = BlockStore()
+    for decision in decisions:
+        if decision["source"] == SOURCE_TEXT_LAYER:
+            merged.add_text_layer_page(decision["text"], decision["page"])
+        else:
+            for index in rows_by_page.get(subset_page.get(decision["page"]), []):
+                merged.copy_row(ocr_store, index, page=decision["page"])
+    return merged
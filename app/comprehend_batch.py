@@ -0,0 +1,166 @@
+import re
+import bisect
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+COMPREHEND_MAX_BYTES = 5000   # per-document UTF-8 limit for (Batch)DetectEntities
+COMPREHEND_BATCH_SIZE = 25    # documents per BatchDetectEntities call
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;])\s+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _utf8_len(text):
+    return len(text.encode("utf-8"))
+
+
+def _split_piece(piece, max_bytes):
+    """Splits one over-long line at sentence ends, then whitespace, then (last resort) any character."""
+    for splitter in (_SENTENCE_END_RE, _WHITESPACE_RE):
+        parts, last = [], 0
+        for m in splitter.finditer(piece):
+            parts.append(piece[last:m.end()])
+            last = m.end()
+        parts.append(piece[last:])
+        parts = [part for part in parts if part]
+        if len(parts) > 1:
+            out = []
+            for part in parts:
+                out.extend(_split_piece(part, max_bytes) if _utf8_len(part) > max_bytes else [part])
+            return out
+    # No whitespace at all: cut on character boundaries so we never split a UTF-8 sequence
+    out, current, size = [], [], 0
+    for ch in piece:
+        ch_size = _utf8_len(ch)
+        if size + ch_size > max_bytes:
+            out.append("".join(current))
+            current, size = [], 0
+        current.append(ch)
+        size += ch_size
+    out.append("".join(current))
+    return out
+
+
+def chunk_text(text, max_bytes=COMPREHEND_MAX_BYTES):
+    """
+    Splits text into line-aligned chunks of at most 'max_bytes' UTF-8 bytes
+    (lines longer than that are split at sentence ends or whitespace).
+    Returns [(char_offset_in_text, chunk), ...]; the chunks concatenate back to the text.
+    """
+    if not text:
+        return []
+    pieces = []
+    for line in text.splitlines(keepends=True):
+        pieces.extend(_split_piece(line, max_bytes) if _utf8_len(line) > max_bytes else [line])
+
+    chunks, current, current_bytes, offset, chunk_start = [], [], 0, 0, 0
+    for piece in pieces:
+        piece_bytes = _utf8_len(piece)
+        if current and current_bytes + piece_bytes > max_bytes:
+            chunks.append((chunk_start, "".join(current)))
+            current, current_bytes, chunk_start = [], 0, offset
+        current.append(piece)
+        current_bytes += piece_bytes
+        offset += len(piece)
+    if current:
+        chunks.append((chunk_start, "".join(current)))
+    return chunks
+
+
+def merge_entities(entities, text=None, boundaries=()):
+    """
+    Drops duplicates that overlap another entity of the same type, keeping the
+    higher-scoring one. With the document 'text' and the chunk 'boundaries'
+    (offsets where one chunk ends and the next starts), an entity cut in two
+    by a boundary ("John " | "Smith") comes back as two same-type pieces
+    separated by nothing but spaces; those are joined into one. Input must
+    already use whole-document offsets. Output is sorted by position.
+    """
+    merged = []
+    boundaries = sorted(boundaries)
+    for entity in sorted(entities, key=lambda e: (e['BeginOffset'], -e['EndOffset'])):
+        previous = merged[-1] if merged else None
+        if previous is not None and previous['Type'] == entity['Type']:
+            if entity['BeginOffset'] < previous['EndOffset']:
+                if entity.get('Score', 0) > previous.get('Score', 0):
+                    merged[-1] = entity
+                continue
+            if text is not None and _cut_at_boundary(previous, entity, text, boundaries):
+                merged[-1] = dict(previous, EndOffset=entity['EndOffset'],
+                                  Text=text[previous['BeginOffset']:entity['EndOffset']],
+                                  Score=min(previous.get('Score', 0), entity.get('Score', 0)))
+                continue
+        merged.append(entity)
+    return merged
+
+
+def _cut_at_boundary(left, right, text, boundaries):
+    gap = text[left['EndOffset']:right['BeginOffset']]
+    if gap.strip(" \t") or not boundaries:
+        return False
+    i = bisect.bisect_left(boundaries, left['EndOffset'])
+    return i < len(boundaries) and boundaries[i] <= right['BeginOffset']
+
+
+class ComprehendChunker:
+    """
+    Full-document entity detection: chunks the text, sends chunks 25 at a time
+    through BatchDetectEntities with several batches in flight on a shared
+    pool, and remaps offsets back onto the whole document.
+    """
+
+    def __init__(self, comprehend_client, max_concurrency=4, max_bytes=COMPREHEND_MAX_BYTES,
+                 batch_size=COMPREHEND_BATCH_SIZE, language_code='en'):
+        self.comprehend_client = comprehend_client
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.language_code = language_code
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="comprehend")
+
+    def detect_entities(self, text):
+        chunks = chunk_text(text, self.max_bytes)
+        # Blank chunks (runs of empty lines) are rejected by the API, so don't send them
+        chunks = [(start, chunk) for start, chunk in chunks if chunk.strip()]
+        if not chunks:
+            return []
+        batches = [chunks[i:i + self.batch_size] for i in range(0, len(chunks), self.batch_size)]
+        if len(batches) == 1:
+            results = [self._detect_batch(batches[0])]
+        else:
+            # Each batch runs in a copy of the caller's context (keeps its quota priority)
+            contexts = [contextvars.copy_context() for _ in batches]
+            results = list(self._executor.map(lambda context, batch: context.run(self._detect_batch, batch),
+                                              contexts, batches))
+        entities = [entity for batch_entities in results for entity in batch_entities]
+        logging.info(f"Comprehend: {len(chunks)} chunk(s) in {len(batches)} batch(es), {len(entities)} entities")
+        return merge_entities(entities, text, [start for start, _ in chunks[1:]])
+
+    def _detect_batch(self, batch):
+        response = self.comprehend_client.batch_detect_entities(
+            TextList=[chunk for _, chunk in batch], LanguageCode=self.language_code)
+        entities = []
+        for result in response.get('ResultList', []):
+            entities.extend(self._remap(result.get('Entities', []), batch[result['Index']][0]))
+
+        for error in response.get('ErrorList', []):
+            # Retry failed items one by one rather than losing their entities
+            start, chunk = batch[error['Index']]
+            logging.warning(f"Comprehend batch item {error['Index']} failed ({error.get('ErrorCode')}); retrying alone")
+            try:
+                single = self.comprehend_client.detect_entities(Text=chunk, LanguageCode=self.language_code)
+                entities.extend(self._remap(single.get('Entities', []), start))
+            except Exception as e:
+                logging.error(f"Error calling Comprehend for chunk at offset {start}: {e}")
+        return entities
+
+    @staticmethod
+    def _remap(entities, char_offset):
+        remapped = []
+        for entity in entities:
+            entity = dict(entity)
+            if 'BeginOffset' in entity:
+                entity['BeginOffset'] += char_offset
+                entity['EndOffset'] += char_offset
+            remapped.append(entity)
+        return remapped
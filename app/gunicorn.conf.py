@@ -0,0 +1,54 @@
+# Picked up automatically by gunicorn from the working directory (/app in the container).
+import gc
+import os
+import sys
+import shutil
+import tempfile
+
+# Workers write their metrics here and /metrics merges them. Set before the
+# workers import prometheus_client, which happens after this file is loaded.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_metrics'))
+# Token buckets and Textract job slots every worker draws from (see quota.py)
+os.environ.setdefault('QUOTA_STATE_DIR', os.path.join(tempfile.gettempdir(), 'resume_parser_quota'))
+
+# Import the app once in the master: the skill matcher, taxonomy and imports are
+# built a single time and shared copy-on-write by the forked workers. AWS clients,
+# MLflow and background threads are all created per worker after the fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+
+def on_starting(server):
+    # Files left by a previous run would be merged into this one's counters (or drain its buckets)
+    for directory in (os.environ['PROMETHEUS_MULTIPROC_DIR'], os.environ['QUOTA_STATE_DIR']):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    if preload_app:
+        # The app imports boto3 lazily; load it here once so workers inherit it instead of each importing it
+        import boto3  # noqa: F401
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach, so GC passes in
+    # the workers don't write to (and un-share) the master's pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    api = sys.modules.get('api')
+    if api is not None:
+        api.init_worker()
+
+
+def worker_exit(server, worker):
+    # Write out MLflow runs still queued in this worker before it goes away
+    api = sys.modules.get('api')
+    if api is not None:
+        api.tracker.close(api.MLFLOW_SHUTDOWN_TIMEOUT)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Job States ---
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when the pool already holds the maximum number of pending jobs."""
+
+
+class JobManager:
+    """
+    Runs resume pipeline jobs on a bounded in-process thread pool.
+
+    Job records live in memory for the owning worker and are also written as
+    small JSON files to 'state_dir' so that any gunicorn worker in the same
+    pod can answer GET /jobs/<id>, not just the one that accepted the upload.
+    """
+
+    def __init__(self, max_workers=32, max_pending=500, result_ttl=3600, state_dir=None):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.state_dir = state_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resume-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._events = {}
+        self._pending = 0
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) and returns the new job id. fn must return (payload, http_status)."""
+        with self._lock:
+            self._purge_expired()
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+            job_id = uuid.uuid4().hex
+            self._events[job_id] = threading.Event()
+            self._update(job_id, status=JOB_QUEUED, created_at=time.time())
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        logging.info(f"Queued async job {job_id} ({self._pending} pending)")
+        return job_id
+
+    def get(self, job_id, wait=0):
+        """Returns the job record, optionally long-polling up to 'wait' seconds for it to finish."""
+        job = self._load(job_id)
+        if job is None or wait <= 0 or job['status'] in FINISHED_STATES:
+            return job
+        event = self._events.get(job_id)
+        if event is not None:
+            # Owned by this worker, so we can block on the event directly
+            event.wait(wait)
+            return self._load(job_id)
+        # Owned by another worker; fall back to re-reading the shared state file
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(0.25)
+            job = self._load(job_id)
+            if job is None or job['status'] in FINISHED_STATES:
+                break
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "tracked": len(self._jobs)}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    # --- Internals ---
+    def _run(self, job_id, fn, args, kwargs):
+        with self._lock:
+            self._update(job_id, status=JOB_RUNNING, started_at=time.time())
+        try:
+            payload, http_status = fn(*args, **kwargs)
+            status = JOB_SUCCEEDED if http_status < 400 else JOB_FAILED
+        except Exception as e:
+            logging.error(f"Async job {job_id} crashed: {e}")
+            payload, http_status, status = {"error": f"Internal server error: {e}"}, 500, JOB_FAILED
+        with self._lock:
+            self._pending -= 1
+            field = "result" if status == JOB_SUCCEEDED else "error"
+            self._update(job_id, status=status, finished_at=time.time(), http_status=http_status,
+                         **{field: payload})
+            event = self._events.pop(job_id, None)
+        if event:
+            event.set()
+        logging.info(f"Async job {job_id} finished with status: {status}")
+
+    def _update(self, job_id, **fields):
+        # Caller must hold self._lock
+        job = self._jobs.setdefault(job_id, {"job_id": job_id})
+        job.update(fields)
+        if self.state_dir:
+            path = self._state_path(job_id)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(job, f)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError) as e:
+                logging.error(f"Could not persist state for job {job_id}: {e}")
+
+    def _load(self, job_id):
+        if not job_id or any(c not in "0123456789abcdef" for c in job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if not self.state_dir:
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _purge_expired(self):
+        # Caller must hold self._lock
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in FINISHED_STATES and job.get('finished_at', 0) < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.state_dir:
+                try:
+                    os.remove(self._state_path(job_id))
+                except OSError:
+                    pass
@@ -0,0 +1,143 @@
+"""
+Prometheus metrics and Server-Timing for the API.
+
+Under gunicorn every worker is its own process, so metrics go through
+prometheus_client's multiprocess mode: gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a shared directory before the workers start, and
+/metrics merges every worker's files (and drops dead workers' gauges) on each
+scrape. Without that variable (flask run, tests) the in-process registry is used.
+"""
+import os
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+
+from textract_poller import THROTTLING_ERROR_CODES
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram('resume_parser_stage_seconds', 'Wall time of one pipeline stage call',
+                          ['stage'], buckets=STAGE_BUCKETS)
+STAGE_IN_FLIGHT = Gauge('resume_parser_stage_in_flight', 'Pipeline stage calls currently running',
+                        ['stage'], multiprocess_mode='livesum')
+STAGE_ERRORS = Counter('resume_parser_stage_errors_total', 'Pipeline stage calls that raised', ['stage'])
+
+AWS_CALLS = Counter('resume_parser_aws_calls_total', 'AWS API calls (after retries)', ['service', 'operation'])
+AWS_RETRIES = Counter('resume_parser_aws_retries_total', 'Retries botocore made', ['service', 'operation'])
+AWS_THROTTLES = Counter('resume_parser_aws_throttles_total', 'Throttling errors returned by AWS',
+                        ['service', 'operation'])
+
+DOCUMENT_BYTES = Histogram('resume_parser_document_bytes', 'Size of uploaded PDFs',
+                           buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6))
+DOCUMENT_PAGES = Histogram('resume_parser_document_pages', 'Pages per uploaded PDF',
+                           buckets=(1, 2, 3, 4, 5, 8, 12, 20, 50, 100))
+DOCUMENT_TEXT_CHARS = Histogram('resume_parser_document_text_chars', 'Characters of extracted text per PDF',
+                                buckets=(500, 1e3, 2.5e3, 5e3, 1e4, 2e4, 5e4, 1e5, 2.5e5))
+
+REQUESTS = Counter('resume_parser_requests_total', 'HTTP requests', ['endpoint', 'status'])
+REQUEST_SECONDS = Histogram('resume_parser_request_seconds', 'HTTP request wall time', ['endpoint'],
+                            buckets=STAGE_BUCKETS)
+
+# Stage timings of the current request, for its Server-Timing header (None outside a request)
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+# --- Stage timing ---
+@contextmanager
+def stage(name):
+    """Times a block as pipeline stage 'name'."""
+    STAGE_IN_FLIGHT.labels(name).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_IN_FLIGHT.labels(name).dec()
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def instrumented(name):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_document(num_bytes=None, pages=None, text_chars=None):
+    if num_bytes is not None:
+        DOCUMENT_BYTES.observe(num_bytes)
+    if pages is not None:
+        DOCUMENT_PAGES.observe(pages)
+    if text_chars is not None:
+        DOCUMENT_TEXT_CHARS.observe(text_chars)
+
+
+# --- Per-request bookkeeping ---
+def begin_request():
+    _request_timings.set({})
+    return time.perf_counter()
+
+
+def end_request(endpoint, status, started):
+    """Records the request and returns its Server-Timing header value."""
+    elapsed = time.perf_counter() - started
+    REQUESTS.labels(endpoint, str(status)).inc()
+    REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+    timings = _request_timings.get() or {}
+    _request_timings.set(None)
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# --- AWS clients ---
+def instrument_boto_client(client, service):
+    """Counts calls, botocore retries and throttling responses through the client's event hooks."""
+    events = getattr(getattr(client, 'meta', None), 'events', None)
+    if events is None:
+        return client
+
+    def after_call(model, parsed, **kwargs):
+        AWS_CALLS.labels(service, model.name).inc()
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            AWS_RETRIES.labels(service, model.name).inc(retries)
+
+    def after_call_error(**kwargs):
+        AWS_CALLS.labels(service, kwargs.get('event_name', '').rsplit('.', 1)[-1]).inc()
+
+    def needs_retry(response=None, operation=None, **kwargs):
+        # Runs ahead of botocore's own retry handler and always returns None, so retry decisions are unchanged
+        if response is not None and response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            AWS_THROTTLES.labels(service, getattr(operation, 'name', 'unknown')).inc()
+        return None
+
+    events.register(f'after-call.{service}', after_call)
+    events.register(f'after-call-error.{service}', after_call_error)
+    events.register_first(f'needs-retry.{service}', needs_retry)
+    return client
+
+
+# --- Exposition ---
+def render():
+    """Returns (body, content_type) for /metrics, merged across workers in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,358 @@
+"""
+Near-duplicate detection for resumes: MinHash signatures over word shingles
+of the extracted text, and an LSH index of the documents seen so far.
+
+A resubmitted resume with a new date, phone number or a reworded line hashes
+differently (so the result cache misses it) but keeps almost all of its
+shingles; its signature then collides with the original's in at least one LSH
+band, and the estimated Jaccard similarity confirms the match. Lookups touch
+only the colliding candidates: each band is a sorted array searched with
+binary search, plus a short unsorted tail of recent additions.
+
+Signatures are appended as fixed-size records to one file that every worker
+tails, so a document remembered by one worker is found by all of them.
+
+    python app/near_duplicates.py report data/raw_pdfs/resume --out output/near_duplicates.json
+"""
+import os
+import re
+import json
+import time
+import zlib
+import fcntl
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from text_layer import extract_page_texts
+
+NUM_PERM = 128
+BANDS = 16            # 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a band
+SHINGLE_WORDS = 5
+DEFAULT_THRESHOLD = 0.9
+SIGNATURES_NAME = "signatures.bin"
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.RandomState(20250525)  # fixed: signatures must be comparable across processes and restarts
+_PERM_A = _rng.randint(1, 4294967291, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 4294967291, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.randint(1, 1 << 63, size=NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_DIGIT_RE = re.compile(r"[0-9]")
+
+
+# --- Signatures ---
+def shingle_hashes(text, k=SHINGLE_WORDS):
+    """32-bit hashes of the text's k-word shingles. Digits are masked so dates and phone numbers don't count."""
+    words = _WORD_RE.findall(_DIGIT_RE.sub("0", (text or "").lower()))
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.array([zlib.crc32(w.encode()) for w in words], dtype=np.uint64)
+    if len(words) < k:
+        k = len(words)
+    shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(k):
+            shingles = shingles * np.uint64(1000003) + word_hashes[j:len(words) - k + 1 + j]
+    return np.unique(shingles & np.uint64(0xFFFFFFFF))
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERM uint32) of the text, or None if it has no words."""
+    shingles = shingle_hashes(text)
+    if not len(shingles):
+        return None
+    # (a*x + b) mod p with 32-bit a, b, x and p never overflows uint64
+    hashed = (np.outer(shingles, _PERM_A) + _PERM_B) % _PRIME
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def band_hashes(signatures):
+    """(n, BANDS) uint64 bucket keys for (n, NUM_PERM) signatures."""
+    rows = np.asarray(signatures, dtype=np.uint64).reshape(len(signatures), BANDS, NUM_PERM // BANDS)
+    with np.errstate(over="ignore"):
+        return (rows * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two documents' shingle sets."""
+    return float(np.count_nonzero(signature_a == signature_b)) / NUM_PERM
+
+
+# --- LSH index ---
+def relocate_entities(entities, text):
+    """
+    Maps entities found in a near-duplicate's text onto 'text': each goes to
+    the occurrence of its Text nearest where it was, allowing for the shift
+    of the entities before it, and never before the previous one (edits keep
+    the order) or onto an occurrence already taken. Entities whose Text isn't
+    in 'text' any more (the edited parts) are dropped.
+    """
+    relocated, shift, floor, taken = [], 0, 0, set()
+    for entity in sorted(entities, key=lambda e: e["BeginOffset"]):
+        expected = entity["BeginOffset"] + shift
+        best = None
+        for m in re.finditer(re.escape(entity["Text"]), text[floor:]):
+            start = floor + m.start()
+            if (start, entity["Text"]) in taken:
+                continue
+            if best is None or abs(start - expected) < abs(best - expected):
+                best = start
+            elif start > expected:
+                break
+        if best is None:
+            continue
+        shift, floor = best - entity["BeginOffset"], best
+        taken.add((best, entity["Text"]))
+        relocated.append(dict(entity, BeginOffset=best, EndOffset=best + len(entity["Text"])))
+    return relocated
+
+
+class NearDuplicateIndex:
+    """
+    Signatures of known documents keyed by content hash, with banded LSH
+    lookup. 'directory' makes it persistent and shared between processes;
+    without one it lives in memory only.
+    """
+    _KEY_BYTES = 32
+    _RECORD_BYTES = _KEY_BYTES + NUM_PERM * 4
+
+    def __init__(self, directory=None, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.path = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, SIGNATURES_NAME)
+        self._lock = threading.Lock()
+        self._keys = []
+        self._rows = {}
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._bands = np.empty((0, BANDS), dtype=np.uint64)
+        self._count = 0
+        self._file_position = 0
+        # Rows [0, _sorted_count) are in the per-band sorted arrays; later ones are scanned
+        self._sorted_count = 0
+        self._sorted_bands = np.empty((BANDS, 0), dtype=np.uint64)
+        self._sorted_rows = np.empty((BANDS, 0), dtype=np.int64)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._count
+
+    def add(self, key, signature):
+        """Remembers a document. 'key' is its sha256 hex digest."""
+        if signature is None:
+            return
+        record = bytes.fromhex(key) + np.asarray(signature, dtype=np.uint32).tobytes()
+        with self._lock:
+            if self.path is None:
+                self._append([record])
+                return
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+            try:
+                # One write per record under an exclusive lock, so records never interleave
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def query(self, signature, exclude=None):
+        """
+        The most similar known document at or above the threshold, as
+        (key, similarity), or None. 'exclude' skips one key (the document itself).
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                return None
+            bands = band_hashes(signature[None, :])[0]
+            candidates = [self._tail_candidates(bands)]
+            for band in range(BANDS):
+                sorted_band = self._sorted_bands[band]
+                lo = np.searchsorted(sorted_band, bands[band], side="left")
+                hi = np.searchsorted(sorted_band, bands[band], side="right")
+                if hi > lo:
+                    candidates.append(self._sorted_rows[band, lo:hi])
+            rows = np.unique(np.concatenate(candidates))
+            if not len(rows):
+                return None
+            scores = np.count_nonzero(self._signatures[rows] == signature, axis=1) / NUM_PERM
+            order = np.argsort(-scores, kind="stable")
+            for i in order:
+                if scores[i] < self.threshold:
+                    break
+                key = self._keys[rows[i]]
+                if key != exclude:
+                    return key, float(scores[i])
+            return None
+
+    def signature(self, key):
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(key)
+            return None if row is None else self._signatures[row].copy()
+
+    def _tail_candidates(self, bands):
+        tail = self._bands[self._sorted_count:self._count]
+        return np.flatnonzero((tail == bands).any(axis=1)) + self._sorted_count
+
+    def _refresh(self):
+        if self.path is None:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        complete = (size - self._file_position) // self._RECORD_BYTES * self._RECORD_BYTES
+        if complete <= 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._file_position)
+            data = f.read(complete)
+        self._file_position += complete
+        self._append([data[i:i + self._RECORD_BYTES] for i in range(0, len(data), self._RECORD_BYTES)])
+
+    def _append(self, records):
+        keys = [r[:self._KEY_BYTES].hex() for r in records]
+        signatures = np.frombuffer(b"".join(r[self._KEY_BYTES:] for r in records), dtype=np.uint32)
+        signatures = signatures.reshape(len(records), NUM_PERM)
+        needed = self._count + len(records)
+        if needed > len(self._signatures):
+            capacity = max(needed, 2 * len(self._signatures), 1024)
+            self._signatures = np.resize(self._signatures, (capacity, NUM_PERM))
+            self._bands = np.resize(self._bands, (capacity, BANDS))
+        self._signatures[self._count:needed] = signatures
+        self._bands[self._count:needed] = band_hashes(signatures)
+        for i, key in enumerate(keys, start=self._count):
+            self._keys.append(key)
+            self._rows[key] = i
+        self._count = needed
+        # Re-sort once the linear tail is a sizeable fraction of the index: amortized O(log n) per add
+        if self._count - self._sorted_count > max(1024, self._sorted_count // 8):
+            bands = self._bands[:self._count].T
+            self._sorted_rows = np.argsort(bands, axis=1, kind="stable")
+            self._sorted_bands = np.take_along_axis(bands, self._sorted_rows, axis=1)
+            self._sorted_count = self._count
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {"documents": self._count, "sorted": self._sorted_count, "threshold": self.threshold,
+                    "num_perm": NUM_PERM, "bands": BANDS}
+
+
+# --- Offline report ---
+def _document_signature(path):
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    pages = extract_page_texts(pdf_bytes) or []
+    text = "\n".join(pages)
+    return hashlib.sha256(pdf_bytes).hexdigest(), minhash(text), len(text)
+
+
+def find_clusters(keys, signatures, threshold):
+    """
+    Groups documents whose signatures are near-identical (LSH candidates
+    confirmed at 'threshold', joined transitively). Returns [[(index, best similarity)]].
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    parent = list(range(len(keys)))
+    best = {}
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    seen = {}
+    for i, (key, signature) in enumerate(zip(keys, signatures)):
+        if signature is None:
+            continue
+        if key in seen:  # byte-identical file
+            match = (key, 1.0)
+        else:
+            match = index.query(signature)
+        if match is not None:
+            j = seen[match[0]]
+            parent[root(i)] = root(j)
+            best[i] = max(best.get(i, 0), match[1])
+            best[j] = max(best.get(j, 0), match[1])
+        else:
+            index.add(key, signature)
+            seen[key] = i
+    groups = {}
+    for i in best:
+        groups.setdefault(root(i), []).append((i, best[i]))
+    return sorted((sorted(g) for g in groups.values()), key=len, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Find near-duplicate groups in a <root>/<CATEGORY>/*.pdf corpus")
+    report.add_argument("corpus", help="Local corpus root")
+    report.add_argument("--out", help="Write the report as JSON here (default: stdout summary only)")
+    report.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    report.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from process_corpus import list_local_documents  # pulls in the skill matcher and index; CLI only
+
+    documents = list_local_documents(args.corpus)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        signed = list(pool.map(_document_signature, [path for _, _, path in documents], chunksize=16))
+    signing_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keys = [key for key, _, _ in signed]
+    clusters = find_clusters(keys, [signature for _, signature, _ in signed], args.threshold)
+    matching_s = time.perf_counter() - start
+
+    copies = Counter(keys)
+    groups = []
+    for members in clusters:
+        groups.append({
+            "size": len(members),
+            "categories": sorted({documents[i][1] for i, _ in members}),
+            "documents": [{"doc_id": documents[i][0], "content_sha256": keys[i],
+                           "exact_copy": copies[keys[i]] > 1, "similarity": round(score, 3)}
+                          for i, score in members],
+        })
+    redundant = sum(g["size"] - 1 for g in groups)
+    summary = {
+        "documents": len(documents),
+        "without_text_layer": sum(1 for _, signature, _ in signed if signature is None),
+        "duplicate_groups": len(groups),
+        "redundant_documents": redundant,
+        "exact_copies": len(keys) - len(copies),
+        "cross_category_groups": sum(1 for g in groups if len(g["categories"]) > 1),
+        "threshold": args.threshold,
+        "signing_seconds": round(signing_s, 2),
+        "matching_seconds": round(matching_s, 3),
+    }
+    print(json.dumps(summary, indent=2))
+    for group in groups[:10]:
+        print(f"{group['size']} x {', '.join(d['doc_id'] for d in group['documents'][:4])}"
+              f"{' ...' if group['size'] > 4 else ''}")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "groups": groups}, f, indent=2)
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
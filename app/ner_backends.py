@@ -0,0 +1,447 @@
+"""
+Entity-extraction backends behind find_entities_comprehend. Each turns a
+document's text into Comprehend-shaped entities, {'Text', 'Type', 'Score',
+'BeginOffset', 'EndOffset'} with document-wide offsets, sorted by position:
+
+- comprehend: chunked, batched Comprehend calls (comprehend_batch.py)
+- local:      spaCy NER in-process, no network and no per-call cost
+- hybrid:     spaCy first; the lines holding a low-confidence entity, or one
+              whose spaCy label has no Comprehend type, go to Comprehend, and
+              its entities replace spaCy's there
+
+The CLI compares them on the corpus (latency, throughput, entity and keyword
+agreement with a reference backend):
+
+    python app/ner_backends.py compare data/raw_pdfs/resume --limit 300 --out ner_report.json
+    python app/ner_backends.py compare data/raw_pdfs/resume --backends local --reference local --n-process 4
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import argparse
+import threading
+
+try:
+    import spacy
+    from spacy.language import Language
+except ImportError:
+    spacy = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from comprehend_batch import merge_entities  # noqa: E402
+
+POLICIES = ("comprehend", "local", "hybrid")
+
+# spaCy (OntoNotes) labels -> Comprehend entity types
+SPACY_TO_COMPREHEND = {
+    "PERSON": "PERSON",
+    "ORG": "ORGANIZATION",
+    "GPE": "LOCATION", "LOC": "LOCATION", "FAC": "LOCATION",
+    "DATE": "DATE", "TIME": "DATE",
+    "CARDINAL": "QUANTITY", "QUANTITY": "QUANTITY", "MONEY": "QUANTITY", "PERCENT": "QUANTITY", "ORDINAL": "QUANTITY",
+    "PRODUCT": "COMMERCIAL_ITEM",
+    "EVENT": "EVENT",
+    "WORK_OF_ART": "TITLE",
+    "NORP": "OTHER", "LAW": "OTHER", "LANGUAGE": "OTHER",
+}
+# Where the entity_confidence component leaves one score per doc.ents entry
+SCORES_KEY = "entity_scores"
+
+
+def is_available():
+    return spacy is not None
+
+
+class EntityConfidence:
+    """
+    Pipeline component after 'ner' that scores its entities: a beam search over
+    the same model, where an entity's score is the probability mass of the beam
+    parses containing that exact span and label. Greedy entities no beam parse
+    agrees with score 0.
+    """
+
+    def __init__(self, ner, beam_width=8, beam_density=0.0001):
+        self.ner = ner
+        self.beam_width = beam_width
+        self.beam_density = beam_density
+
+    def __call__(self, doc):
+        return next(self.pipe([doc]))
+
+    def pipe(self, docs, batch_size=32):
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield from self._score(batch)
+                batch = []
+        if batch:
+            yield from self._score(batch)
+
+    def _score(self, docs):
+        # On copies with the entities unset: the parser treats annotation already on a Doc as fixed, so beams
+        # over the greedy output would all agree with it
+        unannotated = []
+        for doc in docs:
+            copy = doc.copy()
+            copy.set_ents([], default="missing")
+            unannotated.append(copy)
+        beams = self.ner.beam_parse(unannotated, beam_width=self.beam_width, beam_density=self.beam_density)
+        for doc, scores in zip(docs, self.ner.scored_ents(beams)):
+            # A plain list of floats, so it survives nlp.pipe(n_process=...) serialising the Doc
+            doc.user_data[SCORES_KEY] = [float(scores.get((e.start, e.end, e.label_), 0.0)) for e in doc.ents]
+            yield doc
+
+
+if spacy is not None:
+    @Language.factory("entity_confidence", default_config={"beam_width": 8})
+    def make_entity_confidence(nlp, name, beam_width):
+        return EntityConfidence(nlp.get_pipe("ner"), beam_width)
+
+
+# --- Backends ---
+class ComprehendBackend:
+    name = "comprehend"
+    remote = True
+
+    def __init__(self, chunker):
+        self.chunker = chunker
+
+    def load(self):
+        pass
+
+    def fingerprint(self):
+        # None keeps result cache keys from before backends were pluggable
+        return None
+
+    def detect(self, text):
+        return self.chunker.detect_entities(text) if text else []
+
+    def detect_many(self, texts, n_process=1):
+        return [self.detect(text) for text in texts]
+
+
+class SpacyBackend:
+    """
+    spaCy NER in-process. The pipeline is loaded once per process, on first
+    use (init_worker does it for gunicorn workers), with only what NER needs
+    enabled. Entities are scored by EntityConfidence unless beam_width is 1,
+    in which case every Score is 1.0.
+    """
+    name = "local"
+    remote = False
+
+    def __init__(self, model="en_core_web_sm", beam_width=8, batch_size=32):
+        if spacy is None:
+            raise RuntimeError("spaCy is not installed (pip install spacy && python -m spacy download en_core_web_sm)")
+        self.model = model
+        self.beam_width = beam_width
+        self.batch_size = batch_size
+        self._nlp = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._nlp is None:
+                start = time.perf_counter()
+                nlp = spacy.load(self.model)
+                keep = {"ner", "entity_ruler"}
+                if "tok2vec" in nlp.pipe_names and "ner" in getattr(nlp.get_pipe("tok2vec"), "listening_components", []):
+                    keep.add("tok2vec")
+                nlp.select_pipes(enable=[name for name in nlp.pipe_names if name in keep])
+                if self.beam_width > 1:
+                    nlp.add_pipe("entity_confidence", after="ner", config={"beam_width": self.beam_width})
+                self._nlp = nlp
+                logging.info(f"Loaded spaCy pipeline {self.model} ({', '.join(nlp.pipe_names)}) "
+                             f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return self._nlp
+
+    def fingerprint(self):
+        version = spacy.util.get_package_version(self.model) if spacy.util.is_package(self.model) else None
+        return f"spacy:{spacy.__version__}:{self.model}:{version}:beam{self.beam_width}"
+
+    def detect(self, text):
+        return [entity for entity, _ in self.detect_spans(text)]
+
+    def detect_many(self, texts, n_process=1):
+        """Many documents through nlp.pipe; n_process > 1 forks that many processes (bulk runs, not the API)."""
+        texts = list(texts)
+        results = [[] for _ in texts]
+        todo = [i for i, text in enumerate(texts) if text]
+        docs = self.load().pipe((texts[i] for i in todo), batch_size=self.batch_size, n_process=n_process)
+        for i, doc in zip(todo, docs):
+            results[i] = [entity for entity, _ in self._entities(doc)]
+        return results
+
+    def detect_spans(self, text):
+        """Like detect, paired with whether spaCy's label has a Comprehend type: [(entity, mapped), ...]."""
+        if not text:
+            return []
+        return self._entities(self.load()(text))
+
+    @staticmethod
+    def _entities(doc):
+        scores = doc.user_data.get(SCORES_KEY) or [1.0] * len(doc.ents)
+        spans = []
+        for ent, score in zip(doc.ents, scores):
+            entity = {"Text": ent.text, "Type": SPACY_TO_COMPREHEND.get(ent.label_, "OTHER"), "Score": round(score, 4),
+                      "BeginOffset": ent.start_char, "EndOffset": ent.end_char}
+            spans.append((entity, ent.label_ in SPACY_TO_COMPREHEND))
+        return spans
+
+
+class HybridBackend:
+    """
+    spaCy first, Comprehend only where spaCy is unsure: the lines holding an
+    entity scored under 'min_confidence' or with an unmapped label are sent
+    to Comprehend together (one chunked call), and its entities replace
+    spaCy's on those lines. Everything else is spaCy's.
+    """
+    name = "hybrid"
+    remote = True
+
+    def __init__(self, local, comprehend, min_confidence=0.8):
+        self.local = local
+        self.comprehend = comprehend
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {"documents": 0, "fallback_documents": 0, "chars": 0, "fallback_chars": 0}
+
+    def load(self):
+        self.local.load()
+
+    def fingerprint(self):
+        return f"hybrid:{self.local.fingerprint()}:{self.min_confidence}"
+
+    def detect(self, text):
+        spans = self.local.detect_spans(text)
+        regions = line_regions(text, [entity for entity, mapped in spans
+                                      if not mapped or entity["Score"] < self.min_confidence])
+        entities = [entity for entity, _ in spans if not in_regions(entity, regions)]
+        if regions:
+            entities.extend(self._detect_regions(text, regions))
+        with self._lock:
+            self._stats["documents"] += 1
+            self._stats["chars"] += len(text or "")
+            if regions:
+                self._stats["fallback_documents"] += 1
+                self._stats["fallback_chars"] += sum(end - start for start, end in regions)
+        return merge_entities(entities)
+
+    def detect_many(self, texts, n_process=1):
+        return [self.detect(text) for text in texts]
+
+    def _detect_regions(self, text, regions):
+        # Sent as one text, a line apart, and mapped back onto the document
+        starts, parts, offset = [], [], 0
+        for start, end in regions:
+            starts.append(offset)
+            parts.append(text[start:end])
+            offset += end - start + 1
+        entities = []
+        for entity in self.comprehend.detect("\n".join(parts)):
+            i = bisect.bisect_right(starts, entity["BeginOffset"]) - 1
+            shift = regions[i][0] - starts[i]
+            entities.append(dict(entity, BeginOffset=entity["BeginOffset"] + shift,
+                                 EndOffset=entity["EndOffset"] + shift))
+        return entities
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["fallback_char_share"] = round(stats["fallback_chars"] / stats["chars"], 4) if stats["chars"] else None
+        return stats
+
+
+def line_regions(text, entities):
+    """The (start, end) character ranges of the lines holding 'entities', adjacent lines merged."""
+    regions = []
+    for entity in sorted(entities, key=lambda e: e["BeginOffset"]):
+        start = text.rfind("\n", 0, entity["BeginOffset"]) + 1
+        end = text.find("\n", entity["EndOffset"])
+        end = len(text) if end == -1 else end
+        if regions and start <= regions[-1][1] + 1:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def in_regions(entity, regions):
+    i = bisect.bisect_right(regions, (entity["BeginOffset"], float("inf"))) - 1
+    return i >= 0 and entity["EndOffset"] <= regions[i][1]
+
+
+def build_backend(policy, comprehend_chunker, model="en_core_web_sm", min_confidence=0.8, beam_width=8):
+    """The backend for a policy: 'comprehend', 'local' or 'hybrid'."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown NER policy {policy!r} (expected one of {', '.join(POLICIES)})")
+    comprehend = ComprehendBackend(comprehend_chunker)
+    if policy == "comprehend":
+        return comprehend
+    local = SpacyBackend(model, beam_width=beam_width)
+    return local if policy == "local" else HybridBackend(local, comprehend, min_confidence)
+
+
+# --- Comparison report ---
+def load_corpus_texts(root, limit=None):
+    """[(doc_id, text)] from the embedded text layer (pages that would need OCR are left out)."""
+    from block_store import merge_page_stores
+    from process_corpus import list_local_documents
+    from text_layer import route_pages
+
+    texts = []
+    for doc_id, _, path in list_local_documents(root)[:limit]:
+        with open(path, 'rb') as f:
+            decisions = route_pages(f.read())
+        if decisions:
+            texts.append((doc_id, merge_page_stores(decisions, None, []).text()))
+    return texts
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(pct / 100 * len(sorted_values)))] if sorted_values else None
+
+
+def agreement(reference, candidate, exclude_types=()):
+    """
+    Entity-level agreement of two backends over the same documents (lists of
+    entity lists): micro precision/recall/F1 on exact spans with the same type,
+    on overlapping spans with the same type, per reference type, and the mean
+    Jaccard of the keywords the API would output (types outside exclude_types).
+    """
+    counts = {"exact": [0, 0, 0], "overlap": [0, 0, 0]}  # matched, candidate total, reference total
+    by_type, keyword_jaccard = {}, []
+    for ref_entities, cand_entities in zip(reference, candidate):
+        exact = {(e["BeginOffset"], e["EndOffset"], e["Type"]) for e in ref_entities}
+        matched_exact = sum(1 for e in cand_entities if (e["BeginOffset"], e["EndOffset"], e["Type"]) in exact)
+        matched_overlap = sum(1 for e in cand_entities if any(
+            r["Type"] == e["Type"] and r["BeginOffset"] < e["EndOffset"] and e["BeginOffset"] < r["EndOffset"]
+            for r in ref_entities))
+        for key, matched in (("exact", matched_exact), ("overlap", matched_overlap)):
+            counts[key][0] += matched
+            counts[key][1] += len(cand_entities)
+            counts[key][2] += len(ref_entities)
+        found = {(e["BeginOffset"], e["EndOffset"], e["Type"]) for e in cand_entities}
+        for e in ref_entities:
+            stats = by_type.setdefault(e["Type"], [0, 0])
+            stats[0] += (e["BeginOffset"], e["EndOffset"], e["Type"]) in found
+            stats[1] += 1
+        ref_keywords = {e["Text"].lower() for e in ref_entities if e["Type"] not in exclude_types}
+        cand_keywords = {e["Text"].lower() for e in cand_entities if e["Type"] not in exclude_types}
+        if ref_keywords or cand_keywords:
+            keyword_jaccard.append(len(ref_keywords & cand_keywords) / len(ref_keywords | cand_keywords))
+
+    report = {}
+    for key, (matched, predicted, expected) in counts.items():
+        precision = matched / predicted if predicted else None
+        recall = matched / expected if expected else None
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+        report[key] = {"precision": _round(precision), "recall": _round(recall), "f1": _round(f1)}
+    report["recall_by_type"] = {t: {"recall": _round(hit / total), "support": total}
+                                for t, (hit, total) in sorted(by_type.items(), key=lambda item: -item[1][1])}
+    report["keyword_jaccard"] = _round(sum(keyword_jaccard) / len(keyword_jaccard)) if keyword_jaccard else None
+    return report
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+
+def compare_backends(texts, backends, reference, n_process=1, exclude_types=()):
+    """
+    Runs every backend over 'texts': one document per call (as the API does)
+    for latency, then as a batch for throughput, and scores each against the
+    'reference' backend's entities. Returns the report dict.
+    """
+    results, report = {}, {"documents": len(texts), "characters": sum(len(t) for t in texts), "backends": {}}
+    for backend in backends:
+        backend.load()
+        latencies, entities = [], []
+        for text in texts:
+            start = time.perf_counter()
+            entities.append(backend.detect(text))
+            latencies.append((time.perf_counter() - start) * 1000)
+        fallback = backend.snapshot() if hasattr(backend, "snapshot") else None
+        start = time.perf_counter()
+        backend.detect_many(texts, n_process=n_process)
+        batch_seconds = time.perf_counter() - start
+        results[backend.name] = entities
+        latencies.sort()
+        summary = {
+            "latency_ms": {"mean": round(sum(latencies) / len(latencies), 2), "p50": round(percentile(latencies, 50), 2),
+                           "p95": round(percentile(latencies, 95), 2), "max": round(latencies[-1], 2)},
+            "batch_docs_per_sec": round(len(texts) / batch_seconds, 2),
+            "batch_chars_per_sec": round(report["characters"] / batch_seconds),
+            "entities": sum(len(e) for e in entities),
+        }
+        if fallback is not None:
+            summary["fallback"] = fallback
+        report["backends"][backend.name] = summary
+    for name, entities in results.items():
+        if name != reference:
+            report["backends"][name]["agreement_with_" + reference] = agreement(results[reference], entities,
+                                                                                 exclude_types)
+    return report
+
+
+def print_report(report, reference):
+    print(f"{report['documents']} documents, {report['characters']} characters; agreement against '{reference}'\n")
+    print(f"  {'backend':<12}{'p50 ms':>9}{'p95 ms':>9}{'batch doc/s':>13}{'entities':>10}"
+          f"{'exact F1':>10}{'overlap F1':>12}{'keywords J':>12}")
+    for name, summary in report["backends"].items():
+        scores = summary.get("agreement_with_" + reference, {})
+        cells = [scores.get("exact", {}).get("f1"), scores.get("overlap", {}).get("f1"), scores.get("keyword_jaccard")]
+        cells = [f"{value:.3f}" if value is not None else "-" for value in cells]
+        print(f"  {name:<12}{summary['latency_ms']['p50']:>9.1f}{summary['latency_ms']['p95']:>9.1f}"
+              f"{summary['batch_docs_per_sec']:>13.1f}{summary['entities']:>10}{cells[0]:>10}{cells[1]:>12}{cells[2]:>12}")
+        if "fallback" in summary:
+            print(f"  {'':<12}{summary['fallback']['fallback_documents']} documents and "
+                  f"{summary['fallback']['fallback_char_share']:.1%} of characters sent to Comprehend")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    compare = sub.add_parser("compare", help="Latency, throughput and agreement of the backends on a corpus")
+    compare.add_argument("corpus", help="Corpus root (<root>/<CATEGORY>/*.pdf)")
+    compare.add_argument("--backends", nargs="+", choices=POLICIES, default=list(POLICIES))
+    compare.add_argument("--reference", choices=POLICIES, default="comprehend",
+                         help="Backend the others are scored against")
+    compare.add_argument("--limit", type=int, help="Only the first N documents")
+    compare.add_argument("--model", default="en_core_web_sm")
+    compare.add_argument("--beam-width", type=int, default=8)
+    compare.add_argument("--min-confidence", type=float, default=0.8)
+    compare.add_argument("--n-process", type=int, default=1, help="spaCy processes for the batch throughput run")
+    compare.add_argument("--region", default=os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-1'))
+    compare.add_argument("--out", help="Also write the report as JSON here")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from process_corpus import COMPREHEND_EXCLUDE
+    names = list(dict.fromkeys(args.backends + [args.reference]))
+    chunker = None
+    if any(name != "local" for name in names):
+        import boto3
+        from comprehend_batch import ComprehendChunker
+        chunker = ComprehendChunker(boto3.client('comprehend', region_name=args.region))
+    local = SpacyBackend(args.model, beam_width=args.beam_width) if any(n != "comprehend" for n in names) else None
+    backends = {
+        "comprehend": lambda: ComprehendBackend(chunker),
+        "local": lambda: local,
+        "hybrid": lambda: HybridBackend(local, ComprehendBackend(chunker), args.min_confidence),
+    }
+    texts = [text for _, text in load_corpus_texts(args.corpus, args.limit)]
+    report = compare_backends(texts, [backends[name]() for name in names], args.reference, args.n_process,
+                              COMPREHEND_EXCLUDE)
+    print_report(report, args.reference)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Persistent store of what OCR and entity detection produced for every parsed
+resume, so results can be re-derived after the skill taxonomy,
+COMPREHEND_EXCLUDE or the extraction code changes without calling Textract
+(or Comprehend) again.
+
+A store directory holds:
+
+  <ab>/<sha256>.json.gz  one gzipped record per PDF: its lines (BlockStore
+                         columns), page routing, entities and the keywords
+                         last derived from them
+  versions.jsonl         append-only log of the result version (cache_version)
+                         and entity backend each document's keywords were
+                         computed under; the last line for a key wins
+
+Any number of processes can write (records are replaced with a rename, log
+lines are single O_APPEND writes). 'reprocess' finds the documents whose
+version isn't the current one and re-runs skill matching, entity filtering
+and keyword combination over their stored text on a process pool, writing
+back (record and search index) only the documents whose keywords changed:
+
+    python app/ocr_store.py stats output/ocr_store
+    python app/ocr_store.py reprocess output/ocr_store --index output/skill_index --workers 8
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import logging
+import argparse
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from block_store import BlockStore  # noqa: E402
+from result_cache import cache_version  # noqa: E402
+from skill_matcher import load_skill_matcher  # noqa: E402
+from text_layer import SOURCE_TEXTRACT  # noqa: E402
+
+RECORD_FORMAT = 1
+VERSIONS_NAME = "versions.jsonl"
+# Entity marker for documents parsed without entity detection (process_corpus.py without --ner)
+NO_ENTITIES = "none"
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.yaml')
+
+
+def combine_keywords(rule_skills, entities, exclude_types):
+    """Lower-cased skills plus the texts of entities whose type isn't excluded (what the API returns)."""
+    combined = set(s.lower() for s in rule_skills)
+    combined.update(e['Text'].lower() for e in entities if e['Type'] not in exclude_types)
+    return list(combined)
+
+
+def make_record(result, filename=None, category=None, ner=None):
+    """A store record from a pipeline result (api.record_result's) and the entity backend fingerprint."""
+    return {
+        "format": RECORD_FORMAT,
+        "filename": filename,
+        "category": category,
+        "stored_at": time.time(),
+        "s3_path": result.get("s3_path"),
+        "textract_job_id": result.get("textract_job_id"),
+        "extraction": result.get("extraction"),
+        "textract_blocks": result["textract_blocks"],
+        "comprehend_entities": result["comprehend_entities"],
+        "ner": ner,
+        "rule_based_skills": result["rule_based_skills"],
+        "combined_keywords": result["combined_keywords"],
+    }
+
+
+def extraction_from_record(record):
+    """The record's extraction, shaped like api.extract_document's return value."""
+    routing = record.get("extraction") or {"pages": [], "text_layer_ms": 0.0, "textract_mode": None,
+                                           "textract_ms": 0.0}
+    num_ocr_pages = sum(1 for page in routing["pages"] if page["source"] == SOURCE_TEXTRACT)
+    return {
+        "blocks": BlockStore.from_dict(record["textract_blocks"]),
+        "s3_path": record.get("s3_path"),
+        "textract_job_id": record.get("textract_job_id"),
+        "num_ocr_pages": num_ocr_pages,
+        "num_text_layer_pages": len(routing["pages"]) - num_ocr_pages,
+        "routing": routing,
+    }
+
+
+class OcrStore:
+    """Records by PDF hash plus the versions log's latest entry per key. Thread safe."""
+
+    def __init__(self, directory, compresslevel=6):
+        self.directory = directory
+        self.compresslevel = compresslevel
+        os.makedirs(directory, exist_ok=True)
+        self._versions_path = os.path.join(directory, VERSIONS_NAME)
+        self._lock = threading.Lock()
+        self._versions = {}          # key -> (version, ner)
+        self._log_inode = None
+        self._log_position = 0
+
+    # --- Records ---
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable OCR store record {path}: {e}")
+            return None
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, record, version):
+        """Writes (or replaces) the record and logs the version its keywords were derived under."""
+        self._write(key, record)
+        self.set_versions([(key, version, record.get("ner"))])
+
+    def _write(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wb', compresslevel=self.compresslevel) as f:
+                f.write(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def keys(self):
+        for shard in sorted(os.listdir(self.directory)):
+            shard_dir = os.path.join(self.directory, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for name in sorted(os.listdir(shard_dir)):
+                if name.endswith('.json.gz'):
+                    yield name[:-len('.json.gz')]
+
+    # --- Versions ---
+    def set_versions(self, entries):
+        """Logs [(key, version, ner), ...] in one write."""
+        lines = "".join(json.dumps({"key": key, "version": version, "ner": ner}) + "\n"
+                        for key, version, ner in entries)
+        if lines:
+            with open(self._versions_path, "a", encoding="utf-8") as log:
+                log.write(lines)
+
+    def versions(self):
+        """{key: (version, ner)} as of the latest log line for each key."""
+        with self._lock:
+            self._refresh()
+            return dict(self._versions)
+
+    def stale(self, version):
+        """Keys of stored documents whose keywords weren't derived under 'version'."""
+        versions = self.versions()
+        return [key for key in self.keys() if versions.get(key, (None, None))[0] != version]
+
+    def compact_versions(self):
+        """Rewrites the log with one line per stored document. Lines other processes append meanwhile are lost."""
+        with self._lock:
+            self._refresh()
+            keys = set(self.keys())
+            tmp_path = f"{self._versions_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, (version, ner) in sorted(self._versions.items()):
+                    if key in keys:
+                        f.write(json.dumps({"key": key, "version": version, "ner": ner}) + "\n")
+            os.replace(tmp_path, self._versions_path)
+
+    def _refresh(self):
+        # Caller must hold self._lock. Tails the log; a compaction (new inode) means reading it from the start.
+        try:
+            st = os.stat(self._versions_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._log_inode or st.st_size < self._log_position:
+            self._versions, self._log_inode, self._log_position = {}, st.st_ino, 0
+        with open(self._versions_path, "rb") as log:
+            log.seek(self._log_position)
+            data = log.read()
+        # A line still being appended by another process is left for the next read
+        complete = data[:data.rfind(b"\n") + 1]
+        self._log_position += len(complete)
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._versions[entry["key"]] = (entry["version"], entry.get("ner"))
+
+    def stats(self, version=None):
+        keys = list(self.keys())
+        versions = self.versions()
+        num_bytes = sum(os.path.getsize(self._path(key)) for key in keys)
+        stats = {"documents": len(keys), "bytes": num_bytes}
+        if version is not None:
+            stats["version"] = version
+            stats["stale"] = sum(1 for key in keys if versions.get(key, (None, None))[0] != version)
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+
+# --- Reprocessing ---
+_worker = {}
+
+
+def _init_worker(config_path, fallback_skills):
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    _worker['matcher'] = load_skill_matcher(config_path, fallback_skills=fallback_skills)
+
+
+def retag_batch(directory, keys, exclude_types):
+    """
+    Re-runs skill matching and keyword combination over stored documents in a
+    pool process. Returns [(key, update or None, error or None)], 'update'
+    being the new skills/keywords when they differ from the stored ones ({} if not).
+    """
+    store = OcrStore(directory)
+    matcher = _worker['matcher']
+    results = []
+    for key in keys:
+        try:
+            record = store.get(key)
+            if record is None:
+                results.append((key, None, "record missing or unreadable"))
+                continue
+            text = BlockStore.from_dict(record["textract_blocks"]).text()
+            rule_skills = matcher.find_skills(text) if text else []
+            combined = combine_keywords(rule_skills, record["comprehend_entities"], exclude_types)
+            changed = (set(combined) != set(record["combined_keywords"])
+                       or set(rule_skills) != set(record["rule_based_skills"]))
+            results.append((key, {"rule_based_skills": rule_skills, "combined_keywords": combined} if changed else {},
+                            None))
+        except Exception as e:
+            results.append((key, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def redetect_entities(store, keys, ner, detect_entities, max_workers=4):
+    """
+    Runs entity detection again for documents whose entities came from another
+    backend (network-bound, so threads). Returns {key: error} for the failures.
+    """
+    def redetect(key):
+        record = store.get(key)
+        if record is None:
+            raise ValueError("record missing or unreadable")
+        text = BlockStore.from_dict(record["textract_blocks"]).text()
+        record["comprehend_entities"] = detect_entities(text) if text else []
+        record["ner"] = ner
+        store._write(key, record)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="redetect") as executor:
+        futures = {executor.submit(redetect, key): key for key in keys}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future]] = f"{type(e).__name__}: {e}"
+    return errors
+
+
+def reprocess(store, version, ner, exclude_types, config_path, fallback_skills=(), skill_index=None,
+              detect_entities=None, workers=2, batch_size=200, limit=None):
+    """
+    Brings every stale document in 'store' up to 'version': entities are
+    detected again only where they came from a different entity backend than
+    'ner' (needs 'detect_entities(text)'), then skills and keywords are
+    recomputed over the stored text in batches of 'batch_size' on 'workers'
+    processes. Documents whose keywords changed are rewritten and re-added to
+    'skill_index'; every processed one is logged under 'version'. Returns a summary.
+    """
+    start, cpu_start = time.time(), time.process_time()
+    versions = store.versions()
+    stale = store.stale(version)
+    if limit:
+        stale = stale[:limit]
+    summary = {"version": version, "stale": len(stale), "retagged": 0, "changed": 0, "entities_redetected": 0,
+               "errors": 0}
+    errors = {}
+
+    redetect = [key for key in stale if versions.get(key, (None, None))[1] != ner]
+    if redetect and detect_entities is None:
+        errors.update({key: "entities are from another backend and no detector was given" for key in redetect})
+    elif redetect:
+        logging.info(f"Detecting entities again for {len(redetect)} document(s)")
+        errors.update(redetect_entities(store, redetect, ner, detect_entities))
+        summary["entities_redetected"] = len(redetect) - len(errors)
+    todo = [key for key in stale if key not in errors]
+
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    if workers > 1 and len(batches) > 1:
+        # Spawned, not forked: the API calls this from a process full of threads
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(config_path, list(fallback_skills)))
+        futures = [pool.submit(retag_batch, store.directory, batch, list(exclude_types)) for batch in batches]
+        results = (future.result() for future in as_completed(futures))
+    else:
+        pool = None
+        _init_worker(config_path, list(fallback_skills))
+        results = (retag_batch(store.directory, batch, exclude_types) for batch in batches)
+
+    try:
+        for batch_results in results:
+            done, to_index = [], []
+            for key, update, error in batch_results:
+                if error is not None:
+                    errors[key] = error
+                    continue
+                if update:
+                    record = store.get(key)
+                    if record is None:
+                        errors[key] = "record missing or unreadable"
+                        continue
+                    record.update(update)
+                    store._write(key, record)
+                    to_index.append((key, update["combined_keywords"], record.get("filename"), record.get("category")))
+                done.append((key, version, ner))
+            if skill_index is not None and to_index:
+                skill_index.add_many(to_index)
+            store.set_versions(done)
+            summary["retagged"] += len(done)
+            summary["changed"] += len(to_index)
+            logging.info(f"Reprocessed {summary['retagged']}/{len(todo)} documents, {summary['changed']} changed")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    for key, error in list(errors.items())[:20]:
+        logging.warning(f"Could not reprocess {key}: {error}")
+    summary["errors"] = len(errors)
+    summary["elapsed_seconds"] = round(time.time() - start, 3)
+    # This process only; the pool's CPU time isn't included
+    summary["parent_cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats = sub.add_parser("stats", help="Documents, size and how many are stale under the current config")
+    run = sub.add_parser("reprocess", help="Re-derive the stale documents' keywords from their stored text")
+    for command in (stats, run):
+        command.add_argument("store", help="OCR store directory")
+        command.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="config.yaml holding the skill taxonomy")
+        command.add_argument("--ner", choices=["comprehend", "local", "hybrid", NO_ENTITIES], default="comprehend",
+                             help="Entity backend the results should come from (the API's NER_BACKEND), or "
+                                  "'none' for a process_corpus.py store built without --ner")
+        command.add_argument("--ner-model", default="en_core_web_sm", help="spaCy model for --ner local/hybrid")
+    run.add_argument("--index", help="Skill search index to update with the changed keywords")
+    run.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    run.add_argument("--batch-size", type=int, default=200, help="Documents per pool task")
+    run.add_argument("--limit", type=int, help="Only the first N stale documents")
+    run.add_argument("--region", default=os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-1'),
+                     help="For Comprehend, if entities must be detected again")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from process_corpus import COMPREHEND_EXCLUDE
+    from ner_backends import build_backend
+    ner = NO_ENTITIES if args.ner == NO_ENTITIES else build_backend(args.ner, None, model=args.ner_model).fingerprint()
+    version = cache_version(load_skill_matcher(args.config).fingerprint(), COMPREHEND_EXCLUDE, ner_fingerprint=ner)
+    store = OcrStore(args.store)
+    if args.command == "stats":
+        print(json.dumps(store.stats(version), indent=2))
+        return
+
+    @functools.lru_cache(maxsize=None)
+    def detector():
+        # Only built if some entities must be detected again, which most runs never need
+        chunker = None
+        if args.ner != "local":
+            import boto3
+            from comprehend_batch import ComprehendChunker
+            chunker = ComprehendChunker(boto3.client('comprehend', region_name=args.region))
+        return build_backend(args.ner, chunker, model=args.ner_model)
+
+    def detect_entities(text):
+        return detector().detect(text)
+
+    from skill_index import SkillIndex
+    skill_index = SkillIndex(args.index, compact_after=0) if args.index else None
+    summary = reprocess(store, version, ner, COMPREHEND_EXCLUDE, args.config, skill_index=skill_index,
+                        detect_entities=None if ner == NO_ENTITIES else detect_entities, workers=args.workers,
+                        batch_size=args.batch_size, limit=args.limit)
+    if skill_index is not None:
+        skill_index.compact()
+    store.compact_versions()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
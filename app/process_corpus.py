@@ -0,0 +1,399 @@
+"""
+Offline batch runner over a resume corpus.
+
+Walks a local tree laid out as <root>/<CATEGORY>/*.pdf (or an s3://bucket/prefix
+with the same layout), extracts text (embedded text layer; Textract only for
+pages that need OCR, when --textract-bucket is given), finds skills and
+optionally entities (Comprehend or spaCy, --ner) on a process pool, and writes sharded
+JSONL/Parquet output. Progress is checkpointed to a manifest, so re-running
+the same command after a crash picks up where it stopped.
+
+    python app/process_corpus.py data/raw_pdfs/resume --out output/corpus_run
+    python app/process_corpus.py s3://my-bucket/resume/ --out output/s3_run --comprehend
+    python app/process_corpus.py data/raw_pdfs/resume --out output/local_ner --ner local
+    python app/process_corpus.py data/raw_pdfs/resume --out output/corpus_run --index output/skill_index
+    python app/process_corpus.py data/raw_pdfs/resume --out output/corpus_run --ocr-store output/ocr_store
+"""
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from block_store import BlockStore, iter_textract_blocks, merge_page_stores  # noqa: E402
+from ocr_store import NO_ENTITIES, OcrStore, combine_keywords, make_record  # noqa: E402
+from result_cache import cache_version  # noqa: E402
+from skill_index import SkillIndex  # noqa: E402
+from skill_matcher import load_skill_matcher  # noqa: E402
+from text_layer import route_pages, build_page_subset, SOURCE_TEXTRACT  # noqa: E402
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.yaml')
+COMPREHEND_EXCLUDE = ['PERSON', 'LOCATION', 'DATE', 'ORGANIZATION', 'QUANTITY']
+MANIFEST_NAME = "manifest.jsonl"
+
+
+# --- Document Discovery ---
+def list_local_documents(root):
+    """Returns [(doc_id, category, path)] for <root>/<CATEGORY>/*.pdf, sorted for stable runs."""
+    documents = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith('.pdf'):
+                path = os.path.join(dirpath, name)
+                doc_id = os.path.relpath(path, root).replace(os.sep, '/')
+                category = doc_id.split('/')[-2] if '/' in doc_id else ''
+                documents.append((doc_id, category, path))
+    return sorted(documents)
+
+
+def list_s3_documents(s3_uri, region):
+    import boto3
+    bucket, _, prefix = s3_uri[len("s3://"):].partition('/')
+    paginator = boto3.client('s3', region_name=region).get_paginator('list_objects_v2')
+    documents = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get('Contents', []):
+            key = item['Key']
+            if key.lower().endswith('.pdf'):
+                doc_id = key[len(prefix):].lstrip('/')
+                category = doc_id.split('/')[-2] if '/' in doc_id else ''
+                documents.append((doc_id, category, f"s3://{bucket}/{key}"))
+    return sorted(documents)
+
+
+# --- Worker Process ---
+_worker = {}
+
+
+def init_worker(options):
+    """Runs once per pool process: build the matcher and AWS clients there, not in the parent."""
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    _worker['options'] = options
+    _worker['matcher'] = load_skill_matcher(options['config'])
+    if options['ocr_store']:
+        _worker['ocr_store'] = OcrStore(options['ocr_store'])
+    if options['comprehend'] or options['textract_bucket'] or options['source_is_s3']:
+        import boto3
+        _worker['s3'] = boto3.client('s3', region_name=options['region'])
+    if options['comprehend']:
+        from ner_backends import build_backend
+        chunker = None
+        if options['ner'] != 'local':
+            import boto3
+            from comprehend_batch import ComprehendChunker
+            chunker = ComprehendChunker(boto3.client('comprehend', region_name=options['region']))
+        _worker['comprehend'] = build_backend(options['ner'], chunker, model=options['ner_model'])
+        _worker['comprehend'].load()
+    if options['textract_bucket']:
+        import boto3
+        from textract_poller import TextractPoller
+        _worker['textract'] = boto3.client('textract', region_name=options['region'])
+        _worker['poller'] = TextractPoller(_worker['textract'])
+
+
+def read_document(path):
+    if path.startswith("s3://"):
+        bucket, _, key = path[len("s3://"):].partition('/')
+        return _worker['s3'].get_object(Bucket=bucket, Key=key)['Body'].read()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def ocr_pages(pdf_bytes, page_numbers, doc_id):
+    """Sends just the given pages through an async Textract job. Returns their BlockStore (subset page numbering)."""
+    options = _worker['options']
+    key = f"{options['textract_prefix']}{hashlib.sha256(pdf_bytes).hexdigest()}-{'-'.join(map(str, page_numbers))}.pdf"
+    _worker['s3'].upload_fileobj(io.BytesIO(build_page_subset(pdf_bytes, page_numbers)),
+                                 options['textract_bucket'], key)
+    job_id = _worker['textract'].start_document_text_detection(
+        DocumentLocation={'S3Object': {'Bucket': options['textract_bucket'], 'Name': key}})['JobId']
+    if not _worker['poller'].wait(job_id, pages=len(page_numbers)):
+        raise RuntimeError(f"Textract job {job_id} failed or timed out for {doc_id}")
+    return BlockStore().add_textract_blocks(iter_textract_blocks(_worker['textract'], job_id))
+
+
+def process_document(doc_id, category, path):
+    """Processes one document inside a pool process. Always returns a record (errors included)."""
+    options = _worker['options']
+    start = time.perf_counter()
+    record = {"doc_id": doc_id, "category": category, "source": path}
+    try:
+        pdf_bytes = read_document(path)
+        record["content_sha256"] = hashlib.sha256(pdf_bytes).hexdigest()
+        decisions = route_pages(pdf_bytes)
+        if decisions is None:
+            raise RuntimeError("PDF could not be read locally")
+        needs_ocr = [d["page"] for d in decisions if d["source"] == SOURCE_TEXTRACT]
+        textract_blocks = None
+        if needs_ocr and options['textract_bucket']:
+            textract_blocks = ocr_pages(pdf_bytes, needs_ocr, doc_id)
+        blocks = merge_page_stores(decisions, textract_blocks, needs_ocr)
+        text = blocks.text()
+
+        skills = _worker['matcher'].find_skills(text) if text else []
+        entities = _worker['comprehend'].detect(text) if options['comprehend'] and text else []
+        combined = combine_keywords(skills, entities, COMPREHEND_EXCLUDE)
+        if options['ocr_store'] and (textract_blocks is not None or not needs_ocr):
+            # Re-taggable later without OCR (ocr_store.py reprocess); skipped while pages are still missing
+            store_document(record["content_sha256"], doc_id, category, decisions, blocks, skills, entities, combined)
+
+        record.update({
+            "pages": len(decisions),
+            "text_layer_pages": len(decisions) - len(needs_ocr),
+            "ocr_pages": len(needs_ocr) if options['textract_bucket'] else 0,
+            "skipped_ocr_pages": 0 if options['textract_bucket'] else len(needs_ocr),
+            "text_chars": len(text),
+            "rule_based_skills": sorted(skills),
+            "comprehend_entities": json.dumps(entities),
+            "combined_keywords": sorted(combined),
+            "error": None,
+        })
+        if options['include_text']:
+            record["extracted_text"] = text
+    except Exception as e:
+        record.update({"pages": 0, "error": f"{type(e).__name__}: {e}"})
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return record
+
+
+def store_document(content_hash, doc_id, category, decisions, blocks, skills, entities, combined):
+    options = _worker['options']
+    ner = _worker['comprehend'].fingerprint() if options['comprehend'] else NO_ENTITIES
+    result = {
+        "extraction": {"pages": [{k: v for k, v in d.items() if k != "text"} for d in decisions],
+                       "text_layer_ms": 0.0, "textract_mode": "async" if options['textract_bucket'] else None,
+                       "textract_ms": 0.0},
+        "textract_blocks": blocks.to_dict(),
+        "comprehend_entities": entities,
+        "rule_based_skills": skills,
+        "combined_keywords": combined,
+    }
+    version = cache_version(_worker['matcher'].fingerprint(), COMPREHEND_EXCLUDE, ner_fingerprint=ner)
+    _worker['ocr_store'].put(content_hash, make_record(result, doc_id, category, ner), version)
+
+
+# --- Output & Checkpointing ---
+def parquet_table(records):
+    """Fixed schema, so shards that happen to be all-null in a column still line up."""
+    import pyarrow as pa
+    schema = pa.schema([
+        ("doc_id", pa.string()), ("category", pa.string()), ("source", pa.string()),
+        ("content_sha256", pa.string()), ("pages", pa.int32()), ("text_layer_pages", pa.int32()),
+        ("ocr_pages", pa.int32()), ("skipped_ocr_pages", pa.int32()), ("text_chars", pa.int32()),
+        ("rule_based_skills", pa.list_(pa.string())), ("comprehend_entities", pa.string()),
+        ("combined_keywords", pa.list_(pa.string())), ("error", pa.string()),
+        ("elapsed_ms", pa.float64()), ("extracted_text", pa.string()),
+    ])
+    return pa.Table.from_pylist(records, schema=schema)
+
+
+class ShardWriter:
+    """
+    Buffers records and writes them as numbered shards ('fmt': JSONL, or
+    Parquet, which needs pyarrow). A document is appended to the manifest
+    only after the shard holding it is safely on disk, so a crash never loses
+    a record the manifest claims is done. Documents whose OCR pages were
+    skipped are logged as partial, for a later run with a bucket to redo.
+    """
+
+    def __init__(self, out_dir, shard_size, fmt):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.fmt = fmt
+        self.buffer = []
+        os.makedirs(out_dir, exist_ok=True)
+        self.next_shard = len([n for n in os.listdir(out_dir) if n.startswith("part-")])
+        self.manifest = open(os.path.join(out_dir, MANIFEST_NAME), "a", encoding="utf-8")
+
+    def add(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        name = f"part-{self.next_shard:05d}.{'parquet' if self.fmt == 'parquet' else 'jsonl'}"
+        path = os.path.join(self.out_dir, name)
+        tmp_path = path + ".tmp"
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(parquet_table(self.buffer), tmp_path, compression="zstd")
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self.buffer:
+                    f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, path)
+        for record in self.buffer:
+            self.manifest.write(json.dumps({"doc_id": record["doc_id"], "shard": name, "error": record.get("error"),
+                                            "partial": bool(record.get("skipped_ocr_pages"))}) + "\n")
+        self.manifest.flush()
+        os.fsync(self.manifest.fileno())
+        self.next_shard += 1
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.manifest.close()
+
+
+def list_shards(out_dir):
+    """Output shard file names in write order."""
+    return sorted(n for n in os.listdir(out_dir)
+                  if n.startswith("part-") and (n.endswith(".jsonl") or n.endswith(".parquet")))
+
+
+def read_shard(path, columns=None):
+    """Records of one JSONL or Parquet shard; Parquet reads only 'columns' when given (JSONL has to parse it all)."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns and list(columns)).to_pylist()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def iter_corpus_records(out_dir, skip_shards=(), columns=None):
+    """
+    (shard name, record) for every successful record in an output directory,
+    oldest shard first. 'columns' limits what's read from Parquet shards (the
+    error column is always read, to tell successes apart).
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "error"]))
+    for name in list_shards(out_dir):
+        if name in skip_shards:
+            continue
+        for record in read_shard(os.path.join(out_dir, name), columns):
+            if not record.get("error"):
+                yield name, record
+
+
+def load_completed(out_dir, retry_failed, retry_partial=False):
+    """doc_ids the manifest records as done, less the failed and partial ones when those are to be re-run."""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn final line from a crash
+            if (entry.get("error") and retry_failed) or (entry.get("partial") and retry_partial):
+                completed.discard(entry["doc_id"])
+                continue
+            completed.add(entry["doc_id"])
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Local corpus root (<root>/<CATEGORY>/*.pdf) or s3://bucket/prefix/")
+    parser.add_argument("--out", required=True, help="Output directory for shards and the checkpoint manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=500, help="Records per output shard")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="config.yaml holding the skill taxonomy")
+    parser.add_argument("--comprehend", action="store_true", help="Also run AWS Comprehend entity detection")
+    parser.add_argument("--ner", choices=["comprehend", "local", "hybrid"],
+                        help="Entity detection backend (see ner_backends.py); --comprehend is --ner comprehend")
+    parser.add_argument("--ner-model", default="en_core_web_sm", help="spaCy model for --ner local/hybrid")
+    parser.add_argument("--textract-bucket", help="S3 bucket for OCR of pages without a text layer (without it "
+                                                  "those pages are skipped and counted, and the document is "
+                                                  "re-run by the next run that has a bucket)")
+    parser.add_argument("--textract-prefix", default="batch_ocr/")
+    parser.add_argument("--region", default=os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-1'))
+    parser.add_argument("--include-text", action="store_true", help="Store the extracted text in each record")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run documents that errored last time")
+    parser.add_argument("--limit", type=int, help="Only process the first N pending documents")
+    parser.add_argument("--ocr-store", help="Also keep every document's extracted lines and entities in this OCR "
+                                            "store directory, to re-tag them later without OCR (ocr_store.py)")
+    parser.add_argument("--index", help="Also add the results to the skill search index in this directory "
+                                        "(rebuild it from --out with skill_index.py build if a run was interrupted)")
+    args = parser.parse_args()
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    source_is_s3 = args.source.startswith("s3://")
+    documents = list_s3_documents(args.source, args.region) if source_is_s3 else list_local_documents(args.source)
+    # Documents done without their OCR pages are only worth redoing once there's a bucket to OCR them with
+    completed = load_completed(args.out, args.retry_failed, retry_partial=bool(args.textract_bucket))
+    pending = [d for d in documents if d[0] not in completed]
+    if args.limit:
+        pending = pending[:args.limit]
+    logging.info(f"{len(documents)} documents found, {len(completed)} already done, {len(pending)} to process "
+                 f"on {args.workers} worker(s)")
+    if not pending:
+        return
+
+    ner = args.ner or ("comprehend" if args.comprehend else None)
+    options = {
+        "config": args.config, "comprehend": ner is not None, "ner": ner, "ner_model": args.ner_model,
+        "textract_bucket": args.textract_bucket,
+        "textract_prefix": args.textract_prefix, "region": args.region, "include_text": args.include_text,
+        "source_is_s3": source_is_s3, "ocr_store": args.ocr_store,
+    }
+    writer = ShardWriter(args.out, args.shard_size, args.format)
+    index = SkillIndex(args.index, compact_after=0) if args.index else None
+    to_index = []
+    start = time.time()
+    done = pages = errors = 0
+    last_report = start
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(options,)) as pool:
+            # Keep a bounded number of documents in flight so huge corpora don't queue everything at once
+            queue = iter(pending)
+            in_flight = set()
+            max_in_flight = args.workers * 4
+            while True:
+                while len(in_flight) < max_in_flight:
+                    doc = next(queue, None)
+                    if doc is None:
+                        break
+                    in_flight.add(pool.submit(process_document, *doc))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    writer.add(record)
+                    done += 1
+                    pages += record.get("pages", 0)
+                    if record.get("error"):
+                        errors += 1
+                        logging.warning(f"{record['doc_id']}: {record['error']}")
+                    elif index is not None:
+                        to_index.append((record["content_sha256"], record["combined_keywords"], record["doc_id"],
+                                         record["category"]))
+                if len(to_index) >= args.shard_size:
+                    index.add_many(to_index)
+                    to_index = []
+                now = time.time()
+                if now - last_report >= 5:
+                    elapsed = now - start
+                    logging.info(f"{done}/{len(pending)} docs | {done / elapsed:.1f} docs/s | {pages / elapsed:.1f} pages/s "
+                                 f"| {errors} errors")
+                    last_report = now
+    finally:
+        writer.close()
+        if index is not None:
+            index.add_many(to_index)
+            index.compact()
+
+    elapsed = time.time() - start
+    print(f"Processed {done} documents ({pages} pages, {errors} errors) in {elapsed:.1f}s: "
+          f"{done / elapsed:.1f} docs/sec, {pages / elapsed:.1f} pages/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Quota-aware admission for AWS APIs with account-level limits (Textract and
+Comprehend TPS, concurrent Textract jobs).
+
+Every worker on the host draws from the same token buckets and job slots:
+their state lives in small files under a shared directory, guarded with
+flock, so a worker that dies mid-call can't leak a token or a slot. Within a
+worker, callers are admitted in priority order (interactive uploads ahead of
+bulk work), and one whose wait would run past its priority's budget gets
+QuotaExceeded with a Retry-After hint instead (a 429 to the client). Calls
+that are throttled anyway back off with full jitter and hold the bucket empty
+for everyone else meanwhile, so throughput settles at the quota instead of
+collapsing into retries.
+"""
+import os
+import math
+import time
+import fcntl
+import heapq
+import random
+import struct
+import asyncio
+import logging
+import threading
+import functools
+import itertools
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+from textract_poller import is_throttling_error
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Priority of AWS calls made from the current context (see priority())
+_priority = contextvars.ContextVar('quota_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Marks the AWS calls made inside the block (and from contexts copied off it) as 'level'."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaExceeded(Exception):
+    """No capacity within the caller's wait budget; retry after 'retry_after' seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    'rate' tokens per second, holding at most 'burst'. With a 'path' the level
+    is kept in that file and shared by every process that opens it.
+    """
+    _STATE = struct.Struct('dd')  # tokens, last update (epoch seconds)
+
+    def __init__(self, rate, burst=None, path=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = (self.burst, time.time())
+        self._fd = None
+        self._fd_pid = None
+
+    def try_take(self):
+        """Takes a token if there is one. Returns 0.0 if it did, else the seconds until one is due."""
+        with self._exclusive():
+            now = time.time()
+            tokens, updated = self._load()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            if tokens >= 1:
+                self._store(tokens - 1, now)
+                return 0.0
+            self._store(tokens, now)
+            return (1 - tokens) / self.rate
+
+    def hold_off(self, seconds):
+        """Empties the bucket and delays the next token by 'seconds' (after a throttling response)."""
+        with self._exclusive():
+            now = time.time()
+            tokens, updated = self._load()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            self._store(min(tokens, -seconds * self.rate), now)
+
+    def level(self):
+        with self._exclusive():
+            tokens, updated = self._load()
+            return min(self.burst, tokens + max(0.0, time.time() - updated) * self.rate)
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            if self.path is None:
+                yield
+                return
+            # flock belongs to the open file, so each process needs its own (an inherited fd would share the lock)
+            if self._fd_pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+                self._fd_pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _load(self):
+        if self.path is None:
+            return self._state
+        data = os.pread(self._fd, self._STATE.size, 0)
+        return self._STATE.unpack(data) if len(data) == self._STATE.size else (self.burst, time.time())
+
+    def _store(self, tokens, updated):
+        if self.path is None:
+            self._state = (tokens, updated)
+        else:
+            os.pwrite(self._fd, self._STATE.pack(tokens, updated), 0)
+
+
+class SlotPool:
+    """
+    At most 'size' holders at once. With a 'directory', each slot is a lock
+    file held with flock for as long as the slot is, so the limit spans
+    processes and a slot is freed when its holder exits, however it exits.
+    """
+
+    def __init__(self, size, directory=None):
+        self.size = size
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._free = list(range(size))
+
+    def try_acquire(self):
+        """Returns a handle for release(), or None when every slot is taken."""
+        if self.directory is None:
+            with self._lock:
+                return self._free.pop() if self._free else None
+        for index in random.sample(range(self.size), self.size):
+            fd = os.open(os.path.join(self.directory, f"{index}.lock"), os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def release(self, handle):
+        if self.directory is None:
+            with self._lock:
+                self._free.append(handle)
+        else:
+            os.close(handle)  # drops the flock
+
+
+class QuotaScheduler:
+    """
+    Admits calls against named token buckets ('quotas': {name: tokens per
+    second}) and slot pools ('slots': {name: size}). 'max_wait' maps each
+    priority to how long its callers may queue before being turned away.
+    """
+
+    def __init__(self, quotas, slots=None, state_dir=None, max_wait=None, max_attempts=5, base_backoff=0.25,
+                 max_backoff=20.0, slot_poll_interval=0.25, instrument=None):
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self.state_dir = state_dir
+        self.max_wait = max_wait or {PRIORITY_INTERACTIVE: 10.0, PRIORITY_BULK: 300.0}
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.slot_poll_interval = slot_poll_interval
+        self.instrument = instrument  # optional fn(stage_name) -> context manager, timing the waits
+        self._buckets = {name: TokenBucket(rate, path=state_dir and os.path.join(state_dir, f"{name}.bucket"))
+                         for name, rate in quotas.items()}
+        self._pools = {}
+        for name, size in (slots or {}).items():
+            directory = None
+            if state_dir:
+                directory = os.path.join(state_dir, f"{name}.slots")
+                os.makedirs(directory, exist_ok=True)
+            self._pools[name] = SlotPool(size, directory)
+        self._cond = threading.Condition()
+        self._queues = {name: [] for name in itertools.chain(self._buckets, self._pools)}
+        self._seq = itertools.count()
+        self.stats = {name: {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "rejected": 0, "throttled": 0}
+                      for name in self._queues}
+
+    # --- Admission ---
+    def acquire(self, name):
+        """Blocks until 'name' has capacity for the current priority. Returns a slot handle for slot pools."""
+        entry, deadline = self._enqueue(name)
+        try:
+            granted, handle, wait = self._step(name, entry, deadline)
+            if granted:
+                return handle
+            with self._timed():
+                while not granted:
+                    with self._cond:
+                        self._cond.wait(wait)
+                    granted, handle, wait = self._step(name, entry, deadline)
+                return handle
+        finally:
+            self._leave(name, entry)
+
+    async def acquire_async(self, name):
+        """acquire() for asyncio callers: polls instead of blocking a thread."""
+        entry, deadline = self._enqueue(name)
+        try:
+            granted, handle, wait = self._step(name, entry, deadline)
+            if granted:
+                return handle
+            with self._timed():
+                while not granted:
+                    await asyncio.sleep(wait)
+                    granted, handle, wait = self._step(name, entry, deadline)
+                return handle
+        finally:
+            self._leave(name, entry)
+
+    def release(self, name, handle):
+        self._pools[name].release(handle)
+        with self._cond:
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, name):
+        handle = self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name, handle)
+
+    def call(self, name, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs) once 'name' has a token. Throttling responses are
+        retried with full-jitter backoff; past max_attempts they surface as QuotaExceeded.
+        """
+        for attempt in range(self.max_attempts):
+            self.acquire(name)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_throttling_error(e):
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                with self._cond:
+                    self.stats[name]["throttled"] += 1
+                logging.warning(f"{name} throttled (attempt {attempt + 1}/{self.max_attempts}); "
+                                f"holding off {delay:.2f}s")
+                self._buckets[name].hold_off(delay)
+                if attempt == self.max_attempts - 1:
+                    raise QuotaExceeded(f"{name} is being throttled by AWS", self.max_backoff) from e
+
+    def try_call(self, name, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs) only if 'name' has a token right now and nobody is
+        queued for one, else QuotaExceeded straight away. A throttling response
+        holds the bucket off and is re-raised rather than retried: for callers
+        that reschedule their own work instead of waiting (the Textract poller).
+        """
+        with self._cond:
+            queued = bool(self._queues[name])
+        wait = self.slot_poll_interval if queued else self._buckets[name].try_take()
+        if wait:
+            with self._cond:
+                self.stats[name]["rejected"] += 1
+            raise QuotaExceeded(f"No {name} token free", wait)
+        with self._cond:
+            self.stats[name]["admitted"] += 1
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if is_throttling_error(e):
+                with self._cond:
+                    self.stats[name]["throttled"] += 1
+                self._buckets[name].hold_off(self.base_backoff)
+            raise
+
+    def wrap(self, client, operations):
+        """Proxy for a boto3 client whose listed operations ({method: quota name}) go through call()."""
+        return ScheduledClient(client, self, operations)
+
+    def snapshot(self):
+        with self._cond:
+            snapshot = {name: dict(stats, waiting=len(self._queues[name])) for name, stats in self.stats.items()}
+        for name, bucket in self._buckets.items():
+            snapshot[name].update(rate=bucket.rate, tokens=round(bucket.level(), 2))
+        for name, pool in self._pools.items():
+            snapshot[name].update(size=pool.size)
+        return snapshot
+
+    # --- Internals ---
+    def _enqueue(self, name):
+        level = _priority.get()
+        now = time.time()
+        deadline = now + self.max_wait.get(level, self.max_wait[PRIORITY_BULK])
+        with self._cond:
+            queue = self._queues[name]
+            # Turn the caller away up front if the line ahead of it won't clear in time
+            if name in self._buckets:
+                bucket = self._buckets[name]
+                expected = (sum(1 for e in queue if e[0] <= level) + 1 - bucket.level()) / bucket.rate
+                if now + expected > deadline:
+                    self.stats[name]["rejected"] += 1
+                    raise QuotaExceeded(f"{name} quota is fully booked", expected)
+            entry = (level, next(self._seq), now)
+            heapq.heappush(queue, entry)
+            self.stats[name]["queued"] += 1
+        return entry, deadline
+
+    def _step(self, name, entry, deadline):
+        """One admission attempt. Returns (granted, slot handle, seconds to wait before the next)."""
+        with self._cond:
+            is_head = self._queues[name][0] is entry
+        handle, wait = None, self.slot_poll_interval
+        if is_head:
+            if name in self._buckets:
+                wait = self._buckets[name].try_take()
+                granted = wait == 0
+            else:
+                handle = self._pools[name].try_acquire()
+                granted = handle is not None
+            if granted:
+                with self._cond:
+                    self.stats[name]["admitted"] += 1
+                    self.stats[name]["wait_seconds"] += time.time() - entry[2]
+                return True, handle, 0.0
+        now = time.time()
+        if now >= deadline:
+            with self._cond:
+                self.stats[name]["rejected"] += 1
+            raise QuotaExceeded(f"No {name} capacity within the wait budget", wait)
+        return False, None, max(0.001, min(wait, deadline - now))
+
+    def _leave(self, name, entry):
+        # Admitted, rejected or cancelled: either way the next in line is up
+        with self._cond:
+            queue = self._queues[name]
+            queue.remove(entry)
+            heapq.heapify(queue)
+            self._cond.notify_all()
+
+    def _timed(self):
+        return self.instrument("quota_wait") if self.instrument else nullcontext()
+
+
+class ScheduledClient:
+    """Stands in for a boto3 client; mapped operations wait for their quota (QuotaScheduler.call)."""
+
+    def __init__(self, client, scheduler, operations, wait=True):
+        self.wrapped = client
+        self._scheduler = scheduler
+        self._operations = operations
+        self._wait = wait
+
+    def without_waiting(self):
+        """The same client, with mapped operations failing fast instead of queueing (QuotaScheduler.try_call)."""
+        return ScheduledClient(self.wrapped, self._scheduler, self._operations, wait=False)
+
+    def __getattr__(self, name):
+        attr = getattr(self.wrapped, name)
+        quota = self._operations.get(name)
+        if quota is None:
+            return attr
+        call = self._scheduler.call if self._wait else self._scheduler.try_call
+        return functools.partial(call, quota, attr)
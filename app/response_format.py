@@ -0,0 +1,193 @@
+"""
+How parse results are sent back: which fields (?fields=, ?compact=true), in
+which encoding (Accept: JSON, or MessagePack when msgpack is installed) and
+compressed how (Accept-Encoding: zstd when zstandard is installed, else gzip).
+
+    curl -F resume=@cv.pdf 'http://host/parse_resume?fields=combined_keywords,content_sha256'
+    curl -F resume=@cv.pdf 'http://host/parse_resume?compact=true' -H 'Accept-Encoding: gzip' --compressed
+    curl -F resume=@cv.pdf 'http://host/parse_resume?fields=extracted_text' -H 'Accept: application/msgpack'
+"""
+import gzip
+import json
+import zlib
+
+# orjson serializes these responses several times faster than json; both are optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every field a parse response can carry; extracted_text (the whole document) only when asked for
+FIELDS = ("s3_path", "textract_job_id", "combined_keywords", "rule_based_skills", "comprehend_entities",
+          "text_snippet", "extraction", "near_duplicate", "content_sha256", "cache_hit", "extracted_text")
+DEFAULT_FIELDS = FIELDS[:-1]
+# rule_based_skills and the entity texts are already in combined_keywords; the rest is detail
+COMPACT_FIELDS = ("s3_path", "textract_job_id", "combined_keywords", "near_duplicate", "content_sha256", "cache_hit")
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+class ResponseFormatError(ValueError):
+    """The request asked for something we can't project or encode; answered with 'status'."""
+    status = 400
+
+
+class NotAcceptable(ResponseFormatError):
+    """Every content coding we could send, identity included, was refused."""
+    status = 406
+
+
+def dumps(obj):
+    """Compact JSON as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def parse_quality(header):
+    """{token: q} from an Accept or Accept-Encoding header value (lower-cased tokens, q defaults to 1)."""
+    qualities = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[token.strip().lower()] = q
+    return qualities
+
+
+def _quality(qualities, *tokens, default=0.0):
+    return max((qualities[t] for t in tokens if t in qualities), default=default)
+
+
+def coding_quality(encodings, coding):
+    """
+    q for one content coding from parsed Accept-Encoding: its own entry wins
+    over '*' (so 'gzip;q=0, *' refuses gzip), and identity is acceptable
+    unless refused by name or by '*;q=0'.
+    """
+    if coding in encodings:
+        return encodings[coding]
+    if "*" in encodings:
+        return encodings["*"]
+    return 1.0 if coding == "identity" else 0.0
+
+
+class ResponseFormat:
+    """The fields, media type and content encoding one request asked for."""
+
+    def __init__(self, fields=DEFAULT_FIELDS, media_type=JSON, content_encoding=None, min_compress_bytes=1024,
+                 identity_allowed=True):
+        self.fields = tuple(fields)
+        self.media_type = media_type
+        self.content_encoding = content_encoding
+        self.min_compress_bytes = min_compress_bytes
+        # With identity refused, even bodies under min_compress_bytes go out compressed
+        self.identity_allowed = identity_allowed
+
+    @classmethod
+    def from_request(cls, args, headers, min_compress_bytes=1024):
+        """
+        From the query string ('fields', comma-separated or repeated; 'compact')
+        and the Accept / Accept-Encoding headers. Raises ResponseFormatError for
+        unknown fields, NotAcceptable when no content coding we have is accepted.
+        """
+        requested = [f.strip() for value in args.getlist('fields') for f in value.split(",") if f.strip()]
+        unknown = sorted(set(requested) - set(FIELDS))
+        if unknown:
+            raise ResponseFormatError(f"Unknown field(s) {', '.join(unknown)} (available: {', '.join(FIELDS)})")
+        compact = args.get('compact', 'false').lower() in ('1', 'true', 'yes')
+        fields = requested or (COMPACT_FIELDS if compact else DEFAULT_FIELDS)
+
+        accept = parse_quality(headers.get('Accept'))
+        media_type = JSON
+        if msgpack is not None and _quality(accept, *MSGPACK_TYPES) > _quality(accept, JSON, "application/*", "*/*",
+                                                                                 default=0.0 if accept else 1.0):
+            media_type = MSGPACK
+
+        encodings = parse_quality(headers.get('Accept-Encoding'))
+        identity_allowed = coding_quality(encodings, "identity") > 0
+        # Ties go to the first listed: zstd, then gzip, then identity (None)
+        candidates = [("gzip", coding_quality(encodings, "gzip")), (None, coding_quality(encodings, "identity"))]
+        if zstandard is not None:
+            # Only when asked for by name: '*' shouldn't get clients zstd they can't read
+            candidates.insert(0, ("zstd", encodings.get("zstd", 0.0)))
+        content_encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+        if quality <= 0:
+            raise NotAcceptable(f"No acceptable content coding in Accept-Encoding: {headers.get('Accept-Encoding')} "
+                                f"(available: {'zstd, ' if zstandard is not None else ''}gzip, identity)")
+        return cls(fields, media_type, content_encoding, min_compress_bytes, identity_allowed)
+
+    def project(self, response_data):
+        """The requested fields of a parse response (error responses pass through untouched)."""
+        if "error" in response_data:
+            return response_data
+        return {field: response_data[field] for field in self.fields if field in response_data}
+
+    def encode(self, response_data, project=True):
+        """Projects (unless told not to), serializes and compresses one response. Returns (body, headers)."""
+        data = self.project(response_data) if project else response_data
+        body = msgpack.packb(data) if self.media_type == MSGPACK else dumps(data)
+        headers = {"Content-Type": self.media_type, "Vary": "Accept, Accept-Encoding"}
+        if self.content_encoding and (len(body) >= self.min_compress_bytes or not self.identity_allowed):
+            body = compress(body, self.content_encoding)
+            headers["Content-Encoding"] = self.content_encoding
+        return body, headers
+
+    def stream_encoder(self):
+        """
+        A compressor for NDJSON streams, or None when uncompressed. Each line is
+        flushed as written, so the client still sees items as they finish.
+        Returns (encode(line_bytes) -> bytes, finish() -> bytes, headers).
+        """
+        headers = {"Vary": "Accept-Encoding"}
+        if self.content_encoding is None:
+            return None, None, headers
+        headers["Content-Encoding"] = self.content_encoding
+        if self.content_encoding == "zstd":
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            return (lambda line: compressor.compress(line) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                    compressor.flush, headers)
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        return (lambda line: compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH),
+                compressor.flush, headers)
+
+
+def compress(body, content_encoding):
+    if content_encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_lines(lines, response_format):
+    """Wraps an iterable of NDJSON lines (str or bytes) in the stream's compression. Returns (lines, headers)."""
+    encode, finish, headers = response_format.stream_encoder()
+    if encode is None:
+        return lines, headers
+
+    def compressed():
+        for line in lines:
+            yield encode(line.encode('utf-8') if isinstance(line, str) else line)
+        yield finish()
+    return compressed(), headers
@@ -0,0 +1,279 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Bump whenever text extraction / skill matching / entity handling changes output,
+# so entries written by older code stop matching.
+EXTRACTION_CODE_VERSION = "5"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def read_and_hash(file, chunk_size=READ_CHUNK_SIZE):
+    """Reads a binary file object to the end, hashing as it goes. Returns (bytes, sha256 hex digest)."""
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def cache_version(skill_fingerprint, exclude_types, code_version=EXTRACTION_CODE_VERSION, ner_fingerprint=None):
+    """
+    Short fingerprint of everything that decides what a cached result looks
+    like. 'ner_fingerprint' is the entity backend's; Comprehend's is None and
+    leaves the version as it was before backends were pluggable.
+    """
+    parts = {
+        "code": code_version,
+        "skills": skill_fingerprint,
+        "exclude": sorted(exclude_types),
+    }
+    if ner_fingerprint is not None:
+        parts["ner"] = ner_fingerprint
+    fingerprint = json.dumps(parts, sort_keys=True)
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0,
+                         "memory_evictions": 0, "disk_evictions": 0, "expired": 0}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+class MemoryLRU:
+    """Bounded in-memory LRU, limited by entry count and by approximate payload bytes."""
+
+    def __init__(self, stats, max_items=256, max_bytes=64 * 1024 * 1024):
+        self.stats = stats
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats.incr("memory_evictions")
+
+    def usage(self):
+        with self._lock:
+            return {"items": len(self._entries), "bytes": self._bytes}
+
+
+class DiskStore:
+    """
+    Gzipped JSON files in a directory shared by all workers on the node.
+    Entries older than 'ttl' are dropped on read, and the oldest files are
+    removed once the directory grows past 'max_bytes'.
+    """
+
+    def __init__(self, stats, directory, max_bytes=1024 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.stats = stats
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.ttl:
+                self._remove(path)
+                self.stats.incr("expired")
+                return None
+            with gzip.open(path, 'rb') as f:
+                value = json.loads(f.read())
+            os.utime(path)  # keeps recently used entries away from eviction
+            return value
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+                self._remove(path)
+            return None
+
+    def put(self, key, payload):
+        """'payload' is the already-serialized JSON bytes."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wb', compresslevel=5) as f:
+                f.write(payload)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Failed to write cache entry {path}: {e}")
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            self._bytes += size - replaced
+            over_limit = self._bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """Deletes expired files, then the least recently used ones until under 90% of max_bytes."""
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            cutoff = time.time() - self.ttl
+            for path, mtime, size in entries:
+                if mtime >= cutoff and total <= self.max_bytes * 0.9:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.stats.incr("disk_evictions")
+            self._bytes = total
+
+    def usage(self):
+        with self._lock:
+            return {"bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json.gz'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((os.path.join(self.directory, name), st.st_mtime, st.st_size))
+        return entries
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+class S3Store:
+    """Optional shared tier in S3 so every pod benefits. Expiry is left to an S3 lifecycle rule on the prefix."""
+
+    def __init__(self, stats, s3_client, bucket, prefix="cache/results/"):
+        self.stats = stats
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json.gz")
+            return json.loads(gzip.decompress(response['Body'].read()))
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code', '')
+            if code not in ('NoSuchKey', '404'):
+                logging.warning(f"S3 cache lookup failed for {key}: {e}")
+            return None
+
+    def put(self, key, payload):
+        try:
+            self.s3_client.put_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json.gz",
+                                      Body=gzip.compress(payload, compresslevel=5),
+                                      ContentType='application/json', ContentEncoding='gzip')
+        except Exception as e:
+            logging.error(f"Failed to write S3 cache entry {key}: {e}")
+
+    def usage(self):
+        return {"bucket": self.bucket, "prefix": self.prefix}
+
+
+class ResultCache:
+    """
+    Content-addressed cache of pipeline results, keyed by the SHA-256 of the
+    uploaded PDF plus a version fingerprint of the skill list and extraction
+    code. Lookups go memory LRU -> persistent tier; hits from the persistent
+    tier are promoted into memory.
+    """
+
+    def __init__(self, version, max_items=256, max_memory_bytes=64 * 1024 * 1024,
+                 directory=None, max_disk_bytes=1024 * 1024 * 1024, ttl=7 * 24 * 3600,
+                 s3_client=None, s3_bucket=None, s3_prefix="cache/results/"):
+        self.version = version
+        self.stats = CacheStats()
+        self.memory = MemoryLRU(self.stats, max_items=max_items, max_bytes=max_memory_bytes)
+        if s3_client is not None and s3_bucket:
+            self.persistent = S3Store(self.stats, s3_client, s3_bucket, prefix=s3_prefix)
+        elif directory:
+            self.persistent = DiskStore(self.stats, directory, max_bytes=max_disk_bytes, ttl=ttl)
+        else:
+            self.persistent = None
+
+    def key(self, content_hash):
+        return f"{content_hash}-{self.version}"
+
+    def get(self, content_hash):
+        key = self.key(content_hash)
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.incr("memory_hits")
+            return value
+        if self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.stats.incr("disk_hits")
+                self.memory.put(key, value, len(json.dumps(value)))
+                return value
+        self.stats.incr("misses")
+        return None
+
+    def put(self, content_hash, value):
+        key = self.key(content_hash)
+        payload = json.dumps(value).encode('utf-8')
+        self.memory.put(key, value, len(payload))
+        if self.persistent is not None:
+            self.persistent.put(key, payload)
+        self.stats.incr("puts")
+
+    def info(self):
+        info = {"version": self.version, "counters": self.stats.snapshot(), "memory": self.memory.usage()}
+        if self.persistent is not None:
+            info["persistent"] = self.persistent.usage()
+        return info
@@ -0,0 +1,228 @@
+"""
+Python client for the resume parser API, shared by the Gradio UI and bulk
+scripts.
+
+One pooled keep-alive session per client (connections are reused across calls
+and threads), retries with exponential backoff (honouring Retry-After) that
+never re-send an upload that could start a second job (UploadSafeRetry),
+and concurrent multi-file submission
+capped at 'max_concurrency'. When the server supports async jobs, each upload
+returns a job id right away and the result is fetched by long-polling
+/jobs/<id>; otherwise the upload waits for the result.
+
+    python app/resume_client.py http://localhost:5000 data/raw_pdfs/resume/HR/*.pdf --out results.jsonl
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ResumeParserError(Exception):
+    """The API answered with an error, or a job didn't finish in time."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadSafeRetry(Retry):
+    """
+    Retries GETs on connection and read errors and on any status in
+    status_forcelist, but re-sends an upload (POST) only on a connection that
+    never opened or a 429/503. A 503 comes from admission, before any work.
+    A 429 from a synchronous parse can come part-way through, after the upload
+    went to S3 and some AWS calls were made, once the quota ran out; re-sending
+    it is still safe, because a synchronous parse is idempotent: the failed
+    attempt cached and stored nothing, and the retry computes the same result
+    under the same content hash (the partial work, and the first attempt's S3
+    object, are simply wasted). Async submissions are answered 202 or 503,
+    never 429. A 502/504 or a read timeout can come after the server accepted
+    the upload, and re-sending an async submission then would start a second
+    job.
+    """
+    POST_RETRY_STATUSES = frozenset({429, 503})
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST":
+            return status_code in self.POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class ResumeParserClient:
+    """
+    'base_url' is the API root (a URL ending in /parse_resume is accepted too).
+    Results come back as the items /parse_resumes streams:
+    {"index", "filename", "status", "result"} or {..., "error"}. 'fields'
+    limits each result to those response fields (the API's ?fields=).
+    """
+
+    def __init__(self, base_url, max_concurrency=8, use_async_jobs=True, max_retries=4, backoff_factor=0.5,
+                 connect_timeout=5, request_timeout=300, poll_wait=20, job_timeout=900, fields=None):
+        base_url = base_url.rstrip('/')
+        if base_url.endswith('/parse_resume'):
+            base_url = base_url[:-len('/parse_resume')]
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.use_async_jobs = use_async_jobs
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout  # a synchronous parse can take minutes on a scanned resume
+        self.poll_wait = poll_wait              # server-side long-poll per GET /jobs/<id>
+        self.job_timeout = job_timeout
+        self.params = {'fields': ",".join(fields)} if fields else {}
+        retry = UploadSafeRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            # Read errors are only retried for these; POSTs get UploadSafeRetry's narrower rules
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_concurrency), max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    # --- Single document ---
+    def parse(self, path, filename=None, category=None):
+        """Parses one PDF (a path, or bytes with 'filename'). Returns the API's JSON; raises ResumeParserError."""
+        filename, pdf_bytes = self._read(path, filename)
+        data = {'category': category} if category else None
+        files = {'resume': (filename, pdf_bytes, 'application/pdf')}
+        if not self.use_async_jobs:
+            response = self.session.post(f"{self.base_url}/parse_resume", params=self.params, files=files, data=data,
+                                         timeout=(self.connect_timeout, self.request_timeout))
+            return self._json(response)
+
+        response = self.session.post(f"{self.base_url}/parse_resume", params={**self.params, 'async': 'true'},
+                                     files=files, data=data, timeout=(self.connect_timeout, self.request_timeout))
+        if response.status_code != 202:
+            # A server without async jobs just answers the upload
+            return self._json(response)
+        return self.wait_for_job(response.json()['job_id'])
+
+    def wait_for_job(self, job_id):
+        deadline = time.monotonic() + self.job_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ResumeParserError(f"Job {job_id} did not finish within {self.job_timeout:.0f}s")
+            wait_seconds = min(self.poll_wait, remaining)
+            response = self.session.get(f"{self.base_url}/jobs/{job_id}",
+                                        params={**self.params, 'wait': f"{wait_seconds:.1f}"},
+                                        timeout=(self.connect_timeout, wait_seconds + 30))
+            job = self._json(response)
+            if job['status'] == "succeeded":
+                return job['result']
+            if job['status'] == "failed":
+                error = job.get('error') or {}
+                raise ResumeParserError(error.get('error', "Job failed"), job.get('http_status'))
+
+    # --- Many documents ---
+    def parse_many(self, paths, category=None):
+        """
+        Parses many PDFs with at most max_concurrency in flight and yields each
+        result item as it finishes (completion order; 'index' is the position
+        in 'paths'). Failures are items with an 'error', never exceptions.
+        """
+        paths = iter(enumerate(paths))
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="resume-client") as pool:
+            in_flight = {}
+            while True:
+                # Submit lazily so a huge list of paths isn't read into memory up front
+                while len(in_flight) < self.max_concurrency:
+                    index, path = next(paths, (None, None))
+                    if path is None:
+                        break
+                    in_flight[pool.submit(self._parse_item, index, path, category)] = index
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+                    yield future.result()
+
+    def _parse_item(self, index, path, category):
+        filename = os.path.basename(path) if isinstance(path, str) else f"document-{index}.pdf"
+        start = time.perf_counter()
+        item = {"index": index, "filename": filename}
+        try:
+            item.update(status=200, result=self.parse(path, filename, category))
+        except ResumeParserError as e:
+            item.update(status=e.status or 500, error=str(e))
+        except (requests.RequestException, OSError) as e:
+            item.update(status=0, error=f"{type(e).__name__}: {e}")
+        item["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        return item
+
+    # --- Helpers ---
+    @staticmethod
+    def _read(path, filename):
+        if isinstance(path, (bytes, bytearray)):
+            return filename or "resume.pdf", bytes(path)
+        with open(path, 'rb') as f:
+            return filename or os.path.basename(path), f.read()
+
+    @staticmethod
+    def _json(response):
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"error": response.text[:500] or response.reason}
+        if response.status_code >= 400:
+            raise ResumeParserError(payload.get('error', f"HTTP {response.status_code}"), response.status_code)
+        return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url", help="API root, e.g. http://localhost:5000")
+    parser.add_argument("paths", nargs="+", help="PDF files")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--category")
+    parser.add_argument("--sync", action="store_true", help="Wait on each upload instead of using async jobs")
+    parser.add_argument("--fields", help="Comma-separated response fields, e.g. combined_keywords,extracted_text")
+    parser.add_argument("--out", help="Write one JSON line per document here (default: stdout)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    start = time.perf_counter()
+    failed = 0
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        with ResumeParserClient(args.base_url, max_concurrency=args.concurrency,
+                                use_async_jobs=not args.sync,
+                                fields=args.fields.split(",") if args.fields else None) as client:
+            for done, item in enumerate(client.parse_many(args.paths, args.category), start=1):
+                failed += 'error' in item
+                out.write(json.dumps(item) + "\n")
+                out.flush()
+                logging.info(f"[{done}/{len(args.paths)}] {item['filename']}: {item['status']}"
+                             f"{' ' + item['error'] if 'error' in item else ''}")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    logging.info(f"{len(args.paths)} documents ({failed} failed) in {elapsed:.1f}s: "
+                 f"{len(args.paths) / elapsed:.2f} docs/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,657 @@
+"""
+Inverted index from normalized skills/entities (the combined keywords) to the
+resumes that have them, with boolean search and ranking.
+
+On disk an index directory holds:
+
+  segment.idx          immutable, memory-mapped: sorted term dictionary, varint
+                       delta-compressed posting lists, per-document metadata
+  updates-<gen>.jsonl  append-only log of documents added since generation
+                       <gen> of the segment was built
+
+Any number of processes can add documents (one O_APPEND write per document)
+and search; each tails the log into a small in-memory delta. Compaction folds
+the log into the next generation's segment under an exclusive lock and swaps
+it in with a rename, which the other processes notice and remap.
+
+    python app/skill_index.py build output/corpus_run --index output/skill_index
+    python app/skill_index.py search output/skill_index 'python AND (aws OR gcp) AND NOT java' --category ENGINEERING
+"""
+import os
+import io
+import re
+import sys
+import json
+import mmap
+import time
+import fcntl
+import bisect
+import logging
+import argparse
+import threading
+import contextlib
+from contextlib import contextmanager
+
+import numpy as np
+
+SEGMENT_NAME = "segment.idx"
+LOG_NAME = "updates-{:06d}.jsonl"
+LOCK_NAME = "index.lock"
+MAGIC = b"RSIX0001"
+UNCATEGORIZED = ""
+
+# BM25 with binary term frequency: documents are ranked by the idf of the query
+# terms they match, damped for resumes with unusually many keywords
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_term(term):
+    return _WHITESPACE_RE.sub(" ", str(term).strip().lower())
+
+
+# --- Posting list codec ---
+def encode_postings(doc_ids):
+    """Sorted unique doc ids -> LEB128 varints of the gaps (first id as-is). Vectorized."""
+    ids = np.asarray(doc_ids, dtype=np.uint64)
+    if not len(ids):
+        return b""
+    gaps = np.diff(ids, prepend=np.uint64(0))
+    widths = np.ones(len(gaps), dtype=np.int64)
+    for bits in (7, 14, 21, 28, 35):
+        widths += gaps >= (1 << bits)
+    owner = np.repeat(np.arange(len(gaps)), widths)
+    position = np.arange(widths.sum()) - np.repeat(np.cumsum(widths) - widths, widths)
+    out = (gaps[owner] >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)
+    out |= (position < widths[owner] - 1).astype(np.uint64) << np.uint64(7)
+    return out.astype(np.uint8).tobytes()
+
+
+def decode_postings(data):
+    """Inverse of encode_postings(), also vectorized. Returns a sorted uint32 array."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    is_last = raw < 0x80
+    if is_last.all():
+        # Every gap fits in one byte: the common case for frequent skills
+        return np.cumsum(raw, dtype=np.uint32)
+    ends = np.flatnonzero(is_last)
+    starts = np.empty_like(ends)
+    starts[0], starts[1:] = 0, ends[:-1] + 1
+    owner = np.zeros(len(raw), dtype=np.intp)
+    owner[starts[1:]] = 1
+    np.cumsum(owner, out=owner)
+    shifts = ((np.arange(len(raw)) - starts[owner]) * 7).astype(np.uint64)
+    gaps = np.add.reduceat((raw & 0x7F).astype(np.uint64) << shifts, starts)
+    return np.cumsum(gaps).astype(np.uint32)
+
+
+# --- Segment (immutable, memory-mapped) ---
+def _pack_strings(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def write_segment(path, docs, generation):
+    """
+    Writes generation 'generation' of the segment, holding 'docs'
+    ([(key, name, category, terms)], doc id = position), to 'path' atomically.
+    """
+    categories = sorted({category or UNCATEGORIZED for _, _, category, _ in docs})
+    category_ids = {category: i for i, category in enumerate(categories)}
+
+    term_docs = {}
+    for doc_id, (_, _, _, terms) in enumerate(docs):
+        for term in terms:
+            term_docs.setdefault(term, []).append(doc_id)
+    terms = sorted(term_docs, key=lambda t: t.encode("utf-8"))
+    postings = [encode_postings(term_docs[t]) for t in terms]
+    posting_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    np.cumsum([len(p) for p in postings], out=posting_offsets[1:])
+
+    term_blob, term_offsets = _pack_strings(terms)
+    key_blob, key_offsets = _pack_strings([d[0] for d in docs])
+    name_blob, name_offsets = _pack_strings([d[1] or "" for d in docs])
+    sections = {
+        "term_blob": term_blob,
+        "term_offsets": term_offsets,
+        "doc_freq": np.array([len(term_docs[t]) for t in terms], dtype=np.uint32),
+        "posting_offsets": posting_offsets,
+        "postings": b"".join(postings),
+        "key_blob": key_blob,
+        "key_offsets": key_offsets,
+        "name_blob": name_blob,
+        "name_offsets": name_offsets,
+        "doc_category": np.array([category_ids[d[2] or UNCATEGORIZED] for d in docs], dtype=np.uint16),
+        "doc_length": np.array([len(d[3]) for d in docs], dtype=np.uint32),
+    }
+
+    directory, body, offset = {}, io.BytesIO(), 0
+    for name, value in sections.items():
+        data = value.tobytes() if isinstance(value, np.ndarray) else value
+        dtype = value.dtype.str if isinstance(value, np.ndarray) else "bytes"
+        offset += (-offset) % 8  # keep every array 8-byte aligned for frombuffer
+        body.seek(offset)
+        body.write(data)
+        directory[name] = [offset, len(data), dtype]
+        offset += len(data)
+    header = json.dumps({"docs": len(docs), "terms": len(terms), "categories": categories,
+                         "generation": generation, "sections": directory}).encode("utf-8")
+    preamble = MAGIC + len(header).to_bytes(8, "little") + header
+    preamble += b"\0" * ((-len(preamble)) % 8)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(preamble)
+        f.write(body.getbuffer())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """Read-only view of a segment file. Arrays are numpy views straight onto the mapping."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a skill index segment")
+        header_len = int.from_bytes(self._mm[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + header_len])
+        base = start + header_len + ((-(start + header_len)) % 8)
+        self.num_docs = header["docs"]
+        self.num_terms = header["terms"]
+        self.categories = header["categories"]
+        self.generation = header["generation"]
+        for name, (offset, length, dtype) in header["sections"].items():
+            if dtype == "bytes":
+                value = memoryview(self._mm)[base + offset:base + offset + length]
+            else:
+                value = np.frombuffer(self._mm, dtype=np.dtype(dtype), count=length // np.dtype(dtype).itemsize,
+                                      offset=base + offset)
+            setattr(self, "_" + name, value)
+
+    @classmethod
+    def empty(cls):
+        segment = cls.__new__(cls)
+        segment.path, segment.inode, segment._mm = None, None, None
+        segment.num_docs = segment.num_terms = segment.generation = 0
+        segment.categories = []
+        segment._doc_freq = np.empty(0, dtype=np.uint32)
+        segment._doc_category = np.empty(0, dtype=np.uint16)
+        segment._doc_length = np.empty(0, dtype=np.uint32)
+        return segment
+
+    def term_id(self, term):
+        if not self.num_terms:
+            return None
+        encoded = term.encode("utf-8")
+        i = bisect.bisect_left(_StringView(self._term_blob, self._term_offsets), encoded)
+        if i < self.num_terms and self._string(self._term_blob, self._term_offsets, i) == encoded:
+            return i
+        return None
+
+    def postings(self, term_id):
+        start, end = self._posting_offsets[term_id], self._posting_offsets[term_id + 1]
+        return decode_postings(self._postings[start:end])
+
+    def doc_freq(self, term_id):
+        return int(self._doc_freq[term_id])
+
+    def key(self, doc_id):
+        return self._string(self._key_blob, self._key_offsets, doc_id).decode("utf-8")
+
+    def name(self, doc_id):
+        return self._string(self._name_blob, self._name_offsets, doc_id).decode("utf-8")
+
+    def terms(self):
+        return [self._string(self._term_blob, self._term_offsets, i).decode("utf-8") for i in range(self.num_terms)]
+
+    def docs(self):
+        """Every document as (key, name, category, terms); used when compacting."""
+        doc_terms = [[] for _ in range(self.num_docs)]
+        for term_id, term in enumerate(self.terms()):
+            for doc_id in self.postings(term_id):
+                doc_terms[doc_id].append(term)
+        return [(self.key(i), self.name(i), self.categories[self._doc_category[i]], doc_terms[i])
+                for i in range(self.num_docs)]
+
+    @staticmethod
+    def _string(blob, offsets, i):
+        return bytes(blob[offsets[i]:offsets[i + 1]])
+
+    def close(self):
+        if self._mm is not None:
+            # Views handed out (numpy arrays) keep the mapping alive; let the GC drop it when they're gone
+            self._mm = None
+
+
+class _StringView:
+    """Sequence over the packed term strings, for bisect."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+# --- Query parsing ---
+class QueryError(ValueError):
+    """The search expression can't be parsed."""
+
+
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\()|(\))|([^\s()"]+)')
+_OPERATORS = ("AND", "OR", "NOT")
+
+
+def parse_query(query):
+    """
+    Parses 'python AND (aws OR gcp) AND NOT java' into a nested tuple tree:
+    ('term', t) | ('and', a, b) | ('or', a, b) | ('not', a). Operators are
+    uppercase; NOT binds tightest, then AND, then OR. Consecutive bare words
+    form one multi-word skill ('machine learning' is a single term, not
+    machine AND learning), as do quoted phrases. Other operands with no
+    operator between them ('"machine learning" python', 'aws (python OR go)')
+    are ANDed.
+    """
+    tokens = []
+    open_phrase = False
+    for quoted, lparen, rparen, word in _QUERY_TOKEN_RE.findall(query or ""):
+        if lparen or rparen or word in _OPERATORS:
+            tokens.append(lparen or rparen or word)
+            open_phrase = False
+        elif word and open_phrase:
+            tokens[-1] = ("term", f"{tokens[-1][1]} {normalize_term(word)}")
+        elif normalize_term(quoted or word):
+            tokens.append(("term", normalize_term(quoted or word)))
+            open_phrase = bool(word)
+    if not tokens:
+        raise QueryError("Empty query")
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take(expected=None):
+        nonlocal position
+        token = peek()
+        if token is None or (expected is not None and token != expected):
+            raise QueryError(f"Expected {expected or 'a term'} at token {position + 1}")
+        position += 1
+        return token
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take("OR")
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() == "AND" or peek() == "NOT" or peek() == "(" or isinstance(peek(), tuple):
+            if peek() == "AND":
+                take("AND")
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            take("NOT")
+            return ("not", parse_not())
+        if peek() == "(":
+            take("(")
+            node = parse_or()
+            take(")")
+            return node
+        token = take()
+        if not isinstance(token, tuple):
+            raise QueryError(f"Unexpected '{token}' at token {position}")
+        return token
+
+    tree = parse_or()
+    if position != len(tokens):
+        raise QueryError(f"Unexpected '{tokens[position]}' at token {position + 1}")
+    return tree
+
+
+def positive_terms(tree, negated=False):
+    """Terms that count towards ranking (the ones not under a NOT)."""
+    kind = tree[0]
+    if kind == "term":
+        return [] if negated else [tree[1]]
+    if kind == "not":
+        return positive_terms(tree[1], not negated)
+    return positive_terms(tree[1], negated) + positive_terms(tree[2], negated)
+
+
+# --- Index ---
+class SkillIndex:
+    """
+    Segment plus the update log's tail. Thread safe; every method first
+    picks up what other processes appended or compacted since the last call.
+    """
+
+    def __init__(self, directory, compact_after=5000):
+        self.directory = directory
+        self.compact_after = compact_after  # delta size (docs) that triggers a background compaction
+        os.makedirs(directory, exist_ok=True)
+        self._segment_path = os.path.join(directory, SEGMENT_NAME)
+        self._lock_path = os.path.join(directory, LOCK_NAME)
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._segment = None
+        self._reset_delta(Segment.empty())
+
+    def _reset_delta(self, segment):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = segment
+        self._log_path = os.path.join(self.directory, LOG_NAME.format(segment.generation))
+        self._log_position = 0
+        self._delta_docs = []        # [(key, name, category, terms)], doc id = segment.num_docs + position
+        self._delta_postings = {}    # term -> [delta doc ids]
+        self._latest = {}            # key -> newest doc id, for keys added since the segment was built
+        self._categories = {c: i for i, c in enumerate(segment.categories)}
+        self._delta_category = []
+        self._delta_length = []
+        self._key_index = None
+        self._cached_arrays = None
+
+    @contextmanager
+    def _file_lock(self, mode):
+        # Shared for adds, exclusive for compaction. Always taken before self._lock.
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, mode)
+            yield
+
+    # --- Writing ---
+    def add(self, key, terms, name=None, category=None):
+        """Adds (or replaces, by 'key') a document. Visible to every process on its next search."""
+        self.add_many([(key, terms, name, category)])
+
+    def add_many(self, docs):
+        """add() for an iterable of (key, terms, name, category), in one write."""
+        lines = []
+        for key, terms, name, category in docs:
+            terms = sorted({normalize_term(t) for t in terms} - {""})
+            lines.append(json.dumps({"key": key, "name": name, "category": category or UNCATEGORIZED,
+                                     "terms": terms}) + "\n")
+        if not lines:
+            return
+        with self._file_lock(fcntl.LOCK_SH):
+            with self._lock:
+                # No compaction can run meanwhile, so this is the current generation's log
+                self._refresh()
+                with open(self._log_path, "a", encoding="utf-8") as log:
+                    log.write("".join(lines))
+                self._refresh()
+                due = self.compact_after and len(self._delta_docs) >= self.compact_after and not self._compacting
+                if due:
+                    self._compacting = True
+        if due:
+            threading.Thread(target=self._compact_in_background, name="skill-index-compact", daemon=True).start()
+
+    def compact(self, min_pending=0):
+        """
+        Folds the update log into the next generation's segment, unless fewer
+        than 'min_pending' documents are waiting (another process got there first).
+        """
+        with self._file_lock(fcntl.LOCK_EX), self._lock:
+            self._refresh()
+            if len(self._delta_docs) < min_pending:
+                return
+            old_log = self._log_path
+            docs = self._live_docs()
+            write_segment(self._segment_path, docs, self._segment.generation + 1)
+            self._reset_delta(Segment(self._segment_path))
+            # Everything in the old log is in the new segment; a crash before this just leaves a stray file
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(old_log)
+        logging.info(f"Compacted skill index in {self.directory}: {len(docs)} documents")
+
+    def _compact_in_background(self):
+        try:
+            self.compact(min_pending=self.compact_after)
+        except Exception as e:
+            logging.error(f"Skill index compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def _live_docs(self):
+        segment = self._segment
+        replaced = set(self._replaced_segment_docs())
+        live = [doc for doc_id, doc in enumerate(segment.docs()) if doc_id not in replaced]
+        base = segment.num_docs
+        live.extend(doc for i, doc in enumerate(self._delta_docs) if self._latest[doc[0]] == base + i)
+        return live
+
+    # --- Refresh from disk ---
+    def _refresh(self):
+        with self._lock:
+            try:
+                inode = os.stat(self._segment_path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != self._segment.inode:
+                # Compacted (by us or another process): the new segment holds everything in our delta
+                self._reset_delta(Segment(self._segment_path) if inode is not None else Segment.empty())
+            try:
+                size = os.path.getsize(self._log_path)
+            except FileNotFoundError:
+                return
+            if size <= self._log_position:
+                return
+            with open(self._log_path, "rb") as log:
+                log.seek(self._log_position)
+                data = log.read(size - self._log_position)
+            complete = data.rfind(b"\n") + 1  # leave a half-written final line for later
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._add_delta(entry["key"], entry.get("name"), entry.get("category") or UNCATEGORIZED,
+                                entry["terms"])
+            self._log_position += complete
+
+    def _add_delta(self, key, name, category, terms):
+        doc_id = self._segment.num_docs + len(self._delta_docs)
+        self._delta_docs.append((key, name, category, terms))
+        for term in terms:
+            self._delta_postings.setdefault(term, []).append(doc_id)
+        if category not in self._categories:
+            self._categories[category] = len(self._categories)
+        self._delta_category.append(self._categories[category])
+        self._delta_length.append(len(terms))
+        self._latest[key] = doc_id
+        self._cached_arrays = None
+
+    def _replaced_segment_docs(self):
+        """Segment doc ids whose key has been added again since."""
+        if not self._latest or not self._segment.num_docs:
+            return []
+        if self._key_index is None:
+            self._key_index = {self._segment.key(i): i for i in range(self._segment.num_docs)}
+        return [self._key_index[key] for key in self._latest if key in self._key_index]
+
+    def _arrays(self):
+        """(live mask, category ids, doc lengths) over segment + delta docs, rebuilt only after changes."""
+        if self._cached_arrays is None:
+            segment = self._segment
+            live = np.ones(segment.num_docs + len(self._delta_docs), dtype=bool)
+            # Only the newest copy of a key is live
+            live[self._replaced_segment_docs()] = False
+            live[[i for i, doc in enumerate(self._delta_docs, start=segment.num_docs)
+                  if self._latest[doc[0]] != i]] = False
+            categories = np.concatenate((segment._doc_category.astype(np.int32),
+                                         np.array(self._delta_category, dtype=np.int32)))
+            lengths = np.concatenate((segment._doc_length.astype(np.float64),
+                                      np.array(self._delta_length, dtype=np.float64)))
+            self._cached_arrays = (live, categories, lengths)
+        return self._cached_arrays
+
+    # --- Reading ---
+    def postings(self, term):
+        """Sorted doc ids (segment + delta, stale copies included) containing 'term'."""
+        term = normalize_term(term)
+        parts = []
+        term_id = self._segment.term_id(term)
+        if term_id is not None:
+            parts.append(self._segment.postings(term_id))
+        if term in self._delta_postings:
+            parts.append(np.array(self._delta_postings[term], dtype=np.uint32))
+        if not parts:
+            return np.empty(0, dtype=np.uint32)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def search(self, query, categories=None, limit=20, offset=0):
+        """
+        Runs a boolean query (see parse_query) restricted to 'categories' (None =
+        all). Returns {"total", "results": [{key, name, category, score, matched}]}
+        ranked by BM25 over the matched positive terms, best first.
+        """
+        tree = parse_query(query)
+        with self._lock:
+            self._refresh()
+            live, doc_categories, lengths = self._arrays()
+            cache = {}
+
+            # Sets of documents are boolean masks over every doc id: AND/OR/NOT are
+            # single vectorized passes whatever the posting list lengths
+            def evaluate(node):
+                kind = node[0]
+                if kind == "term":
+                    if node[1] not in cache:
+                        mask = np.zeros(len(live), dtype=bool)
+                        mask[self.postings(node[1])] = True
+                        cache[node[1]] = mask
+                    return cache[node[1]]
+                if kind == "not":
+                    return ~evaluate(node[1])
+                if kind == "and":
+                    return evaluate(node[1]) & evaluate(node[2])
+                return evaluate(node[1]) | evaluate(node[2])
+
+            selected = evaluate(tree) & live
+            if categories:
+                wanted = np.zeros(max(len(self._categories), 1), dtype=bool)
+                wanted[[self._categories[c] for c in categories if c in self._categories]] = True
+                selected &= wanted[doc_categories]
+            hits = np.flatnonzero(selected)
+            total = int(len(hits))
+            if not total:
+                return {"total": 0, "results": []}
+
+            num_live = max(1, int(np.count_nonzero(live)))
+            average_length = float(lengths[live].mean()) or 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[hits] / average_length)
+            scores = np.zeros(total, dtype=np.float64)
+            matched = {}
+            for term in dict.fromkeys(positive_terms(tree)):
+                has_term = cache[term][hits]
+                if not has_term.any():
+                    continue
+                doc_freq = int(np.count_nonzero(cache[term] & live))
+                idf = np.log(1 + (num_live - doc_freq + 0.5) / (doc_freq + 0.5))
+                scores += has_term * idf * (BM25_K1 + 1) / (1 + norm)
+                matched[term] = has_term
+
+            window = min(total, offset + limit)
+            if window <= 0:
+                return {"total": total, "results": []}
+            # Ties broken by newest document first, so every document tied with the last one in the window
+            # has to be in the running
+            if window < total:
+                cutoff = np.partition(scores, total - window)[total - window]
+                top = np.flatnonzero(scores >= cutoff)
+            else:
+                top = np.arange(total)
+            top = top[np.lexsort((-hits[top].astype(np.int64), -scores[top]))][offset:window]
+            category_names = {i: c for c, i in self._categories.items()}
+            results = []
+            for i in top:
+                doc_id = int(hits[i])
+                key, name = self._describe(doc_id)
+                results.append({
+                    "key": key,
+                    "name": name,
+                    "category": category_names.get(int(doc_categories[doc_id])) or None,
+                    "score": round(float(scores[i]), 4),
+                    "matched": [term for term, has_term in matched.items() if has_term[i]],
+                })
+            return {"total": total, "results": results}
+
+    def _describe(self, doc_id):
+        if doc_id < self._segment.num_docs:
+            return self._segment.key(doc_id), self._segment.name(doc_id) or None
+        key, name, _, _ = self._delta_docs[doc_id - self._segment.num_docs]
+        return key, name
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            live, _, _ = self._arrays()
+            return {
+                "documents": int(live.sum()),
+                "segment_documents": self._segment.num_docs,
+                "segment_terms": self._segment.num_terms,
+                "pending_documents": len(self._delta_docs),
+                "categories": sorted(c for c in self._categories if c),
+            }
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index a process_corpus.py output directory")
+    build.add_argument("corpus_out", help="Directory with part-*.jsonl / part-*.parquet shards")
+    build.add_argument("--index", required=True, help="Index directory (created if missing)")
+    search = sub.add_parser("search", help="Query an index")
+    search.add_argument("index")
+    search.add_argument("query")
+    search.add_argument("--category", action="append")
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = SkillIndex(args.index, compact_after=0)
+        count = 0
+        batch = []
+        from process_corpus import iter_corpus_records  # imports this module
+        for _, record in iter_corpus_records(args.corpus_out, columns=("doc_id", "category", "content_sha256",
+                                                                        "combined_keywords")):
+            batch.append((record.get("content_sha256") or record["doc_id"], record["combined_keywords"],
+                          record["doc_id"], record.get("category")))
+            if len(batch) == 1000:
+                index.add_many(batch)
+                count += len(batch)
+                batch = []
+        index.add_many(batch)
+        count += len(batch)
+        index.compact()
+        print(f"Indexed {count} documents into {args.index} in {time.perf_counter() - start:.1f}s: {index.stats()}")
+    else:
+        start = time.perf_counter()
+        result = SkillIndex(args.index, compact_after=0).search(args.query, args.category, limit=args.limit)
+        print(json.dumps(result, indent=2))
+        print(f"{(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import pickle
+import bisect
+import hashlib
+import logging
+import argparse
+from collections import namedtuple
+
+import yaml
+
+# Text is split into runs of letters/digits (keeping trailing '+'/'#', so 'c++' and 'c#'
+# stay whole) and single punctuation characters ('.net' -> '.', 'net'; 'ci/cd' -> 'ci', '/', 'cd').
+# Matching whole tokens gives word boundaries for free: 'go' no longer matches inside 'google'.
+TOKEN_RE = re.compile(r"[^\W_]+[+#]*|[^\w\s]|_")
+_TERMINAL = ""  # trie key marking the end of a term; never produced by TOKEN_RE
+
+SkillMatch = namedtuple("SkillMatch", ["skill", "term", "start", "end"])
+
+
+def tokenize(text):
+    """Yields (lowercased token, start offset, end offset) over the original text."""
+    for m in TOKEN_RE.finditer(text):
+        yield m.group().lower(), m.start(), m.end()
+
+
+class SkillMatcher:
+    """
+    Matches a whole skill taxonomy (canonical skills plus synonyms) in one pass
+    over the text, using a trie keyed on tokens. Cost grows with text length
+    and the longest phrase, not with the number of skills.
+
+    Terms that are also everyday words ('go', 'spring', 'rest') can be listed
+    as ambiguous: they only count when another, unambiguous match is at most
+    'context_tokens' tokens away, as in a skills list ('Python, Go, SQL'), but
+    not in running prose ('ready to go').
+    """
+
+    def __init__(self, taxonomy, ambiguous=(), context_tokens=3):
+        """'taxonomy' maps canonical skill -> list of synonyms (the skill name itself is always a term)."""
+        self._trie = {}
+        self._terms = {}
+        self.max_phrase_tokens = 0
+        for skill, synonyms in taxonomy.items():
+            skill = str(skill).strip().lower()
+            if not skill:
+                continue
+            for term in [skill] + [str(s).strip().lower() for s in (synonyms or [])]:
+                self._add(term, skill)
+        self.skills = sorted(set(self._terms.values()))
+        self.ambiguous = frozenset(str(term).strip().lower() for term in ambiguous)
+        self.context_tokens = context_tokens
+
+    def _add(self, term, skill):
+        tokens = [tok for tok, _, _ in tokenize(term)]
+        if not tokens:
+            return
+        if term in self._terms and self._terms[term] != skill:
+            logging.warning(f"Skill term '{term}' listed under both '{self._terms[term]}' and '{skill}'; keeping the first")
+            return
+        node = self._trie
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        node.setdefault(_TERMINAL, (skill, term))
+        self._terms[term] = skill
+        self.max_phrase_tokens = max(self.max_phrase_tokens, len(tokens))
+
+    def find_all(self, text):
+        """Returns every SkillMatch in the text (overlapping phrases included), in text order."""
+        if not text:
+            return []
+        tokens = list(tokenize(text))
+        trie = self._trie
+        matches, spans = [], []
+        for i in range(len(tokens)):
+            node = trie.get(tokens[i][0])
+            j = i
+            while node is not None:
+                hit = node.get(_TERMINAL)
+                if hit is not None:
+                    matches.append(SkillMatch(hit[0], hit[1], tokens[i][1], tokens[j][2]))
+                    spans.append((i, j))
+                j += 1
+                if j >= len(tokens):
+                    break
+                node = node.get(tokens[j][0])
+        if not self.ambiguous:
+            return matches
+        return self._in_context(matches, spans)
+
+    def _in_context(self, matches, spans):
+        """Drops ambiguous-term matches with no unambiguous match within context_tokens tokens."""
+        anchors = [span for match, span in zip(matches, spans) if match.term not in self.ambiguous]
+        anchor_starts = [start for start, _ in anchors]  # in token order already
+        kept = []
+        for match, (start, end) in zip(matches, spans):
+            if match.term in self.ambiguous:
+                # Anchors that could end within reach start no earlier than this
+                lo = bisect.bisect_left(anchor_starts, start - self.context_tokens - self.max_phrase_tokens)
+                hi = bisect.bisect_right(anchor_starts, end + self.context_tokens + 1)
+                if not any(max(a_start - end, start - a_end) <= self.context_tokens + 1
+                           for a_start, a_end in anchors[lo:hi]):
+                    continue
+            kept.append(match)
+        return kept
+
+    def find_skills(self, text):
+        """Distinct canonical skills found in the text."""
+        return list({m.skill for m in self.find_all(text)})
+
+    def fingerprint(self):
+        """Stable hash of the term -> skill mapping (and context rule), for versioning cached results."""
+        state = sorted(self._terms.items())
+        if self.ambiguous:
+            state = [state, sorted(self.ambiguous), self.context_tokens]
+        data = json.dumps(state).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    def __len__(self):
+        return len(self._terms)
+
+    # --- Prebuilt matcher files ---
+    # Stored as plain dicts/lists so the file doesn't depend on how this module was imported
+    def save(self, path):
+        state = {"format": 1, "trie": self._trie, "terms": self._terms, "max_phrase_tokens": self.max_phrase_tokens,
+                 "ambiguous": sorted(self.ambiguous), "context_tokens": self.context_tokens}
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        # Only load matcher files you built yourself: this is a pickle.
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if not isinstance(state, dict) or state.get("format") != 1:
+            raise ValueError(f"{path} is not a skill matcher file")
+        matcher = cls.__new__(cls)
+        matcher._trie = state["trie"]
+        matcher._terms = state["terms"]
+        matcher.max_phrase_tokens = state["max_phrase_tokens"]
+        matcher.skills = sorted(set(matcher._terms.values()))
+        # Files written before ambiguous terms existed have none
+        matcher.ambiguous = frozenset(state.get("ambiguous", ()))
+        matcher.context_tokens = state.get("context_tokens", 3)
+        return matcher
+
+
+# --- Taxonomy Loading ---
+def _normalize_taxonomy(data):
+    """Accepts {skill: [synonyms]}, {skill: None} or a plain list of skills."""
+    if data is None:
+        return {}
+    if isinstance(data, list):
+        return {str(skill): [] for skill in data}
+    if isinstance(data, dict):
+        return {str(skill): list(synonyms or []) for skill, synonyms in data.items()}
+    raise ValueError(f"Unsupported taxonomy format: {type(data).__name__}")
+
+
+def load_taxonomy_file(path):
+    """
+    Loads a skills file: .yaml/.yml/.json ({skill: [synonyms]} or a list), or
+    .txt/.csv with one skill per line as 'skill, synonym, synonym'.
+    """
+    if path.endswith((".yaml", ".yml", ".json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+        if isinstance(data, dict) and "skills" in data:
+            data = data["skills"]
+        return _normalize_taxonomy(data)
+
+    taxonomy = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = [p.strip() for p in line.split(",") if p.strip()]
+            taxonomy.setdefault(parts[0], []).extend(parts[1:])
+    return taxonomy
+
+
+def load_skill_matcher(config_path, fallback_skills=(), use_prebuilt=True):
+    """
+    Builds the matcher described by the 'skills' section of config.yaml:
+
+        skills:
+          prebuilt_matcher: path/to/matcher.pkl   # optional, used as-is if present
+          taxonomy_file: path/to/skills.txt       # optional, merged with 'terms'
+          terms:
+            python: []
+            kubernetes: [k8s]
+            go: [golang]
+          ambiguous_terms: [go]   # optional, see SkillMatcher
+          context_tokens: 3
+
+    Relative paths are resolved against the config file's directory. Falls back
+    to 'fallback_skills' if the config is missing or has no skills.
+    """
+    section = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            section = (yaml.safe_load(f) or {}).get("skills") or {}
+    else:
+        logging.warning(f"Skills config not found at {config_path}; using built-in skill list")
+    base_dir = os.path.dirname(os.path.abspath(config_path)) if config_path else os.getcwd()
+
+    prebuilt = section.get("prebuilt_matcher") if use_prebuilt else None
+    if prebuilt:
+        prebuilt = os.path.join(base_dir, prebuilt)
+        if os.path.exists(prebuilt):
+            matcher = SkillMatcher.load(prebuilt)
+            logging.info(f"Loaded prebuilt skill matcher with {len(matcher)} terms from {prebuilt}")
+            return matcher
+        logging.warning(f"Prebuilt skill matcher {prebuilt} not found; building from taxonomy")
+
+    taxonomy = {}
+    if section.get("taxonomy_file"):
+        taxonomy.update(load_taxonomy_file(os.path.join(base_dir, section["taxonomy_file"])))
+    for skill, synonyms in _normalize_taxonomy(section.get("terms")).items():
+        taxonomy.setdefault(skill, []).extend(synonyms)
+    if not taxonomy:
+        taxonomy = _normalize_taxonomy(list(fallback_skills))
+
+    matcher = SkillMatcher(taxonomy, ambiguous=section.get("ambiguous_terms") or (),
+                           context_tokens=int(section.get("context_tokens", 3)))
+    logging.info(f"Built skill matcher: {len(matcher.skills)} skills, {len(matcher)} terms")
+    return matcher
+
+
+if __name__ == "__main__":
+    # Prebuild a matcher file so workers don't re-parse a large taxonomy on startup:
+    #   python app/skill_matcher.py --config config/config.yaml --out config/skill_matcher.pkl
+    parser = argparse.ArgumentParser(description="Build a serialized skill matcher from a taxonomy")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml"))
+    parser.add_argument("--taxonomy-file", help="Skills file to use instead of the config's taxonomy")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.taxonomy_file:
+        built = SkillMatcher(load_taxonomy_file(args.taxonomy_file))
+    else:
+        built = load_skill_matcher(args.config, use_prebuilt=False)
+    built.save(args.out)
+    logging.info(f"Wrote {len(built)} terms to {args.out}")
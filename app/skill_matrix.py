@@ -0,0 +1,404 @@
+"""
+Resume x skill matrix over a process_corpus.py run, for corpus analytics:
+skill frequency per category, co-occurrence, the most distinctive skills of a
+job family (TF-IDF style) and resume-to-resume similarity.
+
+Rows are resumes (labelled with their <CATEGORY> directory), columns are the
+normalized keywords (rule-based skills and Comprehend entities, as combined by
+the pipeline), stored as a binary scipy CSR matrix so every query is a sparse
+matrix product. The matrix is saved as one compressed .npz (no pickles) that
+remembers which output shards it has ingested, so 'build' on a growing run
+only reads the new shards.
+
+    python app/skill_matrix.py build output/corpus_run --matrix output/skills.npz
+    python app/skill_matrix.py top output/skills.npz --category INFORMATION-TECHNOLOGY
+    python app/skill_matrix.py distinctive output/skills.npz --category HR
+    python app/skill_matrix.py related output/skills.npz python
+    python app/skill_matrix.py similar output/skills.npz INFORMATION-TECHNOLOGY/10089434.pdf
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from process_corpus import COMPREHEND_EXCLUDE, iter_corpus_records  # noqa: E402
+
+FORMAT_VERSION = 1
+# Where a term came from (bit flags; a skill can be both)
+KIND_RULE = 1
+KIND_COMPREHEND = 2
+KIND_ANY = KIND_RULE | KIND_COMPREHEND
+# Memory per block when co-occurrence is computed densely
+DENSE_BLOCK_BYTES = 32 * 1024 * 1024
+# What add_records reads from a corpus record; Parquet shards skip the rest (extracted_text above all)
+RECORD_COLUMNS = ("doc_id", "category", "content_sha256", "rule_based_skills", "comprehend_entities")
+
+
+def record_terms(record):
+    """{term: kind} for one corpus record, normalized like api.combine_results."""
+    terms = {}
+    for skill in record.get("rule_based_skills") or []:
+        terms[skill.lower()] = KIND_RULE
+    entities = record.get("comprehend_entities") or "[]"
+    for entity in json.loads(entities) if isinstance(entities, str) else entities:
+        if entity.get("Type") not in COMPREHEND_EXCLUDE:
+            text = entity["Text"].lower()
+            terms[text] = terms.get(text, 0) | KIND_COMPREHEND
+    return terms
+
+
+def _pack(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack(blob, offsets):
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+class SkillMatrix:
+    """
+    Binary resume x term matrix with the labels to query it. Build it with
+    add_records() / ingest(), or load() a saved one.
+    """
+
+    def __init__(self):
+        self.doc_ids = []
+        self.doc_keys = []                              # content_sha256
+        self.categories = []
+        self.doc_category = np.empty(0, dtype=np.int32)
+        self.terms = []
+        self.term_kind = np.empty(0, dtype=np.uint8)
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.shards = set()                             # output shards already ingested
+        self._term_ids = {}
+        self._doc_rows = {}
+        self._category_ids = {}
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # --- Building ---
+    def add_records(self, records):
+        """
+        Appends corpus records as rows. A record whose doc_id is already
+        present replaces the old row (a re-processed document).
+        """
+        rows, cols, doc_ids, doc_keys, doc_category = [], [], [], [], []
+        kinds = list(self.term_kind)
+        for record in records:
+            row = len(doc_ids)
+            for term, kind in record_terms(record).items():
+                if not term:
+                    continue
+                col = self._term_ids.get(term)
+                if col is None:
+                    col = self._term_ids[term] = len(self.terms)
+                    self.terms.append(term)
+                    kinds.append(0)
+                kinds[col] |= kind
+                rows.append(row)
+                cols.append(col)
+            category = record.get("category") or ""
+            if category not in self._category_ids:
+                self._category_ids[category] = len(self.categories)
+                self.categories.append(category)
+            doc_ids.append(record["doc_id"])
+            doc_keys.append(record.get("content_sha256") or "")
+            doc_category.append(self._category_ids[category])
+        if not doc_ids:
+            return 0
+
+        num_terms = len(self.terms)
+        block = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                  shape=(len(doc_ids), num_terms))
+        old = self.matrix
+        old.resize((old.shape[0], num_terms))  # new terms are empty columns for the existing rows
+        self.matrix = sparse.vstack([old, block], format="csr")
+        self.term_kind = np.array(kinds, dtype=np.uint8)
+        self.doc_ids.extend(doc_ids)
+        self.doc_keys.extend(doc_keys)
+        self.doc_category = np.concatenate((self.doc_category, np.array(doc_category, dtype=np.int32)))
+
+        # Later rows win: drop earlier rows for the same doc_id
+        last_row = {d: i for i, d in enumerate(self.doc_ids)}
+        if len(last_row) < len(self.doc_ids):
+            keep = np.zeros(len(self.doc_ids), dtype=bool)
+            keep[list(last_row.values())] = True
+            self.matrix = self.matrix[keep]
+            self.doc_category = self.doc_category[keep]
+            self.doc_ids = [d for d, k in zip(self.doc_ids, keep) if k]
+            self.doc_keys = [d for d, k in zip(self.doc_keys, keep) if k]
+        self._doc_rows = {d: i for i, d in enumerate(self.doc_ids)}
+        self._cache = {}
+        return len(doc_ids)
+
+    def ingest(self, out_dir):
+        """Adds the records of every output shard not ingested yet. Returns how many were added."""
+        added = 0
+        batch, batch_shards = [], set()
+        for shard, record in iter_corpus_records(out_dir, skip_shards=self.shards, columns=RECORD_COLUMNS):
+            batch.append(record)
+            batch_shards.add(shard)
+        added += self.add_records(batch)
+        self.shards |= batch_shards
+        return added
+
+    # --- Persistence ---
+    def save(self, path):
+        matrix = self.matrix.tocsr()
+        matrix.sort_indices()
+        arrays = {"version": np.array([FORMAT_VERSION]), "indptr": matrix.indptr.astype(np.int64),
+                  "indices": matrix.indices.astype(np.int32), "shape": np.array(matrix.shape, dtype=np.int64),
+                  "doc_category": self.doc_category, "term_kind": self.term_kind}
+        for name, strings in (("doc_ids", self.doc_ids), ("doc_keys", self.doc_keys), ("terms", self.terms),
+                              ("categories", self.categories), ("shards", sorted(self.shards))):
+            arrays[f"{name}_blob"], arrays[f"{name}_offsets"] = _pack(strings)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"][0]) != FORMAT_VERSION:
+                raise ValueError(f"{path} has format version {int(data['version'][0])}, expected {FORMAT_VERSION}")
+            strings = {name: _unpack(data[f"{name}_blob"], data[f"{name}_offsets"])
+                       for name in ("doc_ids", "doc_keys", "terms", "categories", "shards")}
+            indices, indptr = data["indices"], data["indptr"]
+            skills = cls()
+            skills.matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                                              shape=tuple(data["shape"]))
+            skills.doc_category = data["doc_category"]
+            skills.term_kind = data["term_kind"]
+        skills.doc_ids, skills.doc_keys = strings["doc_ids"], strings["doc_keys"]
+        skills.terms, skills.categories = strings["terms"], strings["categories"]
+        skills.shards = set(strings["shards"])
+        skills._term_ids = {t: i for i, t in enumerate(skills.terms)}
+        skills._doc_rows = {d: i for i, d in enumerate(skills.doc_ids)}
+        skills._category_ids = {c: i for i, c in enumerate(skills.categories)}
+        return skills
+
+    # --- Building blocks (cached until the next add) ---
+    def doc_freq(self):
+        """Resumes per term."""
+        if "doc_freq" not in self._cache:
+            self._cache["doc_freq"] = np.asarray(self.matrix.sum(axis=0)).ravel()
+        return self._cache["doc_freq"]
+
+    def columns(self):
+        """The matrix in CSC form, for slicing by term."""
+        if "columns" not in self._cache:
+            self._cache["columns"] = self.matrix.tocsc()
+        return self._cache["columns"]
+
+    def category_sizes(self):
+        return np.bincount(self.doc_category, minlength=len(self.categories))
+
+    def category_counts(self):
+        """(categories x terms) dense array: resumes in each category having each term."""
+        if "category_counts" not in self._cache:
+            membership = sparse.csr_matrix(
+                (np.ones(len(self.doc_ids), dtype=np.float32), (self.doc_category, np.arange(len(self.doc_ids)))),
+                shape=(len(self.categories), len(self.doc_ids)))
+            self._cache["category_counts"] = (membership @ self.matrix).toarray()
+        return self._cache["category_counts"]
+
+    def idf(self):
+        """Smoothed inverse document frequency, as in scikit-learn's TfidfTransformer."""
+        return np.log((1 + len(self.doc_ids)) / (1 + self.doc_freq())) + 1
+
+    def tfidf_rows(self):
+        """Rows weighted by idf and L2-normalized, so a dot product is the cosine similarity."""
+        if "tfidf_rows" not in self._cache:
+            weighted = self.matrix @ sparse.diags(self.idf().astype(np.float32))
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            self._cache["tfidf_rows"] = sparse.diags(1 / norms.astype(np.float32)) @ weighted
+        return self._cache["tfidf_rows"]
+
+    def _term_mask(self, kinds, min_docs=1):
+        return ((self.term_kind & kinds) != 0) & (self.doc_freq() >= min_docs)
+
+    def _category_id(self, category):
+        if category not in self._category_ids:
+            raise KeyError(f"Unknown category: {category}")
+        return self._category_ids[category]
+
+    def _term_id(self, term):
+        term = term.lower()
+        if term not in self._term_ids:
+            raise KeyError(f"Unknown term: {term}")
+        return self._term_ids[term]
+
+    def _top(self, scores, mask, n):
+        candidates = np.flatnonzero(mask & (scores > 0))
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    # --- Queries ---
+    def frequencies(self, category=None, n=20, kinds=KIND_ANY):
+        """Most common terms in 'category' (None = whole corpus): [(term, resumes, share)]."""
+        if category is None:
+            counts, size = self.doc_freq(), len(self.doc_ids)
+        else:
+            cid = self._category_id(category)
+            counts, size = self.category_counts()[cid], self.category_sizes()[cid]
+        top = self._top(counts, self._term_mask(kinds), n)
+        return [(self.terms[i], int(counts[i]), round(float(counts[i]) / max(1, size), 4)) for i in top]
+
+    def frequency_table(self, terms, kinds=KIND_ANY):
+        """{category: {term: share of the category's resumes}} for the given terms."""
+        ids = [self._term_id(t) for t in terms]
+        shares = self.category_counts()[:, ids] / np.maximum(1, self.category_sizes())[:, None]
+        return {category: {self.terms[t]: round(float(s), 4) for t, s in zip(ids, row)}
+                for category, row in zip(self.categories, shares)}
+
+    def distinctive(self, category, n=20, min_docs=3, kinds=KIND_ANY):
+        """
+        Terms that set 'category' apart: share of its resumes with the term times
+        the term's idf over the corpus. Returns [(term, score, share, lift)],
+        lift being how much likelier the term is in the category than overall.
+        """
+        cid = self._category_id(category)
+        share = self.category_counts()[cid] / max(1, self.category_sizes()[cid])
+        overall = self.doc_freq() / max(1, len(self.doc_ids))
+        scores = share * self.idf()
+        top = self._top(scores, self._term_mask(kinds, min_docs), n)
+        return [(self.terms[i], round(float(scores[i]), 4), round(float(share[i]), 4),
+                 round(float(share[i] / overall[i]), 2)) for i in top]
+
+    def cooccurrence(self, terms=None, kinds=KIND_ANY):
+        """
+        Resumes having both terms, for every pair of 'terms' (None = all terms
+        of the given kinds). Returns (terms, matrix); the diagonal is the doc
+        frequency. Sparse for the full vocabulary, dense for an explicit list.
+        """
+        if terms is None:
+            ids = np.flatnonzero(self._term_mask(kinds))
+            columns = self.columns()[:, ids]
+            return [self.terms[i] for i in ids], (columns.T @ columns).tocsr()
+        ids = [self._term_id(t) for t in terms]
+        columns = self.columns()[:, ids].tocsr()
+        # Dense BLAS on row blocks beats a sparse product once the terms are common ones
+        step = max(1, DENSE_BLOCK_BYTES // (4 * max(1, len(ids))))
+        counts = np.zeros((len(ids), len(ids)), dtype=np.float32)
+        for start in range(0, columns.shape[0], step):
+            block = columns[start:start + step].toarray()
+            counts += block.T @ block
+        return [self.terms[i] for i in ids], counts.astype(np.int64)
+
+    def related(self, term, n=20, min_docs=3, kinds=KIND_ANY):
+        """
+        Terms that co-occur with 'term' more than chance: [(other, together,
+        P(other | term), lift)], by lift.
+        """
+        tid = self._term_id(term)
+        columns = self.columns()
+        rows = columns.indices[columns.indptr[tid]:columns.indptr[tid + 1]]
+        together = np.asarray(self.matrix[rows].sum(axis=0)).ravel()
+        conditional = together / max(1, len(rows))
+        lift = conditional / np.maximum(self.doc_freq() / max(1, len(self.doc_ids)), 1e-12)
+        mask = self._term_mask(kinds, min_docs) & (together >= min(min_docs, len(rows)))
+        mask[tid] = False
+        top = self._top(lift, mask, n)
+        return [(self.terms[i], int(together[i]), round(float(conditional[i]), 4), round(float(lift[i]), 2))
+                for i in top]
+
+    def similarity(self, doc_a, doc_b):
+        """Cosine similarity of two resumes' idf-weighted term vectors."""
+        rows = self.tfidf_rows()
+        a, b = rows[self._doc_rows[doc_a]], rows[self._doc_rows[doc_b]]
+        return float(a.multiply(b).sum())
+
+    def similar(self, doc_id, n=10, category=None):
+        """Resumes most like 'doc_id' (optionally only from 'category'): [(doc_id, category, cosine)]."""
+        rows = self.tfidf_rows()
+        row = self._doc_rows[doc_id]
+        scores = np.asarray((rows @ rows[row].T).todense()).ravel()
+        mask = np.ones(len(scores), dtype=bool)
+        mask[row] = False
+        if category is not None:
+            mask &= self.doc_category == self._category_id(category)
+        top = self._top(scores, mask, n)
+        return [(self.doc_ids[i], self.categories[self.doc_category[i]], round(float(scores[i]), 4)) for i in top]
+
+    def summary(self):
+        return {
+            "resumes": len(self.doc_ids),
+            "terms": len(self.terms),
+            "rule_based_terms": int(np.count_nonzero(self.term_kind & KIND_RULE)),
+            "comprehend_terms": int(np.count_nonzero(self.term_kind & KIND_COMPREHEND)),
+            "nonzeros": int(self.matrix.nnz),
+            "categories": dict(zip(self.categories, self.category_sizes().tolist())),
+            "shards": len(self.shards),
+        }
+
+
+# --- CLI ---
+def print_rows(header, rows):
+    widths = [max(len(str(v)) for v in column) for column in zip(header, *rows)]
+    for values in [header, *rows]:
+        print("  ".join(str(v).ljust(w) for v, w in zip(values, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Create or update the matrix from a process_corpus.py output directory")
+    build.add_argument("corpus_out")
+    build.add_argument("--matrix", required=True, help=".npz file (updated in place if it exists)")
+    build.add_argument("--rebuild", action="store_true", help="Ignore the existing file and read every shard")
+    for name, help_text in [("summary", "Corpus overview"), ("top", "Most frequent terms"),
+                            ("distinctive", "Most distinctive terms of a category"),
+                            ("related", "Terms that co-occur with a term"), ("similar", "Resumes like a resume")]:
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("matrix")
+        if name == "related":
+            command.add_argument("term")
+        if name == "similar":
+            command.add_argument("doc_id")
+        if name in ("top", "distinctive", "similar"):
+            command.add_argument("--category", required=name == "distinctive")
+        command.add_argument("-n", type=int, default=20)
+        command.add_argument("--kinds", choices=["any", "rule", "comprehend"], default="any")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "build":
+        start = time.perf_counter()
+        existing = os.path.exists(args.matrix) and not args.rebuild
+        skills = SkillMatrix.load(args.matrix) if existing else SkillMatrix()
+        added = skills.ingest(args.corpus_out)
+        skills.save(args.matrix)
+        print(f"Added {added} resumes ({len(skills)} total, {len(skills.terms)} terms) in "
+              f"{time.perf_counter() - start:.2f}s; {os.path.getsize(args.matrix) / 1024:.0f} KiB on disk")
+        return
+
+    skills = SkillMatrix.load(args.matrix)
+    kinds = {"any": KIND_ANY, "rule": KIND_RULE, "comprehend": KIND_COMPREHEND}[args.kinds]
+    if args.command == "summary":
+        print(json.dumps(skills.summary(), indent=2))
+    elif args.command == "top":
+        print_rows(("term", "resumes", "share"), skills.frequencies(args.category, args.n, kinds))
+    elif args.command == "distinctive":
+        print_rows(("term", "score", "share", "lift"), skills.distinctive(args.category, args.n, kinds=kinds))
+    elif args.command == "related":
+        print_rows(("term", "together", "P(term|query)", "lift"), skills.related(args.term, args.n, kinds=kinds))
+    else:
+        print_rows(("doc_id", "category", "cosine"), skills.similar(args.doc_id, args.n, args.category))
+
+
+if __name__ == "__main__":
+    main()
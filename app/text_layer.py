@@ -0,0 +1,146 @@
+import io
+import time
+import logging
+
+# PyMuPDF is much faster than pypdf (~10 ms vs ~300 ms per resume), but it is
+# AGPL-3.0 (or a commercial licence from Artifex), where pypdf is BSD. So it is
+# deliberately left out of requirements.txt: the image we ship reads PDFs with
+# pypdf only, and a deployment that installs pymupdf for the speed takes on the
+# AGPL's terms for this service (or buys the commercial licence).
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+SOURCE_TEXT_LAYER = "text_layer"
+SOURCE_TEXTRACT = "textract"
+
+# Characters we expect in real resume text besides letters, digits and whitespace
+_COMMON_PUNCTUATION = set(".,;:!?'\"()[]{}<>-_/\\|@#$%&*+=~`^•·–—’‘“”…●▪■◦")
+
+
+def is_available():
+    return pymupdf is not None or pypdf is not None
+
+
+def is_usable_text(text, min_chars=32, min_clean_ratio=0.85):
+    """
+    Decides whether an embedded text layer can stand in for OCR. Rejects
+    near-empty pages (scans) and pages whose text is mostly unmapped glyphs,
+    replacement characters or '(cid:NN)' escapes (broken font encodings).
+    Returns (usable, reason).
+    """
+    stripped = "".join(text.split()) if text else ""
+    if len(stripped) < min_chars:
+        return False, "no_text_layer"
+    if stripped.count("(cid:") * 6 > len(stripped) * 0.1:
+        return False, "cid_glyphs"
+    clean = sum(1 for c in stripped if c.isalnum() or c in _COMMON_PUNCTUATION)
+    if clean / len(stripped) < min_clean_ratio:
+        return False, "garbled"
+    return True, "ok"
+
+
+def extract_page_texts(pdf_bytes):
+    """Returns the embedded text of each page, or None if the PDF can't be opened locally."""
+    timed = extract_timed_page_texts(pdf_bytes)
+    return None if timed is None else [text for text, _ in timed]
+
+
+def extract_timed_page_texts(pdf_bytes):
+    """
+    Returns (text, ms) for each page, 'ms' being the time spent extracting
+    that page (opening the document isn't counted against any page), or None
+    if the PDF can't be opened locally.
+    """
+    try:
+        if pymupdf is not None:
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+                return [_timed(page.get_text) for page in doc]
+        if pypdf is not None:
+            reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+            return [_timed(lambda: page.extract_text() or "") for page in reader.pages]
+    except Exception as e:
+        logging.warning(f"Could not read embedded text layer: {e}")
+    return None
+
+
+def count_pages(pdf_bytes):
+    """The document's page count, or None if the PDF can't be opened locally."""
+    try:
+        if pymupdf is not None:
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+                return doc.page_count
+        if pypdf is not None:
+            return len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    except Exception as e:
+        logging.warning(f"Could not count PDF pages: {e}")
+    return None
+
+
+def _timed(extract):
+    start = time.perf_counter()
+    text = extract()
+    return text, (time.perf_counter() - start) * 1000
+
+
+def route_pages(pdf_bytes, min_chars=32, min_clean_ratio=0.85):
+    """
+    Pulls the text layer page by page and decides which pages can skip OCR.
+    Returns a list of per-page decisions:
+        {"page": 1-based number, "source": "text_layer" | "textract",
+         "reason": str, "chars": int, "ms": float, "text": str | None}
+    ("ms": that page's text extraction) or None if the PDF can't be read
+    locally (the caller should OCR everything).
+    """
+    if not is_available():
+        return None
+    page_texts = extract_timed_page_texts(pdf_bytes)
+    if page_texts is None:
+        return None
+
+    decisions = []
+    for number, (text, ms) in enumerate(page_texts, start=1):
+        usable, reason = is_usable_text(text, min_chars, min_clean_ratio)
+        decisions.append({
+            "page": number,
+            "source": SOURCE_TEXT_LAYER if usable else SOURCE_TEXTRACT,
+            "reason": reason,
+            "chars": len(text or ""),
+            "ms": round(ms, 2),
+            "text": text if usable else None,
+        })
+    return decisions
+
+
+def build_page_subset(pdf_bytes, page_numbers):
+    """Writes a new PDF holding only the given 1-based pages, in order (needs pypdf)."""
+    if pypdf is None:
+        raise RuntimeError("pypdf is required to split PDFs")
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    writer = pypdf.PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number - 1])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def split_pages(pdf_bytes, page_numbers):
+    """One single-page PDF per 1-based page number, all from a single parse of the document (needs pypdf)."""
+    if pypdf is None:
+        raise RuntimeError("pypdf is required to split PDFs")
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    pages = []
+    for number in page_numbers:
+        writer = pypdf.PdfWriter()
+        writer.add_page(reader.pages[number - 1])
+        out = io.BytesIO()
+        writer.write(out)
+        pages.append(out.getvalue())
+    return pages
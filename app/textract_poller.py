@@ -0,0 +1,344 @@
+import os
+import re
+import json
+import time
+import heapq
+import asyncio
+import queue
+import logging
+import threading
+
+# Textract job states we treat as final
+TERMINAL_STATUSES = ('SUCCEEDED', 'FAILED', 'PARTIAL_SUCCESS')
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'ProvisionedThroughputExceededException',
+                          'LimitExceededException', 'TooManyRequestsException')
+
+_PAGE_OBJECT_RE = re.compile(rb'/Type\s*/Page(?!s)')
+
+
+def estimate_page_count(pdf_bytes):
+    """Cheap page count guess from the raw PDF bytes (no PDF library needed). Never returns less than 1."""
+    if not pdf_bytes:
+        return 1
+    return max(1, len(_PAGE_OBJECT_RE.findall(pdf_bytes)))
+
+
+def is_throttling_error(error):
+    # quota.QuotaExceeded (our own scheduler turning a call away) carries retry_after and counts as throttling too
+    if getattr(error, 'retry_after', None) is not None:
+        return True
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+    return code in THROTTLING_ERROR_CODES
+
+
+# --- Notification Channels ---
+class InMemoryNotificationChannel:
+    """
+    Local stand-in for the SNS -> SQS completion feed. Tests and fakes call publish().
+    A completion for a job nobody is waiting on yet (it can finish before its
+    waiter registers) is held for up to 'hold_seconds' instead of being lost,
+    as SQSNotificationChannel leaves it on the queue.
+    """
+
+    def __init__(self, hold_seconds=600.0):
+        self.hold_seconds = hold_seconds
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._held = {}  # job_id -> (status, received_at)
+
+    def publish(self, job_id, status):
+        self._queue.put((job_id, status))
+
+    def receive(self, wait_seconds=1.0, known_job_ids=None):
+        messages = self._take_held(known_job_ids)
+        try:
+            if not messages:
+                messages.append(self._queue.get(timeout=wait_seconds))
+            while True:
+                messages.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if known_job_ids is None:
+            return messages
+        ready, now = [], time.time()
+        with self._lock:
+            for job_id, status in messages:
+                if job_id in known_job_ids:
+                    ready.append((job_id, status))
+                else:
+                    self._held[job_id] = (status, now)
+        return ready
+
+    def _take_held(self, known_job_ids):
+        with self._lock:
+            expired = time.time() - self.hold_seconds
+            self._held = {job_id: held for job_id, held in self._held.items() if held[1] > expired}
+            taken = [job_id for job_id in self._held if known_job_ids is None or job_id in known_job_ids]
+            return [(job_id, self._held.pop(job_id)[0]) for job_id in taken]
+
+
+class SQSNotificationChannel:
+    """
+    Reads Textract completion notifications from an SQS queue subscribed to the
+    job's SNS topic. Messages for jobs owned by another worker are released
+    straight back to the queue instead of being deleted.
+    """
+
+    def __init__(self, sqs_client, queue_url):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+
+    def receive(self, wait_seconds=1.0, known_job_ids=None):
+        try:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=int(max(0, min(wait_seconds, 20))),
+            )
+        except Exception as e:
+            logging.error(f"Error receiving Textract notifications from SQS: {e}")
+            time.sleep(wait_seconds)
+            return []
+
+        results = []
+        for message in response.get('Messages', []):
+            try:
+                body = json.loads(message['Body'])
+                payload = json.loads(body['Message']) if 'Message' in body else body  # SNS envelope or raw
+                job_id, status = payload['JobId'], payload['Status']
+            except (KeyError, ValueError, TypeError) as e:
+                logging.warning(f"Dropping malformed Textract notification: {e}")
+                self._delete(message)
+                continue
+
+            if known_job_ids is not None and job_id not in known_job_ids:
+                self._release(message)
+                continue
+            self._delete(message)
+            results.append((job_id, status))
+        return results
+
+    def _delete(self, message):
+        try:
+            self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'])
+        except Exception as e:
+            logging.error(f"Error deleting SQS message: {e}")
+
+    def _release(self, message):
+        try:
+            self.sqs_client.change_message_visibility(
+                QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'], VisibilityTimeout=0)
+        except Exception as e:
+            logging.error(f"Error releasing SQS message: {e}")
+
+
+# --- Poller ---
+class _Waiter:
+    __slots__ = ('job_id', 'pages', 'started_at', 'last_in_progress_at', 'next_poll_at', 'delay', 'deadline',
+                 'status', 'event', 'on_done')
+
+    def __init__(self, job_id, pages, started_at, deadline):
+        self.job_id = job_id
+        self.pages = pages
+        self.started_at = started_at
+        self.last_in_progress_at = started_at
+        self.deadline = deadline
+        self.next_poll_at = started_at
+        self.delay = 0.0
+        self.status = None
+        self.event = threading.Event()
+        self.on_done = None
+
+
+class TextractPoller:
+    """
+    Tracks every outstanding Textract job for this process on one background thread.
+    Status checks must not block (on a quota, say): one slow call would hold
+    up every other job's, so give it a client that fails fast instead.
+
+    Each job's first status check is scheduled from a running estimate of
+    seconds-per-page (learned from observed completion times), then backs off
+    exponentially up to 'max_delay'. Throttling errors push back the whole
+    schedule instead of failing the job. If a notification channel is given,
+    completions arrive from it and polling only runs every 'fallback_delay'
+    seconds as a safety net.
+    """
+
+    def __init__(self, textract_client, min_delay=1.0, max_delay=10.0, backoff=1.5,
+                 initial_seconds_per_page=2.0, notification_channel=None, fallback_delay=30.0):
+        self.textract_client = textract_client
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.seconds_per_page = initial_seconds_per_page
+        self.notification_channel = notification_channel
+        self.fallback_delay = fallback_delay
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._waiters = {}
+        self._schedule = []  # heap of (next_poll_at, job_id)
+        self._thread = None
+        self._owner_pid = None
+        self.stats = {"polls": 0, "throttled": 0, "notifications": 0, "completed": 0}
+
+    def wait(self, job_id, timeout=300, pages=1):
+        """Blocks until the job reaches a terminal state. Returns True only for SUCCEEDED."""
+        waiter = self._register(job_id, timeout, pages)
+        waiter.event.wait(timeout)
+        return self._collect(waiter)
+
+    async def wait_async(self, job_id, timeout=300, pages=1):
+        """wait() for asyncio callers: the coroutine parks on a future instead of holding a thread."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def on_done():
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+        waiter = self._register(job_id, timeout, pages, on_done)
+        try:
+            await asyncio.wait_for(done, timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._collect(waiter)
+
+    def _register(self, job_id, timeout, pages, on_done=None):
+        now = time.time()
+        waiter = _Waiter(job_id, max(1, pages or 1), now, now + timeout)
+        waiter.on_done = on_done
+        with self._lock:
+            self._ensure_thread()
+            if self.notification_channel is not None:
+                waiter.delay = self.fallback_delay
+                waiter.next_poll_at = now + self.fallback_delay
+            else:
+                first_delay = 0.8 * self.seconds_per_page * waiter.pages
+                waiter.next_poll_at = now + min(self.max_delay, max(self.min_delay, first_delay))
+            self._waiters[job_id] = waiter
+            heapq.heappush(self._schedule, (waiter.next_poll_at, job_id))
+            self._wakeup.notify()
+        return waiter
+
+    def _collect(self, waiter):
+        with self._lock:
+            self._waiters.pop(waiter.job_id, None)
+        if waiter.status is None:
+            logging.error(f"Job {waiter.job_id} timed out.")
+            return False
+        logging.info(f"Job {waiter.job_id} Status: {waiter.status}")
+        return waiter.status == 'SUCCEEDED'
+
+    def outstanding(self):
+        with self._lock:
+            return len(self._waiters)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, outstanding=len(self._waiters), seconds_per_page=round(self.seconds_per_page, 2))
+
+    # --- Background thread ---
+    def _ensure_thread(self):
+        # Caller must hold self._lock. Re-spawn after fork, since threads do not survive it.
+        if self._thread is not None and self._thread.is_alive() and self._owner_pid == os.getpid():
+            return
+        self._owner_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="textract-poller", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._run_once()
+            except Exception:
+                # Every outstanding job depends on this thread, so it must outlive whatever went wrong
+                logging.exception("Textract poller iteration failed; carrying on")
+                time.sleep(self.min_delay)
+
+    def _run_once(self):
+        if self.notification_channel is not None:
+            with self._lock:
+                known = set(self._waiters)
+            if known:
+                for job_id, status in self.notification_channel.receive(wait_seconds=1.0, known_job_ids=known):
+                    with self._lock:
+                        self.stats["notifications"] += 1
+                    self._finish(job_id, status)
+        for job_id in self._due_jobs():
+            self._poll(job_id)
+
+    def _due_jobs(self):
+        with self._lock:
+            while True:
+                now = time.time()
+                # Drop schedule entries for jobs that were abandoned or already rescheduled
+                while self._schedule and (self._schedule[0][1] not in self._waiters
+                                          or self._waiters[self._schedule[0][1]].next_poll_at != self._schedule[0][0]):
+                    heapq.heappop(self._schedule)
+                if self._schedule and self._schedule[0][0] <= now:
+                    due = []
+                    while self._schedule and self._schedule[0][0] <= now:
+                        due.append(heapq.heappop(self._schedule)[1])
+                    return due
+                if self.notification_channel is not None and self._waiters:
+                    return []  # go back to listening on the channel
+                sleep_for = self._schedule[0][0] - now if self._schedule else None
+                self._wakeup.wait(sleep_for)
+
+    def _poll(self, job_id):
+        with self._lock:
+            waiter = self._waiters.get(job_id)
+        if waiter is None or waiter.event.is_set():
+            return
+        with self._lock:
+            self.stats["polls"] += 1
+        try:
+            response = self.textract_client.get_document_text_detection(JobId=job_id, MaxResults=1)
+            status = response['JobStatus']
+        except Exception as e:
+            if is_throttling_error(e):
+                with self._lock:
+                    self.stats["throttled"] += 1
+                logging.warning(f"Throttled while checking job {job_id}; backing off")
+                self._reschedule(waiter, penalty=True)
+                return
+            logging.error(f"Error checking job {job_id}: {e}")
+            status = 'FAILED'
+
+        if status in TERMINAL_STATUSES:
+            self._finish(job_id, status, polled=True)
+        else:
+            waiter.last_in_progress_at = time.time()
+            self._reschedule(waiter)
+
+    def _reschedule(self, waiter, penalty=False):
+        with self._lock:
+            if waiter.job_id not in self._waiters:
+                return
+            if self.notification_channel is not None:
+                delay = self.fallback_delay
+            else:
+                delay = min(self.max_delay, max(self.min_delay, waiter.delay * self.backoff))
+            if penalty:
+                delay = min(self.max_delay * 2, delay * 2)
+            waiter.delay = delay
+            waiter.next_poll_at = time.time() + delay
+            heapq.heappush(self._schedule, (waiter.next_poll_at, waiter.job_id))
+
+    def _finish(self, job_id, status, polled=False):
+        with self._lock:
+            waiter = self._waiters.get(job_id)
+            if waiter is None or waiter.event.is_set():
+                return
+            waiter.status = status
+            self.stats["completed"] += 1
+            if status == 'SUCCEEDED':
+                # Exponentially weighted estimate of how long Textract takes per page. A poll only
+                # tells us the job finished since the last IN_PROGRESS answer, so take the midpoint.
+                finished_at = time.time()
+                if polled:
+                    finished_at = (finished_at + waiter.last_in_progress_at) / 2
+                observed = (finished_at - waiter.started_at) / waiter.pages
+                self.seconds_per_page = 0.8 * self.seconds_per_page + 0.2 * observed
+        waiter.event.set()
+        if waiter.on_done is not None:
+            waiter.on_done()
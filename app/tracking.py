@@ -0,0 +1,203 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+# What to do when the queue is full: drop the run record, or block the request
+# (up to block_timeout seconds) until the flusher catches up.
+POLICY_DROP = "drop"
+POLICY_BLOCK = "block"
+
+
+class RunRecord:
+    """Everything one pipeline run wants logged, collected in memory on the request path."""
+
+    def __init__(self, run_name, experiment_name):
+        self.run_name = run_name
+        self.experiment_name = experiment_name
+        self.params = {}
+        self.metrics = {}
+        self.artifacts = {}  # artifact path -> str content
+        self.status = "FINISHED"
+        self.created_at = time.time()
+
+    def log_param(self, key, value):
+        self.params[key] = value
+
+    def log_metric(self, key, value):
+        self.metrics[key] = value
+
+    def log_text(self, text, artifact_file):
+        self.artifacts[artifact_file] = text
+
+
+class BackgroundTracker:
+    """
+    Moves MLflow logging off the request path. Requests build a RunRecord and
+    submit() it to a bounded queue; flusher threads turn each record into a
+    create_run, one log_batch (all params + metrics), one upload per artifact
+    and set_terminated, instead of a dozen separate tracking calls.
+
+    Artifacts go straight from memory: put_object for s3:// artifact roots,
+    MlflowClient.log_text otherwise.
+    """
+
+    def __init__(self, tracking_uri=None, max_queue=1000, policy=POLICY_DROP, block_timeout=1.0,
+                 num_threads=2, s3_client=None, instrument=None):
+        self.tracking_uri = tracking_uri
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.num_threads = num_threads
+        self.s3_client = s3_client
+        # Optional stage timer (a context manager factory), e.g. metrics.stage
+        self.instrument = instrument
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._owner_pid = None
+        # Held while the client and experiment ids are set up, which can take network round trips
+        self._setup_lock = threading.Lock()
+        self._client = None
+        self._experiment_ids = {}
+        self._closed = False
+        self.stats = {"submitted": 0, "dropped": 0, "flushed": 0, "failed": 0}
+
+    def start_run(self, run_name, experiment_name):
+        return RunRecord(run_name, experiment_name)
+
+    def submit(self, record):
+        """Queues a finished RunRecord. Never raises; returns False if the record was dropped."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        self._ensure_threads()
+        try:
+            if self.policy == POLICY_BLOCK:
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+            logging.warning(f"MLflow queue full ({self._queue.maxsize}); dropped run {record.run_name}")
+            return False
+        self._count("submitted")
+        return True
+
+    def close(self, timeout=10.0):
+        """Stops accepting runs and waits up to 'timeout' seconds for queued ones to be written."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._threads or self._owner_pid != os.getpid():
+            return
+        deadline = time.time() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.time()))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        remaining = self._queue.qsize()
+        if remaining:
+            logging.warning(f"MLflow tracker shut down with {remaining} run(s) still queued")
+        logging.info(f"MLflow tracker closed: {self.stats}")
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "queued": self._queue.qsize(), "max_queue": self._queue.maxsize,
+                    "policy": self.policy}
+
+    # --- Flusher ---
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _ensure_threads(self):
+        # Threads are started lazily (and again after a fork) so a preloading master never owns them
+        if self._owner_pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._owner_pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._owner_pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f"mlflow-flusher-{i}", daemon=True)
+                             for i in range(self.num_threads)]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            try:
+                if self.instrument is not None:
+                    with self.instrument("mlflow_flush"):
+                        self._flush(record)
+                else:
+                    self._flush(record)
+                self._count("flushed")
+            except Exception as e:
+                self._count("failed")
+                logging.error(f"Failed to log MLflow run {record.run_name}: {e}")
+
+    def _get_client(self):
+        with self._setup_lock:
+            if self._client is None:
+                from mlflow.tracking import MlflowClient
+                self._client = MlflowClient(tracking_uri=self.tracking_uri)
+            return self._client
+
+    def _experiment_id(self, name):
+        experiment_id = self._experiment_ids.get(name)
+        if experiment_id is not None:
+            return experiment_id
+        client = self._get_client()
+        with self._setup_lock:
+            if name not in self._experiment_ids:
+                self._experiment_ids[name] = self._get_or_create_experiment(client, name)
+            return self._experiment_ids[name]
+
+    @staticmethod
+    def _get_or_create_experiment(client, name):
+        from mlflow.exceptions import MlflowException
+
+        experiment = client.get_experiment_by_name(name)
+        if experiment is not None:
+            return experiment.experiment_id
+        try:
+            return client.create_experiment(name)
+        except MlflowException as e:
+            # Another worker process created it first
+            if e.error_code != "RESOURCE_ALREADY_EXISTS":
+                raise
+            return client.get_experiment_by_name(name).experiment_id
+
+    def _flush(self, record):
+        from mlflow.entities import Metric, Param
+
+        client = self._get_client()
+        run = client.create_run(self._experiment_id(record.experiment_name), run_name=record.run_name,
+                                start_time=int(record.created_at * 1000))
+        run_id = run.info.run_id
+        timestamp = int(time.time() * 1000)
+        client.log_batch(
+            run_id,
+            metrics=[Metric(k, float(v), timestamp, 0) for k, v in record.metrics.items()],
+            params=[Param(k, str(v)) for k, v in record.params.items()],
+        )
+        for artifact_file, text in record.artifacts.items():
+            self._upload_artifact(client, run, artifact_file, text)
+        client.set_terminated(run_id, status=record.status)
+        logging.info(f"Logged MLflow run {run_id} ({record.run_name})")
+
+    def _upload_artifact(self, client, run, artifact_file, text):
+        artifact_uri = run.info.artifact_uri
+        if self.s3_client is not None and artifact_uri.startswith("s3://"):
+            bucket, _, prefix = artifact_uri[len("s3://"):].partition('/')
+            key = f"{prefix.rstrip('/')}/{artifact_file}" if prefix else artifact_file
+            self.s3_client.put_object(Bucket=bucket, Key=key, Body=text.encode('utf-8'))
+        else:
+            client.log_text(run.info.run_id, text, artifact_file)
@@ -1,7 +1,7 @@
 import gradio as gr
-import requests
 import os
-import json
+
+from resume_client import ResumeParserClient
 
 # --- Configuration ---
 # Replace this with your actual App Runner URL from Section 10.6
@@ -10,74 +10,90 @@ APP_RUNNER_API_URL_LOCAL_TEST = "https://vspfqqvejz.ap-southeast-1.awsapprunner.
 
 # For Hugging Face deployment, the URL will be read from a secret
 APP_RUNNER_API_URL = os.environ.get("APP_RUNNER_API_URL", APP_RUNNER_API_URL_LOCAL_TEST)
+# Resumes sent to the API at once, per UI session
+UI_MAX_CONCURRENCY = int(os.environ.get("UI_MAX_CONCURRENCY", "4"))
+
+# One pooled keep-alive client for every session; uploads go in as async jobs, so no request sits open for minutes
+# Only what format_result shows is sent back (no entity list, offsets or snippet)
+client = ResumeParserClient(APP_RUNNER_API_URL, max_concurrency=UI_MAX_CONCURRENCY,
+                            fields=["s3_path", "textract_job_id", "near_duplicate", "combined_keywords"])
+
+TABLE_HEADERS = ["File", "Status", "Time", "Keywords"]
 
-def process_resume_via_api(pdf_file_object):
-    """
-    Sends the uploaded PDF to the App Runner API and returns the extracted keywords.
-    'pdf_file_object' is a TemporaryFile object from Gradio.
-    """
-    if pdf_file_object is None:
-        return "Error: No PDF file provided."
 
-    files = {'resume': (pdf_file_object.name, open(pdf_file_object.name, 'rb'), 'application/pdf')}
+def format_result(filename, api_response):
+    """Readable summary of one API response."""
+    output_text = f"--- {filename} ---\n"
+    output_text += f"S3 Path: {api_response.get('s3_path', 'N/A')}\n"
+    output_text += f"Textract Job ID: {api_response.get('textract_job_id', 'N/A')}\n"
+    if api_response.get("near_duplicate"):
+        output_text += f"Near-duplicate of: {api_response['near_duplicate']['content_sha256'][:12]} " \
+                       f"(similarity {api_response['near_duplicate']['similarity']})\n"
 
-    try:
-        print(f"Sending request to: {APP_RUNNER_API_URL}")
-        response = requests.post(APP_RUNNER_API_URL, files=files, timeout=300) # Increased timeout
-        response.raise_for_status()  # Raises an exception for HTTP errors (4xx or 5xx)
+    output_text += "\nCombined Keywords/Entities:\n"
+    if api_response.get("combined_keywords"):
+        output_text += "\n".join([f"- {kw}" for kw in api_response["combined_keywords"]])
+    else:
+        output_text += "No keywords extracted."
+    return output_text
 
-        api_response = response.json()
 
-        # Format the output for better readability
-        output_text = "--- Extracted Details ---\n"
-        if "mlflow_run_id" in api_response: # Check if this key exists
-            output_text += f"MLflow Run ID: {api_response['mlflow_run_id']}\n"
-        output_text += f"S3 Path: {api_response.get('s3_path', 'N/A')}\n"
-        output_text += f"Textract Job ID: {api_response.get('textract_job_id', 'N/A')}\n\n"
+def process_resumes_via_api(pdf_files, progress=gr.Progress()):
+    """
+    Sends the uploaded PDFs to the API, UI_MAX_CONCURRENCY at a time, and
+    updates the table and the details as each one finishes.
+    'pdf_files' is the list of uploaded file paths (or tempfile objects) from Gradio.
+    """
+    if not pdf_files:
+        yield [], "Error: No PDF file provided."
+        return
+
+    paths = [f if isinstance(f, str) else f.name for f in pdf_files]
+    names = [os.path.basename(p) for p in paths]
+    rows = [[name, "queued", "", ""] for name in names]
+    details = [None] * len(paths)
 
-        output_text += "Combined Keywords/Entities:\n"
-        if api_response.get("combined_keywords"):
-            output_text += "\n".join([f"- {kw}" for kw in api_response["combined_keywords"]])
+    def mark_in_flight():
+        # parse_many keeps UI_MAX_CONCURRENCY uploads going, taking the next queued file as one finishes
+        in_flight = 0
+        for row in rows:
+            if row[1] in ("queued", "processing") and in_flight < UI_MAX_CONCURRENCY:
+                row[1] = "processing"
+                in_flight += 1
+
+    print(f"Sending {len(paths)} file(s) to: {client.base_url}")
+    mark_in_flight()
+    yield rows, ""
+    for done, item in enumerate(client.parse_many(paths), start=1):
+        index, name = item["index"], names[item["index"]]
+        if "error" in item:
+            print(f"{name}: {item['error']}")
+            rows[index] = [name, f"error ({item['status']})", f"{item['elapsed_seconds']:.1f}s", item["error"]]
+            details[index] = f"--- {name} ---\nError: {item['error']}"
         else:
-            output_text += "No keywords extracted."
-
-        # Optionally, add more details
-        # output_text += "\n\nRule-Based Skills:\n"
-        # output_text += "\n".join([f"- {kw}" for kw in api_response.get("rule_based_skills", [])])
-        # output_text += "\n\nText Snippet:\n"
-        # output_text += api_response.get("text_snippet", "")
-
-        return output_text
-
-    except requests.exceptions.HTTPError as http_err:
-        error_message = f"HTTP error occurred: {http_err}\n"
-        try: # Try to get more details from the API's JSON error response
-            error_details = response.json()
-            error_message += f"API Error: {error_details.get('error', 'Unknown API error')}"
-        except ValueError: # If response is not JSON
-            error_message += f"Response Content: {response.text}"
-        print(error_message)
-        return error_message
-    except requests.exceptions.RequestException as req_err:
-        print(f"Request exception: {req_err}")
-        return f"Error connecting to API: {req_err}"
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return f"An unexpected error occurred: {e}"
+            keywords = item["result"].get("combined_keywords") or []
+            rows[index] = [name, "done", f"{item['elapsed_seconds']:.1f}s",
+                           ", ".join(keywords[:8]) + (" ..." if len(keywords) > 8 else "")]
+            details[index] = format_result(name, item["result"])
+        mark_in_flight()
+        progress(done / len(paths), desc=f"{done}/{len(paths)} parsed")
+        yield rows, "\n\n".join(d for d in details if d)
+
 
 # Define Gradio Interface
-iface = gr.Interface(
-    fn=process_resume_via_api,
-    inputs=gr.File(label="Upload Resume PDF", file_types=['.pdf']),
-    outputs=gr.Textbox(label="Extraction Results", lines=15, placeholder="Results will appear here..."),
-    title="📄 Resume Parser",
-    description="Upload a PDF resume to extract keywords and entities using AWS Textract, Comprehend, and custom rules via our deployed API.",
-    allow_flagging="never"
-)
+with gr.Blocks(title="Resume Parser") as iface:
+    gr.Markdown("# 📄 Resume Parser\nUpload one or more PDF resumes to extract keywords and entities using AWS "
+                "Textract, Comprehend, and custom rules via our deployed API. Results appear as each file finishes.")
+    files_input = gr.File(label="Upload Resume PDFs", file_types=['.pdf'], file_count="multiple")
+    parse_button = gr.Button("Parse", variant="primary")
+    progress_table = gr.Dataframe(headers=TABLE_HEADERS, label="Progress", interactive=False, wrap=True)
+    details_output = gr.Textbox(label="Extraction Results", lines=15, placeholder="Results will appear here...")
+    parse_button.click(process_resumes_via_api, inputs=files_input, outputs=[progress_table, details_output])
 
 if __name__ == "__main__":
     print(f"Using API URL: {APP_RUNNER_API_URL}")
     if "YOUR_APP_RUNNER_URL_HERE" in APP_RUNNER_API_URL and not os.environ.get("APP_RUNNER_API_URL"):
         print("\nWARNING: You are using the placeholder APP_RUNNER_API_URL_LOCAL_TEST.")
         print("Please replace 'YOUR_APP_RUNNER_URL_HERE/parse_resume' in app/ui_app.py with your actual App Runner URL for local testing.\n")
-    iface.launch()
\ No newline at end of file
+    # The queue lets several sessions stream progress at once
+    iface.queue(default_concurrency_limit=8).launch()
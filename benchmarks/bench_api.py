@@ -0,0 +1,315 @@
+"""
+Replays the resume corpus through POST /parse_resume fully offline: the Flask
+app runs in-process with S3, Textract, Comprehend and the MLflow client swapped
+for the latency/throttling stand-ins in fake_aws.py.
+
+For each concurrency level it reports per-stage latency percentiles
+(p50/p95/p99), throughput, errors, throttles and peak RSS, and writes all of it
+as JSON so runs from different commits can be compared.
+
+    python benchmarks/bench_api.py --concurrency 1 4 16 --profile realistic
+    python benchmarks/bench_api.py --limit 200 --profile throttled --force-ocr
+    python benchmarks/bench_api.py --compare benchmarks/results/api-<old>-realistic.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import glob
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "app"))
+sys.path.insert(0, BENCH_DIR)
+from fake_aws import PROFILES, LatencyModel, FakeS3, FakeTextract, FakeComprehend, FakeMlflowClient  # noqa: E402
+
+STAGES = ["total", "hash", "text_layer", "textract", "skills", "comprehend", "tracking_submit"]
+
+
+# --- Measurement helpers ---
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Tracks peak RSS over a block of work by sampling in a background thread."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- App setup ---
+def load_app(args, latency):
+    """Imports the API with offline-friendly settings and swaps every remote client for a fake."""
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "offline")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "offline")
+    os.environ["RESULT_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["RESULT_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_cache_")
+    os.environ["ASYNC_STATE_DIR"] = tempfile.mkdtemp(prefix="bench_jobs_")
+    os.environ["QUOTA_STATE_DIR"] = tempfile.mkdtemp(prefix="bench_quota_")
+    # Fresh, or uploads from an earlier run would skip OCR
+    os.environ["OCR_STORE_DIR"] = tempfile.mkdtemp(prefix="bench_ocr_")
+    os.environ["TEXTRACT_NOTIFICATION_MODE"] = "none"
+    os.environ["TEXTRACT_POLL_MIN_DELAY"] = str(max(0.01, 1.0 * args.latency_scale))
+    os.environ["TEXTRACT_POLL_MAX_DELAY"] = str(max(0.05, 10.0 * args.latency_scale))
+    if args.force_ocr:
+        os.environ["TEXT_LAYER_ENABLED"] = "false"
+
+    import api
+    logging.getLogger().setLevel(logging.WARNING)
+
+    s3 = FakeS3(latency)
+    textract = FakeTextract(latency, s3)
+    comprehend = FakeComprehend(latency)
+    # Behind the same quota scheduler the real clients go through
+    textract = api.quota_scheduler.wrap(textract, api.TEXTRACT_OPERATIONS)
+    comprehend = api.quota_scheduler.wrap(comprehend, api.COMPREHEND_OPERATIONS)
+    api.s3_client = s3
+    api.textract_client = textract
+    api.comprehend_client = comprehend
+    api.comprehend_chunker.comprehend_client = comprehend
+    api.textract_poller.textract_client = textract.without_waiting()
+    api.tracker.s3_client = s3
+    api.tracker._client = FakeMlflowClient(latency)
+    return api
+
+
+_stage_times = threading.local()
+
+
+def timed(name, fn):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _stage_times.values[name] = (time.perf_counter() - start) * 1000
+    return wrapper
+
+
+def instrument(api):
+    """Wraps the pipeline stages the API looks up as module globals, recording their wall time per request."""
+    api.read_and_hash = timed("hash", api.read_and_hash)
+    api.find_skills_keyword_based = timed("skills", api.find_skills_keyword_based)
+    api.find_entities_comprehend = timed("comprehend", api.find_entities_comprehend)
+    api.tracker.submit = timed("tracking_submit", api.tracker.submit)
+
+
+# --- Replay ---
+def run_level(api, documents, concurrency):
+    clients = threading.local()
+
+    def send(document):
+        if not hasattr(clients, "client"):
+            clients.client = api.app.test_client()
+        _stage_times.values = {}
+        path, pdf_bytes = document
+        start = time.perf_counter()
+        response = clients.client.post("/parse_resume", data={"resume": (io.BytesIO(pdf_bytes), os.path.basename(path))},
+                                       content_type="multipart/form-data")
+        stages = dict(_stage_times.values, total=(time.perf_counter() - start) * 1000)
+        body = response.get_json(silent=True) or {}
+        routing = body.get("extraction") or {}
+        if "text_layer_ms" in routing:
+            stages["text_layer"] = routing["text_layer_ms"]
+        if routing.get("textract_mode"):
+            stages["textract"] = routing["textract_ms"]
+        return response.status_code, routing.get("textract_mode"), stages
+
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(send, documents))
+        wall = time.perf_counter() - start
+
+    drain_start = time.perf_counter()
+    while True:
+        snap = api.tracker.snapshot()
+        if snap["queued"] == 0 and snap["flushed"] + snap["failed"] >= snap["submitted"]:
+            break
+        time.sleep(0.01)
+    drain = time.perf_counter() - drain_start
+
+    statuses, modes = {}, {}
+    stage_values = {stage: [] for stage in STAGES}
+    for status, mode, stages in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        modes[mode or "none"] = modes.get(mode or "none", 0) + 1
+        for stage, value in stages.items():
+            stage_values[stage].append(value)
+    ok = statuses.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "status_codes": statuses,
+        "textract_modes": modes,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 3) if wall else None,
+        "peak_rss_mb": round(rss.peak / 1024 / 1024, 1),
+        "mlflow_drain_s": round(drain, 3),
+        "latency_ms": {stage: summarize(values) for stage, values in stage_values.items()},
+    }
+
+
+def load_documents(corpus, limit, seed):
+    paths = sorted(glob.glob(os.path.join(corpus, "*", "*.pdf")))
+    random.Random(seed).shuffle(paths)
+    if limit:
+        paths = paths[:limit]
+    documents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            documents.append((path, f.read()))
+    return documents
+
+
+def print_level(level):
+    print(f"\nconcurrency {level['concurrency']}: {level['requests']} requests, {level['errors']} errors, "
+          f"{level['throughput_rps']} req/s, peak RSS {level['peak_rss_mb']} MB, "
+          f"MLflow drained in {level['mlflow_drain_s']} s, textract modes {level['textract_modes']}")
+    print(f"  {'stage':<16} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, stats in level["latency_ms"].items():
+        if stats["count"]:
+            print(f"  {stage:<16} {stats['count']:>6} {stats['p50']:>10.2f} {stats['p95']:>10.2f} {stats['p99']:>10.2f}")
+
+
+def compare(current, baseline_path):
+    """Prints throughput and p95 changes against an earlier results file, level by level."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nvs {baseline['commit']} ({baseline_path}):")
+    for level in current["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+
+        def change(new_value, old_value):
+            return f"{(new_value - old_value) / old_value * 100:+.1f}%" if old_value else "n/a"
+        print(f"  c={level['concurrency']:<3} throughput {old['throughput_rps']} -> {level['throughput_rps']} req/s "
+              f"({change(level['throughput_rps'], old['throughput_rps'])}), "
+              f"total p95 {old['latency_ms']['total']['p95']} -> {level['latency_ms']['total']['p95']} ms "
+              f"({change(level['latency_ms']['total']['p95'], old['latency_ms']['total']['p95'])}), "
+              f"peak RSS {old['peak_rss_mb']} -> {level['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplies every fake latency (e.g. 0.1 for a quick run)")
+    parser.add_argument("--limit", type=int, help="Replay only this many PDFs (default: the whole corpus)")
+    parser.add_argument("--force-ocr", action="store_true", help="Disable the text layer so every page goes to Textract")
+    parser.add_argument("--cache", action="store_true", help="Leave the result cache on (later levels then hit it)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Results JSON (default: benchmarks/results/api-<commit>-<profile>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    latency = LatencyModel(args.profile, scale=args.latency_scale, seed=args.seed)
+    api = load_app(args, latency)
+    instrument(api)
+    documents = load_documents(args.corpus, args.limit, args.seed)
+    print(f"Replaying {len(documents)} PDFs, profile '{args.profile}' x{args.latency_scale}, "
+          f"concurrency levels {args.concurrency}")
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "profile": args.profile,
+        "latency_scale": args.latency_scale,
+        "force_ocr": args.force_ocr,
+        "cache": args.cache,
+        "documents": len(documents),
+        "levels": [],
+    }
+    for concurrency in args.concurrency:
+        calls_before = latency.snapshot()
+        level = run_level(api, documents, concurrency)
+        calls_after = latency.snapshot()
+        level["aws_calls"] = {k: v - calls_before["calls"].get(k, 0) for k, v in calls_after["calls"].items()}
+        level["throttled"] = {k: v - calls_before["throttled"].get(k, 0) for k, v in calls_after["throttled"].items()}
+        results["levels"].append(level)
+        print_level(level)
+    api.tracker.close(30)
+    results["tracking"] = api.tracker.snapshot()
+
+    out = args.out or os.path.join(BENCH_DIR, "results", f"api-{commit}-{args.profile}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
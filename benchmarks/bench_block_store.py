@@ -0,0 +1,136 @@
+"""
+Peak memory per document for Textract results: the old accumulate-every-block
+list of dicts vs streaming result pages into the columnar BlockStore.
+
+Textract responses are synthesised from real resume text (one LINE block plus
+its WORD blocks per line, with the geometry, ids and relationships Textract
+sends), paginated 1000 blocks at a time like GetDocumentTextDetection.
+
+    python benchmarks/bench_block_store.py --pages 2 10 50
+"""
+import os
+import sys
+import glob
+import uuid
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from block_store import BlockStore, iter_textract_blocks  # noqa: E402
+from text_layer import extract_page_texts  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BLOCKS_PER_RESPONSE = 1000
+
+
+def geometry(rng):
+    left, top, width, height = rng.random() * 0.5, rng.random(), rng.random() * 0.5, 0.012
+    return {
+        "BoundingBox": {"Width": width, "Height": height, "Left": left, "Top": top},
+        "Polygon": [{"X": left, "Y": top}, {"X": left + width, "Y": top},
+                    {"X": left + width, "Y": top + height}, {"X": left, "Y": top + height}],
+    }
+
+
+def synth_page_blocks(lines, page, rng):
+    """The blocks Textract returns for one page of 'lines'."""
+    page_block = {"BlockType": "PAGE", "Geometry": geometry(rng), "Id": str(uuid.uuid4()), "Page": page,
+                  "Relationships": [{"Type": "CHILD", "Ids": []}]}
+    blocks = [page_block]
+    for line in lines:
+        words = [{"BlockType": "WORD", "Confidence": 90 + rng.random() * 10, "Text": word, "TextType": "PRINTED",
+                  "Geometry": geometry(rng), "Id": str(uuid.uuid4()), "Page": page} for word in line.split()]
+        line_block = {"BlockType": "LINE", "Confidence": 90 + rng.random() * 10, "Text": line, "Geometry": geometry(rng),
+                      "Id": str(uuid.uuid4()), "Page": page,
+                      "Relationships": [{"Type": "CHILD", "Ids": [w["Id"] for w in words]}]}
+        page_block["Relationships"][0]["Ids"].append(line_block["Id"])
+        blocks.append(line_block)
+        blocks.extend(words)
+    return blocks
+
+
+class FakeTextract:
+    """Serves a document's blocks page by page, building each response only when it is requested."""
+
+    def __init__(self, page_lines, seed):
+        self.page_lines = page_lines
+        self.seed = seed
+
+    def _blocks(self):
+        rng = random.Random(self.seed)
+        for page, lines in enumerate(self.page_lines, start=1):
+            yield from synth_page_blocks(lines, page, rng)
+
+    def get_document_text_detection(self, JobId, NextToken=None):
+        start = int(NextToken or 0)
+        blocks = []
+        for i, block in enumerate(self._blocks()):
+            if i >= start + BLOCKS_PER_RESPONSE:
+                return {"JobStatus": "SUCCEEDED", "Blocks": blocks, "NextToken": str(i)}
+            if i >= start:
+                blocks.append(block)
+        return {"JobStatus": "SUCCEEDED", "Blocks": blocks}
+
+
+def accumulate_then_filter(client):
+    """The previous api.get_textract_results + extract_text_from_blocks."""
+    all_blocks, next_token = [], None
+    while True:
+        params = {'JobId': "job"}
+        if next_token:
+            params['NextToken'] = next_token
+        response = client.get_document_text_detection(**params)
+        all_blocks.extend(response.get('Blocks', []))
+        next_token = response.get('NextToken')
+        if not next_token:
+            break
+    return all_blocks, "\n".join([b['Text'] for b in all_blocks if b['BlockType'] == 'LINE'])
+
+
+def streamed_store(client):
+    store = BlockStore().add_textract_blocks(iter_textract_blocks(client, "job"))
+    return store, store.text()
+
+
+def measure(fn, client):
+    tracemalloc.start()
+    kept, text = fn(client)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume"))
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*", "*.pdf")))
+    random.Random(args.seed).shuffle(paths)
+    source_pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            texts = extract_page_texts(f.read()) or []
+        source_pages.extend([line.strip() for line in t.splitlines() if line.strip()] for t in texts)
+        if len(source_pages) >= max(args.pages):
+            break
+
+    # 'kept' is what is still referenced once the text is built (what lives on through the request)
+    print(f"{'pages':>5} {'lines':>6} {'words':>7} | {'old peak':>10} {'old kept':>10} | "
+          f"{'new peak':>10} {'new kept':>10} | peak ratio")
+    for num_pages in args.pages:
+        client = FakeTextract(source_pages[:num_pages], args.seed)
+        old_peak, old_kept, old_text = measure(accumulate_then_filter, client)
+        new_peak, new_kept, new_text = measure(streamed_store, client)
+        assert old_text == new_text, "store text differs from the list-of-dicts text"
+        lines = sum(len(p) for p in client.page_lines)
+        words = sum(len(line.split()) for p in client.page_lines for line in p)
+        print(f"{num_pages:>5} {lines:>6} {words:>7} | {old_peak / 1e6:>8.2f}MB {old_kept / 1e6:>8.2f}MB | "
+              f"{new_peak / 1e6:>8.2f}MB {new_kept / 1e6:>8.2f}MB | {old_peak / new_peak:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
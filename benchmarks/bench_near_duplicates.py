@@ -0,0 +1,63 @@
+"""
+Near-duplicate lookup cost as the index grows: LSH query time against a
+brute-force comparison with every stored signature, for a resubmitted resume
+(edited copy of a stored one) and for a new one. Stored signatures are
+synthetic; the edited copies share ~90% of the signature like a resume with a
+changed date, phone number and a reworded line.
+
+    python benchmarks/bench_near_duplicates.py --sizes 10000 50000 200000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from near_duplicates import DEFAULT_THRESHOLD, NUM_PERM, NearDuplicateIndex  # noqa: E402
+
+
+def timed_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"  {'stored':>8}{'add/doc us':>12}{'dup ms':>9}{'new ms':>9}{'scan ms':>9}{'recall':>8}")
+    for size in args.sizes:
+        signatures = rng.integers(0, 2 ** 32, size=(size, NUM_PERM), dtype=np.uint32)
+        keys = [f"{i:064x}" for i in range(size)]
+        index = NearDuplicateIndex(threshold=DEFAULT_THRESHOLD)
+        start = time.perf_counter()
+        for key, signature in zip(keys, signatures):
+            index.add(key, signature)
+        add_us = (time.perf_counter() - start) / size * 1e6
+
+        picks = rng.integers(0, size, size=args.queries)
+        edited = signatures[picks].copy()
+        changed = rng.random(edited.shape) < 0.1
+        edited[changed] = rng.integers(0, 2 ** 32, size=int(changed.sum()), dtype=np.uint32)
+        fresh = rng.integers(0, 2 ** 32, size=(args.queries, NUM_PERM), dtype=np.uint32)
+
+        dup_ms, _ = timed_ms(lambda: [index.query(s) for s in edited], 3)
+        new_ms, _ = timed_ms(lambda: [index.query(s) for s in fresh], 3)
+        scan_ms, _ = timed_ms(lambda: [np.count_nonzero(signatures == s, axis=1).argmax() for s in edited[:20]], 1)
+        found = sum(1 for pick, s in zip(picks, edited) if (index.query(s) or ("",))[0] == keys[pick])
+        print(f"  {size:>8}{add_us:>12.1f}{dup_ms / args.queries:>9.3f}{new_ms / args.queries:>9.3f}"
+              f"{scan_ms / 20:>9.2f}{found / args.queries:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
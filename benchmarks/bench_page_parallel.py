@@ -0,0 +1,92 @@
+"""
+Latency of multi-page resumes by page count, with every page sent to OCR:
+one async Textract job per document (PAGE_PARALLEL_ENABLED=false) against
+one DetectDocumentText call per page, all at once. For the streaming mode it
+also reports when the first page's keywords arrive. Runs offline against the
+fakes in fake_aws.py, like bench_api.py.
+
+    python benchmarks/bench_page_parallel.py --per-bucket 5 --latency-scale 0.5
+"""
+import io
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "app"))
+sys.path.insert(0, BENCH_DIR)
+from fake_aws import PROFILES, LatencyModel  # noqa: E402
+from bench_api import load_app, percentile  # noqa: E402
+from textract_poller import estimate_page_count  # noqa: E402
+
+
+def documents_by_pages(corpus, per_bucket):
+    """Up to 'per_bucket' PDFs for each page count, 1 to 5+."""
+    buckets = {}
+    for path in sorted(glob.glob(os.path.join(corpus, "*", "*.pdf"))):
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        bucket = buckets.setdefault(min(estimate_page_count(pdf_bytes), 5), [])
+        if len(bucket) < per_bucket:
+            bucket.append(pdf_bytes)
+    return dict(sorted(buckets.items()))
+
+
+def parse(client, pdf_bytes):
+    start = time.perf_counter()
+    response = client.post("/parse_resume", data={"resume": (io.BytesIO(pdf_bytes), "resume.pdf")},
+                           content_type="multipart/form-data")
+    return (time.perf_counter() - start) * 1000, response.status_code
+
+
+def parse_streaming(client, pdf_bytes):
+    """Returns (ms to the first_page event, ms to the result, status)."""
+    start = time.perf_counter()
+    response = client.post("/parse_resume?stream=true", data={"resume": (io.BytesIO(pdf_bytes), "resume.pdf")},
+                           content_type="multipart/form-data", buffered=False)
+    first_page_ms = status = None
+    for line in response.response:
+        event = json.loads(line)
+        if event["event"] == "first_page":
+            first_page_ms = (time.perf_counter() - start) * 1000
+        elif event["event"] == "result":
+            status = event["status"]
+    return first_page_ms, (time.perf_counter() - start) * 1000, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume"))
+    parser.add_argument("--per-bucket", type=int, default=5, help="Documents per page count")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    latency = LatencyModel(args.profile, scale=args.latency_scale, seed=args.seed)
+    api = load_app(SimpleNamespace(cache=False, force_ocr=True, latency_scale=args.latency_scale), latency)
+    api.near_duplicate_index = None
+    client = api.app.test_client()
+    buckets = documents_by_pages(args.corpus, args.per_bucket)
+
+    print(f"  {'pages':>6}{'docs':>6}{'one job p50':>13}{'per page p50':>14}{'stream 1st p50':>16}{'stream all p50':>16}")
+    for pages, documents in buckets.items():
+        api.PAGE_PARALLEL_ENABLED = False
+        job_ms = sorted(parse(client, pdf_bytes)[0] for pdf_bytes in documents)
+        api.PAGE_PARALLEL_ENABLED = True
+        page_ms = sorted(parse(client, pdf_bytes)[0] for pdf_bytes in documents)
+        streamed = [parse_streaming(client, pdf_bytes) for pdf_bytes in documents]
+        first_ms = sorted(first for first, _, _ in streamed)
+        all_ms = sorted(total for _, total, _ in streamed)
+        print(f"  {str(pages) + ('+' if pages == 5 else ''):>6}{len(documents):>6}{percentile(job_ms, 50):>13.0f}"
+              f"{percentile(page_ms, 50):>14.0f}{percentile(first_ms, 50):>16.0f}{percentile(all_ms, 50):>16.0f}")
+    api.tracker.close(30)
+
+
+if __name__ == "__main__":
+    main()
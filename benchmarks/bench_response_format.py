@@ -0,0 +1,124 @@
+"""
+Size and serialization cost of /parse_resume responses per response format:
+the old jsonify output against fast JSON, ?compact=true, ?fields=, gzip /
+zstd and MessagePack (the last two only when zstandard / msgpack are
+installed). Responses come from running the corpus through the API offline
+(fake_aws.py, like bench_api.py); then every format is timed over all of
+them, as for one large batch, and once more end to end on cache hits.
+
+    python benchmarks/bench_response_format.py --docs 200
+"""
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "app"))
+sys.path.insert(0, BENCH_DIR)
+from fake_aws import LatencyModel  # noqa: E402
+from bench_api import load_app, percentile  # noqa: E402
+import response_format  # noqa: E402
+from response_format import ResponseFormat, DEFAULT_FIELDS, COMPACT_FIELDS, MSGPACK  # noqa: E402
+
+
+def formats():
+    """(name, query string, ResponseFormat) for every variant available here."""
+    variants = [
+        ("json", "", ResponseFormat(DEFAULT_FIELDS)),
+        ("json gzip", "", ResponseFormat(DEFAULT_FIELDS, content_encoding="gzip")),
+        ("compact", "compact=true", ResponseFormat(COMPACT_FIELDS)),
+        ("compact gzip", "compact=true", ResponseFormat(COMPACT_FIELDS, content_encoding="gzip")),
+        ("keywords only", "fields=combined_keywords", ResponseFormat(["combined_keywords"])),
+        ("full text gzip", "fields=combined_keywords,extracted_text",
+         ResponseFormat(["combined_keywords", "extracted_text"], content_encoding="gzip")),
+    ]
+    if response_format.zstandard is not None:
+        variants += [("json zstd", "", ResponseFormat(DEFAULT_FIELDS, content_encoding="zstd")),
+                     ("compact zstd", "compact=true", ResponseFormat(COMPACT_FIELDS, content_encoding="zstd"))]
+    if response_format.msgpack is not None:
+        variants += [("msgpack", "", ResponseFormat(DEFAULT_FIELDS, media_type=MSGPACK)),
+                     ("compact msgpack", "compact=true", ResponseFormat(COMPACT_FIELDS, media_type=MSGPACK))]
+    return variants
+
+
+def headers_for(fmt):
+    headers = {"Accept": fmt.media_type}
+    if fmt.content_encoding:
+        headers["Accept-Encoding"] = fmt.content_encoding
+    return headers
+
+
+def collect_responses(client, paths):
+    """Full response dicts (every field, extracted_text included) for the documents, with their PDF bytes."""
+    responses = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        response = client.post("/parse_resume?fields=" + ",".join(response_format.FIELDS),
+                               data={"resume": (io.BytesIO(pdf_bytes), "resume.pdf")},
+                               content_type="multipart/form-data")
+        if response.status_code == 200:
+            responses.append((pdf_bytes, response.get_json()))
+    return responses
+
+
+def time_encoding(encode, items, repeat):
+    """Best-of-'repeat' wall time to encode every item, and the total bytes."""
+    best, total = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total = sum(len(encode(item)) for item in items)
+        best = min(best, time.perf_counter() - start)
+    return best, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume"))
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=3, help="End-to-end cache-hit requests per document")
+    args = parser.parse_args()
+
+    latency = LatencyModel("instant", seed=42)
+    api = load_app(SimpleNamespace(cache=True, force_ocr=False, latency_scale=0.0), latency)
+    api.near_duplicate_index = None
+    client = api.app.test_client()
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*", "*.pdf")))[:args.docs]
+    responses = collect_responses(client, paths)
+    items = [data for _, data in responses]
+    installed = {name: "on" if getattr(response_format, name) else "off" for name in ("orjson", "zstandard", "msgpack")}
+    print(f"{len(items)} responses; " + ", ".join(f"{name} {state}" for name, state in installed.items()) + "\n")
+
+    # What /parse_resume sent before: jsonify of the default fields
+    with api.app.app_context():
+        old = ResponseFormat(DEFAULT_FIELDS)
+        base_s, base_bytes = time_encoding(lambda d: api.app.json.dumps(old.project(d)).encode(), items, args.repeat)
+
+    print(f"  {'format':<17}{'mean bytes':>12}{'vs jsonify':>12}{'encode us/doc':>15}{'vs jsonify':>12}"
+          f"{'e2e hit p50 ms':>16}")
+    print(f"  {'jsonify (before)':<17}{base_bytes / len(items):>12.0f}{'1.00x':>12}"
+          f"{base_s / len(items) * 1e6:>15.1f}{'1.00x':>12}{'':>16}")
+    for name, query, fmt in formats():
+        seconds, total = time_encoding(lambda d: fmt.encode(d)[0], items, args.repeat)
+        # Same format through the whole request on cache hits, where encoding is most of the work
+        e2e = []
+        for pdf_bytes, _ in responses:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                client.post(f"/parse_resume?{query}", data={"resume": (io.BytesIO(pdf_bytes), "resume.pdf")},
+                            content_type="multipart/form-data", headers=headers_for(fmt))
+                e2e.append((time.perf_counter() - start) * 1000)
+        e2e.sort()
+        print(f"  {name:<17}{total / len(items):>12.0f}{base_bytes / total:>11.2f}x"
+              f"{seconds / len(items) * 1e6:>15.1f}{base_s / seconds:>11.2f}x{percentile(e2e, 50):>16.2f}")
+    api.tracker.close(30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Builds a skill index over a synthetic corpus (100k resumes by default, skills
+drawn from a Zipf distribution over the config taxonomy padded with made-up
+terms, 24 categories) and times what /search depends on: compaction, opening
+the index in a fresh process (it is memory-mapped, so this shouldn't grow with
+the corpus), and query latency for a mix of boolean queries, with and without
+category filters and a pending (uncompacted) delta.
+
+    python benchmarks/bench_skill_index.py --docs 100000 --pending 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from skill_index import SkillIndex  # noqa: E402
+from skill_matcher import load_skill_matcher  # noqa: E402
+from bench_skill_matcher import synthetic_taxonomy  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CATEGORIES = [f"CATEGORY_{i:02d}" for i in range(24)]
+
+
+def synthetic_docs(vocabulary, count, seed, prefix="doc"):
+    rng = np.random.default_rng(seed)
+    # Rank-frequency roughly like real skill mentions: a few near-universal, a long tail of rare ones
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) ** 1.1
+    weights /= weights.sum()
+    sizes = rng.integers(10, 60, size=count)
+    for i in range(count):
+        terms = {vocabulary[j] for j in rng.choice(len(vocabulary), size=sizes[i], p=weights)}
+        yield f"{prefix}-{i}", sorted(terms), f"{prefix}-{i}.pdf", CATEGORIES[i % len(CATEGORIES)]
+
+
+def queries(vocabulary, rng):
+    common, mid, rare = vocabulary[:10], vocabulary[10:200], vocabulary[200:]
+
+    def q(term):
+        return f'"{term}"'
+
+    return [
+        ("single common", q(rng.choice(common)), None),
+        ("single rare", q(rng.choice(rare)), None),
+        ("AND x2", f"{q(rng.choice(common))} AND {q(rng.choice(mid))}", None),
+        ("AND x3", f"{q(common[0])} AND {q(common[1])} AND {q(rng.choice(mid))}", None),
+        ("OR x4", " OR ".join(q(t) for t in rng.sample(mid, 4)), None),
+        ("AND/OR/NOT", f"{q(common[0])} AND ({q(mid[0])} OR {q(mid[1])}) AND NOT {q(common[2])}", None),
+        ("NOT only", f"NOT {q(common[0])}", None),
+        ("category filter", f"{q(common[0])} OR {q(mid[3])}", [CATEGORIES[3], CATEGORIES[7]]),
+    ]
+
+
+def time_queries(index, query_set, repeat):
+    rows = []
+    for label, query, categories in query_set:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = index.search(query, categories=categories, limit=20)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        rows.append((label, result["total"], times[len(times) // 2], times[-1]))
+    return rows
+
+
+def print_rows(title, rows):
+    print(f"\n{title}")
+    print(f"  {'query':<18}{'hits':>9}{'p50 ms':>10}{'max ms':>10}")
+    for label, hits, p50, worst in rows:
+        print(f"  {label:<18}{hits:>9}{p50:>10.2f}{worst:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config", "config.yaml"))
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--pending", type=int, default=2000, help="Docs added after compaction (kept in the delta)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    base = load_skill_matcher(args.config)
+    vocabulary = list(synthetic_taxonomy({skill: [] for skill in base.skills}, args.vocabulary, args.seed))
+    random.Random(args.seed).shuffle(vocabulary)
+    rng = random.Random(args.seed)
+    query_set = queries(vocabulary, rng)
+
+    with tempfile.TemporaryDirectory(prefix="bench-skill-index-") as directory:
+        index = SkillIndex(directory, compact_after=0)
+        docs = list(synthetic_docs(vocabulary, args.docs, args.seed))
+        start = time.perf_counter()
+        index.add_many(docs)
+        log_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index.compact()
+        compact_s = time.perf_counter() - start
+
+        segment_bytes = os.path.getsize(os.path.join(directory, "segment.idx"))
+        raw_postings = sum(len(terms) for _, terms, _, _ in docs) * 4
+        print(f"{args.docs} docs, {index.stats()['segment_terms']} distinct terms; "
+              f"log append {log_s:.1f}s, compaction {compact_s:.1f}s")
+        print(f"segment {segment_bytes / 2 ** 20:.1f} MiB, vs {raw_postings / 2 ** 20:.1f} MiB "
+              f"for the postings alone as plain uint32 arrays")
+
+        # Open cost in a fresh process, where nothing is in memory yet besides the page cache
+        probe = (f"import sys, time; sys.path.insert(0, {os.path.join(REPO_ROOT, 'app')!r}); "
+                 f"from skill_index import SkillIndex; s = time.perf_counter(); "
+                 f"ix = SkillIndex({directory!r}); ix.search('x'); "
+                 f"print((time.perf_counter() - s) * 1000)")
+        open_ms = float(subprocess.check_output([sys.executable, "-c", probe]).decode().strip())
+        print(f"open + first query in a new process: {open_ms:.1f} ms")
+
+        print_rows("compacted", time_queries(index, query_set, args.repeat))
+        if args.pending:
+            index.add_many(synthetic_docs(vocabulary, args.pending, args.seed + 1, prefix="pending"))
+            print_rows(f"with {args.pending} pending docs", time_queries(index, query_set, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
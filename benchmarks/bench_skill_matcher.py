@@ -0,0 +1,95 @@
+"""
+Compares the original substring-scan skill finder with the compiled SkillMatcher
+on resume text from the local corpus, at the current taxonomy size and at a
+synthetic 10k+ term taxonomy.
+
+    python benchmarks/bench_skill_matcher.py --docs 200
+"""
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from skill_matcher import SkillMatcher, load_skill_matcher  # noqa: E402
+from text_layer import extract_page_texts  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def find_skills_substring(text, skills_list):
+    """The pre-matcher implementation from app/api.py, kept here as the baseline."""
+    found = set([skill for skill in skills_list if skill in text.lower()]) if text else set()
+    return list(found)
+
+
+def load_texts(corpus_dir, limit, seed):
+    paths = sorted(glob.glob(os.path.join(corpus_dir, "*", "*.pdf")))
+    random.Random(seed).shuffle(paths)
+    texts = []
+    for path in paths[:limit]:
+        with open(path, "rb") as f:
+            pages = extract_page_texts(f.read())
+        if pages:
+            texts.append("\n".join(pages))
+    return texts
+
+
+def synthetic_taxonomy(base_taxonomy, size, seed):
+    """Pads the real taxonomy with made-up one- to three-word terms up to 'size' skills."""
+    rng = random.Random(seed)
+    syllables = ["ka", "zo", "ri", "mex", "tor", "vin", "qua", "lus", "dra", "pel", "syn", "opt"]
+    taxonomy = dict(base_taxonomy)
+    while len(taxonomy) < size:
+        words = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        taxonomy.setdefault(" ".join(words), [])
+    return taxonomy
+
+
+def time_it(fn, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume"))
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config", "config.yaml"))
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--large-taxonomy", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts = load_texts(args.corpus, args.docs, args.seed)
+    total_chars = sum(len(t) for t in texts)
+    print(f"Loaded {len(texts)} resumes ({total_chars / max(1, len(texts)):.0f} chars avg)")
+
+    base = load_skill_matcher(args.config)
+    base_taxonomy = {skill: [] for skill in base.skills}
+    for label, taxonomy in [("config", base_taxonomy),
+                            (f"synthetic-{args.large_taxonomy}", synthetic_taxonomy(base_taxonomy, args.large_taxonomy, args.seed))]:
+        skills = list(taxonomy)
+        start = time.perf_counter()
+        matcher = SkillMatcher(taxonomy)
+        build_s = time.perf_counter() - start
+
+        old_s = time_it(lambda t: find_skills_substring(t, skills), texts, args.repeat)
+        new_s = time_it(matcher.find_skills, texts, args.repeat)
+        old_hits = sum(len(find_skills_substring(t, skills)) for t in texts)
+        new_hits = sum(len(matcher.find_skills(t)) for t in texts)
+        print(f"\n[{label}] {len(skills)} skills, matcher built in {build_s * 1000:.1f} ms")
+        print(f"  substring scan : {old_s / len(texts) * 1000:8.3f} ms/doc  ({old_hits} skill hits)")
+        print(f"  SkillMatcher   : {new_s / len(texts) * 1000:8.3f} ms/doc  ({new_hits} skill hits)")
+        print(f"  speedup        : {old_s / new_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
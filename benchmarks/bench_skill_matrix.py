@@ -0,0 +1,133 @@
+"""
+Corpus analytics over a synthetic corpus (100k resumes by default, the same
+Zipf-distributed skills and 24 categories as bench_skill_index.py): building,
+saving and loading the SkillMatrix, then each query against the
+loop-over-lists version a notebook would use.
+
+    python benchmarks/bench_skill_matrix.py --docs 100000
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+from skill_matrix import SkillMatrix  # noqa: E402
+from skill_matcher import load_skill_matcher  # noqa: E402
+from bench_skill_index import synthetic_docs  # noqa: E402
+from bench_skill_matcher import synthetic_taxonomy  # noqa: E402
+
+REPO_ROOT = os.path.join(BENCH_DIR, "..")
+
+
+def synthetic_records(vocabulary, count, seed):
+    for doc_id, terms, _, category in synthetic_docs(vocabulary, count, seed):
+        yield {"doc_id": doc_id, "category": category, "content_sha256": doc_id, "rule_based_skills": terms,
+               "comprehend_entities": "[]"}
+
+
+# --- Loop-over-lists baselines ---
+def loop_category_top(records, category, n):
+    counts = Counter(t for r in records if r["category"] == category for t in r["rule_based_skills"])
+    return counts.most_common(n)
+
+
+def loop_distinctive(records, category, n):
+    doc_freq, in_category, size = Counter(), Counter(), 0
+    for r in records:
+        doc_freq.update(r["rule_based_skills"])
+        if r["category"] == category:
+            in_category.update(r["rule_based_skills"])
+            size += 1
+    scores = {t: c / size * (math.log((1 + len(records)) / (1 + doc_freq[t])) + 1) for t, c in in_category.items()}
+    return sorted(scores.items(), key=lambda item: -item[1])[:n]
+
+
+def loop_related(records, term, n):
+    together = Counter(t for r in records if term in r["rule_based_skills"] for t in r["rule_based_skills"])
+    together.pop(term, None)
+    return together.most_common(n)
+
+
+def loop_similar(records, doc_index, n):
+    doc_freq = Counter(t for r in records for t in r["rule_based_skills"])
+    idf = {t: math.log((1 + len(records)) / (1 + c)) + 1 for t, c in doc_freq.items()}
+    vectors = defaultdict(dict)
+    for i, r in enumerate(records):
+        norm = math.sqrt(sum(idf[t] ** 2 for t in r["rule_based_skills"])) or 1
+        vectors[i] = {t: idf[t] / norm for t in r["rule_based_skills"]}
+    query = vectors[doc_index]
+    scores = [(sum(w * query.get(t, 0) for t, w in vector.items()), i) for i, vector in vectors.items() if i != doc_index]
+    return sorted(scores, reverse=True)[:n]
+
+
+def timed(fn, repeat=1):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config", "config.yaml"))
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--update", type=int, default=5000, help="Resumes added incrementally after the build")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    base = load_skill_matcher(args.config)
+    vocabulary = list(synthetic_taxonomy({skill: [] for skill in base.skills}, args.vocabulary, args.seed))
+    random.Random(args.seed).shuffle(vocabulary)
+    records = list(synthetic_records(vocabulary, args.docs, args.seed))
+
+    build_ms, skills = timed(lambda: _built(records))
+    with tempfile.TemporaryDirectory(prefix="bench-skill-matrix-") as directory:
+        path = os.path.join(directory, "skills.npz")
+        save_ms, _ = timed(lambda: skills.save(path))
+        load_ms, skills = timed(lambda: SkillMatrix.load(path))
+        size = os.path.getsize(path)
+    print(f"{len(skills)} resumes x {len(skills.terms)} terms, {skills.matrix.nnz} nonzeros")
+    print(f"build {build_ms:.0f} ms, save {save_ms:.0f} ms, load {load_ms:.0f} ms, {size / 2 ** 20:.1f} MiB on disk")
+
+    more = [dict(r, doc_id=f"more-{i}") for i, r in enumerate(synthetic_records(vocabulary, args.update, args.seed + 1))]
+    update_ms, _ = timed(lambda: skills.add_records(more))
+    print(f"incremental add of {args.update} resumes: {update_ms:.0f} ms")
+    records.extend(more)
+
+    category, term, doc_index = "CATEGORY_05", vocabulary[3], 17
+    doc_id = records[doc_index]["doc_id"]
+    cases = [
+        ("category top 20", lambda: skills.frequencies(category, 20), lambda: loop_category_top(records, category, 20)),
+        ("distinctive", lambda: skills.distinctive(category, 20), lambda: loop_distinctive(records, category, 20)),
+        ("related terms", lambda: skills.related(term, 20), lambda: loop_related(records, term, 20)),
+        ("similar resumes", lambda: skills.similar(doc_id, 10), lambda: loop_similar(records, doc_index, 10)),
+        ("all categories x 50 terms", lambda: skills.frequency_table(vocabulary[:50]), None),
+        ("co-occurrence 200x200", lambda: skills.cooccurrence(vocabulary[:200]), None),
+    ]
+    print(f"\n  {'query':<28}{'first ms':>10}{'again ms':>10}{'loops ms':>10}")
+    for label, vectorized, loop in cases:
+        skills._cache = {}
+        first_ms, _ = timed(vectorized)
+        again_ms, _ = timed(vectorized, repeat=3)
+        loop_ms = timed(loop)[0] if loop else float("nan")
+        print(f"  {label:<28}{first_ms:>10.1f}{again_ms:>10.1f}{loop_ms:>10.0f}")
+
+
+def _built(records):
+    skills = SkillMatrix()
+    skills.add_records(records)
+    return skills
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures API cold start: how long `import api` takes in a fresh interpreter,
+and how long gunicorn takes from launch to its first HTTP response.
+No AWS or MLflow access is needed (dummy credentials, nothing is called).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --workers 4 --path /readyz --gunicorn-args --preload
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP_DIR = os.path.join(REPO_ROOT, "app")
+
+
+def offline_env():
+    env = dict(os.environ)
+    env.setdefault("AWS_ACCESS_KEY_ID", "offline")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "offline")
+    env.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+    return env
+
+
+def import_time(runs):
+    code = "import time; t = time.perf_counter(); import api; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=offline_env(),
+                             capture_output=True, text=True, check=True).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return times
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(workers, path, extra_args, timeout):
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{port}", *extra_args,
+           "api:app"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=offline_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1):
+                    return time.perf_counter() - start
+            except urllib.error.HTTPError:
+                # Any status counts as served (older trees have no health endpoint to poll)
+                return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"no response from {path} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def describe(label, values):
+    print(f"{label:<28} median {statistics.median(values) * 1000:8.1f} ms   "
+          f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms   (n={len(values)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--path", default="/healthz", help="Endpoint polled until it answers")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--gunicorn-args", nargs=argparse.REMAINDER, default=[])
+    args = parser.parse_args()
+
+    describe("import api", import_time(args.runs))
+    describe(f"gunicorn first {args.path}",
+             [time_to_first_request(args.workers, args.path, args.gunicorn_args, args.timeout) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Offline stand-ins for the AWS clients (S3, Textract, Comprehend) and the MLflow
+tracking client, with configurable latency and throttling. Used by the
+benchmark harness so the API can be driven end to end without network access.
+"""
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from text_layer import extract_page_texts  # noqa: E402
+from textract_poller import estimate_page_count  # noqa: E402
+
+# Latency per call in ms: (base, jitter, per_unit). 'per_unit' is per page for
+# Textract and per document in the batch for Comprehend. 'tps' caps calls per
+# second for that API; calls over it fail with ThrottlingException, like AWS.
+REALISTIC = {
+    "s3.put": (40, 20, 0),
+    "s3.get": (25, 10, 0),
+    "textract.start": (120, 40, 0),
+    "textract.job": (1500, 500, 900),
+    "textract.get": (60, 20, 0),
+    "textract.sync": (500, 150, 0),
+    "comprehend.batch": (180, 60, 12),
+    "comprehend.single": (120, 40, 0),
+    "mlflow.call": (15, 5, 0),
+    "mlflow.artifact": (40, 15, 0),
+}
+PROFILES = {
+    "instant": {},
+    "realistic": REALISTIC,
+    # Default account quotas in most regions
+    "throttled": dict(REALISTIC, tps={"textract.start": 2, "textract.get": 5, "textract.sync": 5,
+                                      "comprehend.batch": 10, "comprehend.single": 20}),
+}
+
+
+class LatencyModel:
+    """
+    Sleeps for an API's configured latency and enforces its TPS limit. Thread
+    safe; counts calls and throttles. Throttled calls are retried with
+    exponential backoff up to 'max_attempts' times, as botocore's default
+    retry handler does, before ThrottlingException reaches the app.
+    """
+
+    def __init__(self, profile, scale=1.0, seed=0, max_attempts=5):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.scale = scale
+        self.max_attempts = max_attempts
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.calls = {}
+        self.throttled = {}
+
+    def delay_ms(self, api, units=1):
+        base, jitter, per_unit = self.profile.get(api, (0, 0, 0))
+        with self._lock:
+            noise = self._rng.uniform(-jitter, jitter) if jitter else 0.0
+        return max(0.0, base + noise + per_unit * units) * self.scale
+
+    def _admit(self, api):
+        with self._lock:
+            self.calls[api] = self.calls.get(api, 0) + 1
+            limit = self.profile.get("tps", {}).get(api)
+            if not limit:
+                return True
+            now = time.monotonic()
+            window = [t for t in self._windows.get(api, []) if now - t < 1.0]
+            admitted = len(window) < limit
+            if admitted:
+                window.append(now)
+            else:
+                self.throttled[api] = self.throttled.get(api, 0) + 1
+            self._windows[api] = window
+            return admitted
+
+    def call(self, api, units=1):
+        for attempt in range(self.max_attempts):
+            if self._admit(api):
+                break
+            if attempt == self.max_attempts - 1:
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, api)
+            with self._lock:
+                backoff = self._rng.uniform(0, min(20.0, 0.05 * 2 ** attempt))
+            time.sleep(backoff)
+        delay = self.delay_ms(api, units)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "throttled": dict(self.throttled)}
+
+
+def text_lines(pdf_bytes):
+    """What the fake 'OCR' returns: the PDF's own text layer, or canned lines for scans."""
+    pages = extract_page_texts(pdf_bytes) or []
+    lines = [[line.strip() for line in text.splitlines() if line.strip()] for text in pages]
+    if not any(lines):
+        lines = [["Scanned resume", "Experienced engineer skilled in Python, SQL and AWS"]] * max(1, len(pages))
+    return lines
+
+
+def line_blocks(page_lines, first_page=1):
+    blocks = []
+    for page, lines in enumerate(page_lines, start=first_page):
+        blocks.append({"BlockType": "PAGE", "Page": page, "Id": str(uuid.uuid4())})
+        for i, line in enumerate(lines):
+            top = min(0.98, 0.02 + i * 0.018)
+            blocks.append({"BlockType": "LINE", "Text": line, "Page": page, "Confidence": 99.0, "Id": str(uuid.uuid4()),
+                           "Geometry": {"BoundingBox": {"Left": 0.08, "Top": top, "Width": 0.6, "Height": 0.012}}})
+    return blocks
+
+
+class FakeS3:
+    """Keeps the most recent 'max_objects' uploads in memory (enough for Textract to read them back)."""
+
+    def __init__(self, latency, max_objects=256):
+        self.latency = latency
+        self.max_objects = max_objects
+        self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _store(self, key, body):
+        with self._lock:
+            self._objects[key] = body
+            while len(self._objects) > self.max_objects:
+                self._objects.popitem(last=False)
+
+    def upload_fileobj(self, fileobj, bucket, key, *args, **kwargs):
+        self.latency.call("s3.put")
+        self._store(key, fileobj.read())
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.latency.call("s3.put")
+        self._store(Key, Body if isinstance(Body, bytes) else Body.read())
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.latency.call("s3.get")
+        with self._lock:
+            if Key not in self._objects:
+                raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+            return {"Body": io.BytesIO(self._objects[Key])}
+
+    def peek(self, key):
+        with self._lock:
+            return self._objects.get(key)
+
+
+class FakeTextract:
+    """
+    Async jobs finish after the 'textract.job' latency for their page count;
+    results come back paginated like GetDocumentTextDetection. The sync
+    DetectDocumentText call returns the page's lines after 'textract.sync'.
+    """
+
+    PAGE_SIZE = 1000
+    MAX_JOBS = 1000
+
+    def __init__(self, latency, s3):
+        self.latency = latency
+        self.s3 = s3
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_document_text_detection(self, DocumentLocation, **kwargs):
+        self.latency.call("textract.start")
+        pdf_bytes = self.s3.peek(DocumentLocation["S3Object"]["Name"]) or b""
+        pages = max(1, estimate_page_count(pdf_bytes) or 1)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = (time.monotonic() + self.latency.delay_ms("textract.job", pages) / 1000, pdf_bytes, None)
+            while len(self._jobs) > self.MAX_JOBS:
+                self._jobs.popitem(last=False)
+        return {"JobId": job_id}
+
+    def get_document_text_detection(self, JobId, NextToken=None, **kwargs):
+        self.latency.call("textract.get")
+        with self._lock:
+            ready_at, pdf_bytes, blocks = self._jobs[JobId]
+        if time.monotonic() < ready_at:
+            return {"JobStatus": "IN_PROGRESS"}
+        if blocks is None:
+            blocks = line_blocks(text_lines(pdf_bytes))
+            with self._lock:
+                self._jobs[JobId] = (ready_at, None, blocks)
+        start = int(NextToken or 0)
+        response = {"JobStatus": "SUCCEEDED", "Blocks": blocks[start:start + self.PAGE_SIZE],
+                    "DocumentMetadata": {"Pages": max(1, sum(1 for b in blocks if b["BlockType"] == "PAGE"))}}
+        if start + self.PAGE_SIZE < len(blocks):
+            response["NextToken"] = str(start + self.PAGE_SIZE)
+        return response
+
+    def detect_document_text(self, Document, **kwargs):
+        self.latency.call("textract.sync")
+        return {"Blocks": line_blocks(text_lines(Document["Bytes"])[:1]), "DocumentMetadata": {"Pages": 1}}
+
+
+_ENTITY_RE = re.compile(r"\b[A-Z][a-zA-Z]+(?: [A-Z][a-zA-Z]+)*\b")
+_ENTITY_TYPES = ["ORGANIZATION", "TITLE", "COMMERCIAL_ITEM", "PERSON", "LOCATION", "OTHER"]
+
+
+class FakeComprehend:
+    """Tags capitalised phrases with rotating entity types; enough to exercise merging and keyword output."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    @staticmethod
+    def _entities(text):
+        entities = []
+        for i, m in enumerate(_ENTITY_RE.finditer(text)):
+            entities.append({"Text": m.group(), "Type": _ENTITY_TYPES[len(m.group()) % len(_ENTITY_TYPES)],
+                             "Score": 0.9, "BeginOffset": m.start(), "EndOffset": m.end()})
+            if i >= 40:
+                break
+        return entities
+
+    def batch_detect_entities(self, TextList, LanguageCode, **kwargs):
+        self.latency.call("comprehend.batch", len(TextList))
+        return {"ResultList": [{"Index": i, "Entities": self._entities(t)} for i, t in enumerate(TextList)],
+                "ErrorList": []}
+
+    def detect_entities(self, Text, LanguageCode, **kwargs):
+        self.latency.call("comprehend.single")
+        return {"Entities": self._entities(Text)}
+
+
+class FakeMlflowClient:
+    """The MlflowClient calls BackgroundTracker makes, with latency and nothing stored."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.runs = 0
+
+    def get_experiment_by_name(self, name):
+        self.latency.call("mlflow.call")
+        return SimpleNamespace(experiment_id="0")
+
+    def create_experiment(self, name):
+        self.latency.call("mlflow.call")
+        return "0"
+
+    def create_run(self, experiment_id, run_name=None, start_time=None, **kwargs):
+        self.latency.call("mlflow.call")
+        self.runs += 1
+        return SimpleNamespace(info=SimpleNamespace(run_id=uuid.uuid4().hex,
+                                                    artifact_uri=f"mlflow-artifacts:/{experiment_id}"))
+
+    def log_batch(self, run_id, metrics=(), params=(), tags=(), **kwargs):
+        self.latency.call("mlflow.call")
+
+    def log_text(self, run_id, text, artifact_file):
+        self.latency.call("mlflow.artifact")
+
+    def set_terminated(self, run_id, status=None, **kwargs):
+        self.latency.call("mlflow.call")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(TESTS_DIR, "..")
+# The app modules import each other by bare name, as when run from app/
+sys.path.insert(0, os.path.join(REPO_ROOT, "app"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
@@ -0,0 +1,198 @@
+import io
+import glob
+import json
+import os
+import types
+import zipfile
+
+import pytest
+
+from conftest import REPO_ROOT
+
+# Distinct resumes, so one test's upload is never a cache hit (or near duplicate) for another's
+PDF_PATHS = sorted(glob.glob(os.path.join(REPO_ROOT, "data", "raw_pdfs", "resume", "ENGINEERING", "*.pdf")))
+
+
+def resume(index):
+    with open(PDF_PATHS[index], "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def api():
+    # The API reads its settings at import time, so it's loaded once for the module, as bench_api does
+    import bench_api
+    from fake_aws import LatencyModel
+    latency = LatencyModel("instant")
+    # Every page through the fake Textract, so the whole pipeline runs
+    api = bench_api.load_app(types.SimpleNamespace(cache=True, force_ocr=True, latency_scale=0.0), latency)
+    api.latency = latency
+    return api
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+def upload(client, pdf_bytes, filename="resume.pdf", query=""):
+    return client.post(f"/parse_resume{query}", data={"resume": (io.BytesIO(pdf_bytes), filename)})
+
+
+def aws_calls(api):
+    return sum(count for name, count in api.latency.calls.items() if name.split(".")[0] in ("textract", "comprehend"))
+
+
+def ndjson(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+# --- /parse_resume ---
+def test_second_upload_is_a_cache_hit(api, client):
+    first = upload(client, resume(0))
+    assert first.status_code == 200
+    assert first.json["cache_hit"] is False
+    assert first.json["combined_keywords"]
+    calls = aws_calls(api)
+
+    second = upload(client, resume(0), filename="renamed.pdf")
+
+    assert second.status_code == 200
+    assert second.json["cache_hit"] is True
+    assert second.json["content_sha256"] == first.json["content_sha256"]
+    assert second.json["combined_keywords"] == first.json["combined_keywords"]
+    assert aws_calls(api) == calls
+
+
+def test_uploads_must_be_pdf_files(client):
+    assert client.post("/parse_resume", data={}).status_code == 400
+    assert upload(client, b"hello", filename="resume.txt").json == {"error": "Only PDF files are allowed"}
+
+
+def test_async_upload_is_polled_to_its_result(client):
+    response = upload(client, resume(1), query="?async=true")
+    assert response.status_code == 202
+    assert response.headers["Location"] == response.json["status_url"]
+
+    job = client.get(f"{response.json['status_url']}?wait=30").json
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["cache_hit"] is False
+    assert job["result"]["combined_keywords"]
+
+
+def test_unknown_jobs_and_bad_waits_are_rejected(client):
+    assert client.get("/jobs/0123").status_code == 404
+    assert client.get("/jobs/0123?wait=soon").status_code == 400
+
+
+def test_stream_sends_header_and_first_page_before_the_result(client):
+    response = upload(client, resume(2), query="?stream=true")
+    events = ndjson(response.data)
+    assert [event["event"] for event in events] == ["header", "first_page", "result"]
+    assert events[-1]["status"] == 200
+    assert events[0]["content_sha256"] == events[-1]["result"]["content_sha256"]
+
+
+def test_documents_with_object_streams_are_ocrd_in_full(api, monkeypatch):
+    pymupdf = pytest.importorskip("pymupdf")
+    import text_layer
+    from textract_poller import estimate_page_count
+    doc = pymupdf.open()
+    for number in range(1, 4):
+        doc.new_page().insert_text((72, 72), f"Scanned page {number}")
+    # Page objects inside compressed object streams, which the raw-bytes guess can't see
+    pdf_bytes = doc.tobytes(use_objstms=1, garbage=3, deflate=True)
+    assert estimate_page_count(pdf_bytes) < 3
+    # Counted by pypdf, as in the image we ship
+    monkeypatch.setattr(text_layer, "pymupdf", None)
+
+    page_numbers, total_pages = api.pages_to_ocr(pdf_bytes, None)
+
+    assert (page_numbers, total_pages) == ([1, 2, 3], 3)
+    pages = api.split_pages(pdf_bytes, page_numbers)
+    assert [text_layer.extract_page_texts(page)[0].strip() for page in pages] == [
+        "Scanned page 1", "Scanned page 2", "Scanned page 3"]
+
+
+# --- /parse_resumes ---
+def test_batch_lines_cover_every_document_then_the_summary(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("folder/zipped.pdf", resume(3))
+        zf.writestr("notes.txt", "not a resume")
+    archive.seek(0)
+    files = [(io.BytesIO(resume(4)), "first.pdf"), (io.BytesIO(b"x"), "photo.png"), (archive, "more.zip")]
+
+    response = client.post("/parse_resumes?concurrency=2", data={"resumes": files})
+
+    assert response.status_code == 200
+    lines = ndjson(response.data)
+    items, summary = lines[:-1], lines[-1]["summary"]
+    assert summary["total"] == 4 and summary["succeeded"] == 2 and summary["failed"] == 2
+    by_index = {item["index"]: item for item in items}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert [by_index[i]["filename"] for i in range(4)] == ["first.pdf", "photo.png", "zipped.pdf", "notes.txt"]
+    assert by_index[1]["status"] == 400 and by_index[3]["error"] == "Only PDF files are allowed"
+    # Rejected documents are reported before any parsed one, which come in completion order
+    assert [item["status"] for item in items] == [400, 400, 200, 200]
+    assert all("combined_keywords" in item["result"] for item in items if item["status"] == 200)
+
+
+def test_batch_input_errors_fail_the_request(client):
+    assert client.post("/parse_resumes", data={}).status_code == 400
+    response = client.post("/parse_resumes?concurrency=all", data={"resumes": [(io.BytesIO(resume(5)), "a.pdf")]})
+    assert response.status_code == 400
+    broken = client.post("/parse_resumes", data={"resumes": [(io.BytesIO(b"not a zip"), "broken.zip")]})
+    assert ndjson(broken.data)[0]["error"].startswith("Invalid ZIP archive")
+
+
+# --- /reprocess ---
+def test_reprocess_retags_results_from_an_older_version(api, client, monkeypatch):
+    assert upload(client, resume(6)).status_code == 200
+    monkeypatch.setattr(api, "result_version", "test-newer-version")
+
+    response = client.post("/reprocess")
+
+    assert response.status_code == 202
+    assert response.json["version"] == "test-newer-version"
+    job = client.get(f"{response.json['status_url']}?wait=30").json
+    assert job["status"] == "succeeded"
+    assert job["result"]["stale"] >= 1 and job["result"]["errors"] == 0
+    assert client.post("/reprocess?limit=some").status_code == 400
+
+
+# --- ASGI entry point ---
+@pytest.fixture(scope="module")
+def asgi_client(api):
+    from starlette.testclient import TestClient
+    import asgi
+    return TestClient(asgi.app)
+
+
+def test_asgi_upload_matches_flask(client, asgi_client):
+    flask_result = upload(client, resume(7)).json
+    asgi_result = asgi_client.post("/parse_resume", files={"resume": ("resume.pdf", resume(7))}).json()
+    assert asgi_result["cache_hit"] is True
+    assert asgi_result["combined_keywords"] == flask_result["combined_keywords"]
+
+
+def test_asgi_jobs_are_polled_from_flask(client, asgi_client):
+    response = asgi_client.post("/parse_resume?async=true", files={"resume": ("resume.pdf", resume(8))})
+    assert response.status_code == 202
+    assert client.get(f"{response.json()['status_url']}?wait=30").json["status"] == "succeeded"
+
+
+def test_asgi_limits_chunked_uploads_as_they_arrive(asgi_client, monkeypatch):
+    import asgi
+    monkeypatch.setattr(asgi, "MAX_CONTENT_LENGTH", 1024)
+
+    def chunks():
+        for _ in range(8):
+            yield b"x" * 512
+
+    response = asgi_client.post("/parse_resume", content=chunks(),
+                                headers={"Content-Type": "multipart/form-data; boundary=limit"})
+
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
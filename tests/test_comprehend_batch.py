@@ -0,0 +1,65 @@
+import re
+
+from comprehend_batch import ComprehendChunker, chunk_text, merge_entities
+
+
+class CapitalizedNames:
+    """Comprehend stand-in: every run of capitalized words in a chunk is a PERSON."""
+
+    def __init__(self):
+        self.batches = []
+
+    def batch_detect_entities(self, TextList, LanguageCode):
+        self.batches.append(TextList)
+        results = []
+        for index, chunk in enumerate(TextList):
+            entities = [{"Type": "PERSON", "Text": m.group(), "BeginOffset": m.start(), "EndOffset": m.end(),
+                         "Score": 0.9} for m in re.finditer(r"[A-Z][a-z]+(?: [A-Z][a-z]+)*", chunk)]
+            results.append({"Index": index, "Entities": entities})
+        return {"ResultList": results, "ErrorList": []}
+
+
+def entity(type_, begin, end, text, score=0.9):
+    return {"Type": type_, "BeginOffset": begin, "EndOffset": end, "Text": text, "Score": score}
+
+
+def test_chunks_concatenate_back_to_the_text():
+    text = "first line\n" + "word " * 50 + "\nlast line"
+    chunks = chunk_text(text, max_bytes=40)
+    assert "".join(chunk for _, chunk in chunks) == text
+    assert all(len(chunk.encode("utf-8")) <= 40 for _, chunk in chunks)
+    assert all(text[start:start + len(chunk)] == chunk for start, chunk in chunks)
+
+
+def test_name_split_across_two_chunks_comes_back_whole():
+    text = "aaaa bbbb cccc John Smith dddd"
+    assert [chunk for _, chunk in chunk_text(text, max_bytes=20)] == ["aaaa bbbb cccc John ", "Smith dddd"]
+    client = CapitalizedNames()
+
+    entities = ComprehendChunker(client, max_bytes=20).detect_entities(text)
+
+    assert len(client.batches[0]) == 2
+    assert entities == [entity("PERSON", 15, 25, "John Smith")]
+
+
+def test_adjacent_pieces_join_only_at_a_chunk_boundary():
+    text = "John Smith"
+    pieces = [entity("PERSON", 0, 4, "John", 0.9), entity("PERSON", 5, 10, "Smith", 0.7)]
+    assert merge_entities(pieces, text, boundaries=[5]) == [entity("PERSON", 0, 10, "John Smith", 0.7)]
+    # Two people that merely sit next to each other inside one chunk stay apart
+    assert merge_entities(pieces, text, boundaries=[]) == pieces
+    assert merge_entities(pieces, text, boundaries=[20]) == pieces
+
+
+def test_pieces_of_different_types_or_lines_stay_apart():
+    text = "John\nSmith"
+    assert len(merge_entities([entity("PERSON", 0, 4, "John"), entity("PERSON", 5, 10, "Smith")],
+                              text, boundaries=[5])) == 2
+    text = "John Acme"
+    assert len(merge_entities([entity("PERSON", 0, 4, "John"), entity("ORGANIZATION", 5, 9, "Acme")],
+                              text, boundaries=[5])) == 2
+
+
+def test_overlapping_duplicates_keep_the_higher_score():
+    low, high = entity("PERSON", 0, 10, "John Smith", 0.5), entity("PERSON", 5, 10, "Smith", 0.95)
+    assert merge_entities([low, high]) == [high]
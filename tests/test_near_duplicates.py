@@ -0,0 +1,40 @@
+from near_duplicates import NearDuplicateIndex, minhash, relocate_entities
+
+ORIGINAL = ("Jane Doe\nPhone 555-1234\nWorked at Acme Corp 2019-2021 as a data engineer building pipelines\n"
+            "Skills Python, SQL and Spark at Acme Corp\n")
+EDITED = ("Jane Doe\nPhone +44 20 7946 0000\nWorked at Acme Corp 2019-2022 as a data engineer building pipelines\n"
+          "Skills Python, SQL and Spark\n")
+
+
+# Enough distinct text around the edits for the similarity to stay high
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+BODY = "".join(f"Project {a} {b} delivered reporting for the {b} team using tools chosen by {a}\n"
+               for a in WORDS for b in WORDS)
+
+
+def entity(text, type_, begin):
+    return {"Text": text, "Type": type_, "BeginOffset": begin, "EndOffset": begin + len(text), "Score": 0.9}
+
+
+def test_edited_resume_is_found_and_itself_excluded():
+    index = NearDuplicateIndex()
+    index.add("a" * 64, minhash(ORIGINAL + BODY))
+    match = index.query(minhash(EDITED + BODY))
+    assert match is not None and match[0] == "a" * 64
+    assert match[1] >= index.threshold
+    assert index.query(minhash(ORIGINAL + BODY), exclude="a" * 64) is None
+
+
+def test_reused_entities_point_into_the_new_text():
+    entities = [entity("Jane Doe", "PERSON", 0), entity("555-1234", "OTHER", ORIGINAL.index("555")),
+                entity("Acme Corp", "ORGANIZATION", ORIGINAL.index("Acme")),
+                entity("Python", "OTHER", ORIGINAL.index("Python")),
+                entity("Acme Corp", "ORGANIZATION", ORIGINAL.rindex("Acme"))]
+
+    relocated = relocate_entities(entities, EDITED)
+
+    # The phone number was edited away, and the second Acme Corp is gone; the first isn't reused for it
+    assert [e["Text"] for e in relocated] == ["Jane Doe", "Acme Corp", "Python"]
+    for e in relocated:
+        assert EDITED[e["BeginOffset"]:e["EndOffset"]] == e["Text"]
+    assert relocated[1]["BeginOffset"] == EDITED.index("Acme")
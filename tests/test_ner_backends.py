@@ -0,0 +1,163 @@
+import pytest
+
+import ner_backends
+from ner_backends import (SCORES_KEY, ComprehendBackend, HybridBackend, SpacyBackend, agreement, in_regions,
+                          line_regions)
+
+needs_spacy = pytest.mark.skipif(not ner_backends.is_available(), reason="spaCy is not installed")
+
+
+class ScoredPipeline:
+    """
+    en_core_web_sm stand-in: a blank English pipeline whose entity ruler finds
+    the given phrases, scored from a fixed table as entity_confidence would.
+    """
+
+    def __init__(self, patterns, scores):
+        self.nlp = ner_backends.spacy.blank("en")
+        self.nlp.add_pipe("entity_ruler").add_patterns(
+            [{"label": label, "pattern": phrase} for phrase, label in patterns.items()])
+        self.scores = scores
+
+    def __call__(self, text):
+        doc = self.nlp(text)
+        doc.user_data[SCORES_KEY] = [self.scores.get(ent.text, 1.0) for ent in doc.ents]
+        return doc
+
+
+class PhraseChunker:
+    """ComprehendChunker stand-in: finds known phrases, and keeps every text it was sent."""
+
+    def __init__(self, phrases):
+        self.phrases = phrases
+        self.texts = []
+
+    def detect_entities(self, text):
+        self.texts.append(text)
+        entities = []
+        for phrase, type_ in self.phrases.items():
+            begin = text.find(phrase)
+            if begin != -1:
+                entities.append(entity(type_, begin, begin + len(phrase), phrase, score=0.99))
+        return sorted(entities, key=lambda e: e["BeginOffset"])
+
+
+def entity(type_, begin, end, text, score=0.9):
+    return {"Type": type_, "BeginOffset": begin, "EndOffset": end, "Text": text, "Score": score}
+
+
+def local_backend(patterns, scores=None):
+    backend = SpacyBackend(beam_width=1)
+    backend._nlp = ScoredPipeline(patterns, scores or {})
+    return backend
+
+
+def hybrid(text_patterns, scores, phrases, min_confidence=0.8):
+    chunker = PhraseChunker(phrases)
+    backend = HybridBackend(local_backend(text_patterns, scores), ComprehendBackend(chunker), min_confidence)
+    return backend, chunker
+
+
+def at(text, phrase):
+    begin = text.index(phrase)
+    return begin, begin + len(phrase)
+
+
+# --- Regions ---
+def test_line_regions_cover_whole_lines_and_merge_adjacent_ones():
+    text = "Jane Doe\nAcme Corp\nPython\n\nParis"
+    entities = [entity("LOCATION", *at(text, "Paris"), "Paris"),
+                entity("ORGANIZATION", *at(text, "Acme"), "Acme"),
+                entity("OTHER", *at(text, "Python"), "Python")]
+
+    regions = line_regions(text, entities)
+
+    assert regions == [(9, 25), (27, 32)]
+    assert [text[start:end] for start, end in regions] == ["Acme Corp\nPython", "Paris"]
+    assert line_regions(text, []) == []
+
+
+def test_in_regions_needs_the_whole_entity_inside_one_region():
+    regions = [(9, 25), (27, 32)]
+    assert in_regions(entity("PERSON", 9, 13, "Acme"), regions)
+    assert in_regions(entity("LOCATION", 27, 32, "Paris"), regions)
+    assert not in_regions(entity("PERSON", 0, 8, "Jane Doe"), regions)
+    assert not in_regions(entity("OTHER", 20, 28, "on\n\nPa"), regions)
+    assert not in_regions(entity("OTHER", 25, 26, "\n"), regions)
+
+
+# --- Backends ---
+@needs_spacy
+def test_local_entities_carry_comprehend_types_and_scores():
+    backend = local_backend({"Jane Doe": "PERSON", "Python": "SKILL"}, {"Jane Doe": 0.75})
+
+    spans = backend.detect_spans("Jane Doe knows Python")
+
+    assert spans == [(entity("PERSON", 0, 8, "Jane Doe", score=0.75), True),
+                     (entity("OTHER", 15, 21, "Python", score=1.0), False)]
+    assert backend.detect("") == []
+
+
+@needs_spacy
+def test_hybrid_sends_only_unsure_lines_to_comprehend_and_maps_offsets_back():
+    text = "Jane Doe\nWorks at Acme Corp\nLives in Paris\nKnows Python well"
+    backend, chunker = hybrid({"Jane Doe": "PERSON", "Acme": "ORG", "Paris": "GPE", "Python": "SKILL"},
+                              {"Acme": 0.3},
+                              {"Acme Corp": "ORGANIZATION", "Python": "OTHER", "Paris": "LOCATION"})
+
+    entities = backend.detect(text)
+
+    # Lines 2 and 4 are unsure and not adjacent: one call, the lines a newline apart
+    assert chunker.texts == ["Works at Acme Corp\nKnows Python well"]
+    assert [(e["Text"], e["Type"], e["Score"]) for e in entities] == [
+        ("Jane Doe", "PERSON", 1.0), ("Acme Corp", "ORGANIZATION", 0.99), ("Paris", "LOCATION", 1.0),
+        ("Python", "OTHER", 0.99)]
+    assert all(text[e["BeginOffset"]:e["EndOffset"]] == e["Text"] for e in entities)
+    stats = backend.snapshot()
+    assert stats["documents"] == stats["fallback_documents"] == 1
+    assert stats["fallback_chars"] == len("Works at Acme Corp") + len("Knows Python well")
+
+
+@needs_spacy
+def test_hybrid_keeps_confident_documents_local():
+    backend, chunker = hybrid({"Jane Doe": "PERSON"}, {"Jane Doe": 0.9}, {"Jane Doe": "PERSON"})
+
+    assert backend.detect("Jane Doe\nEngineer") == [entity("PERSON", 0, 8, "Jane Doe", score=0.9)]
+    assert backend.detect("") == []
+
+    assert chunker.texts == []
+    assert backend.snapshot() == {"documents": 2, "fallback_documents": 0, "chars": 17, "fallback_chars": 0,
+                                  "fallback_char_share": 0.0}
+
+
+def test_comprehend_backend_skips_empty_documents():
+    chunker = PhraseChunker({"Acme": "ORGANIZATION"})
+    backend = ComprehendBackend(chunker)
+
+    assert backend.detect_many(["", "at Acme"]) == [[], [entity("ORGANIZATION", 3, 7, "Acme", score=0.99)]]
+    assert chunker.texts == ["at Acme"]
+
+
+# --- Agreement ---
+def test_agreement_scores_exact_and_overlapping_spans():
+    reference = [[entity("PERSON", 0, 8, "Jane Doe"), entity("ORGANIZATION", 20, 29, "Acme Corp")],
+                 [entity("DATE", 0, 4, "2020")]]
+    candidate = [[entity("PERSON", 0, 8, "Jane Doe"), entity("ORGANIZATION", 20, 24, "Acme"),
+                  entity("LOCATION", 40, 45, "Paris")],
+                 []]
+
+    report = agreement(reference, candidate, exclude_types=("DATE",))
+
+    assert report["exact"] == {"precision": 0.3333, "recall": 0.3333, "f1": 0.3333}
+    assert report["overlap"] == {"precision": 0.6667, "recall": 0.6667, "f1": 0.6667}
+    assert report["recall_by_type"] == {"PERSON": {"recall": 1.0, "support": 1},
+                                        "ORGANIZATION": {"recall": 0.0, "support": 1},
+                                        "DATE": {"recall": 0.0, "support": 1}}
+    # {jane doe, acme corp} against {jane doe, acme, paris}; the second document has no keywords
+    assert report["keyword_jaccard"] == 0.25
+
+
+def test_agreement_with_nothing_found_has_no_scores():
+    report = agreement([[]], [[]])
+    assert report["exact"] == {"precision": None, "recall": None, "f1": None}
+    assert report["keyword_jaccard"] is None
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+import ocr_store
+from block_store import BlockStore
+from ocr_store import NO_ENTITIES, VERSIONS_NAME, OcrStore, reprocess
+
+EXCLUDE = ["PERSON"]
+
+
+class RecordingIndex:
+    def __init__(self):
+        self.added = []
+
+    def add_many(self, docs):
+        self.added.extend(docs)
+
+
+def store_record(text, rule_skills, entities=()):
+    blocks = BlockStore()
+    blocks.add_text_layer_page(text, 1)
+    combined = sorted({s.lower() for s in rule_skills} | {e["Text"].lower() for e in entities
+                                                           if e["Type"] not in EXCLUDE})
+    return {"filename": f"{text[:6]}.pdf", "category": "IT", "textract_blocks": blocks.to_dict(),
+            "comprehend_entities": list(entities), "ner": NO_ENTITIES, "rule_based_skills": list(rule_skills),
+            "combined_keywords": combined}
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("skills:\n  terms:\n    python: []\n    docker: []\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OcrStore(str(tmp_path / "store"))
+    # Up to date under v1 but not v2
+    store.put("aa01", store_record("Python developer", ["python"]), "v1")
+    # Stored before 'docker' was in the taxonomy
+    store.put("bb02", store_record("Docker and Python", ["python"], [{"Text": "Jane", "Type": "PERSON"}]), "v1")
+    store.put("cc03", store_record("Docker admin", ["docker"]), "v2")
+    return store
+
+
+# --- Versions ---
+def test_stale_lists_stored_documents_not_at_the_version(store):
+    store._write("dd04", store_record("Unlogged", []))
+    store.set_versions([("gone", "v1", NO_ENTITIES)])
+
+    assert store.stale("v2") == ["aa01", "bb02", "dd04"]
+    assert store.stale("v1") == ["cc03", "dd04"]
+    assert store.stats("v2")["stale"] == 3
+
+
+def test_versions_are_tailed_and_reread_after_another_process_compacts(store):
+    other = OcrStore(store.directory)
+    assert store.versions()["bb02"] == ("v1", NO_ENTITIES)
+    position = store._log_position
+
+    other.set_versions([("bb02", "v2", NO_ENTITIES), ("gone", "v1", NO_ENTITIES)])
+    assert store.versions()["bb02"] == ("v2", NO_ENTITIES)
+    assert store._log_position > position
+
+    # A line another process is still writing isn't read until it's complete
+    with open(os.path.join(store.directory, VERSIONS_NAME), "a", encoding="utf-8") as log:
+        log.write('{"key": "aa01", "version": "v2"')
+    assert store.versions()["aa01"] == ("v1", NO_ENTITIES)
+    with open(os.path.join(store.directory, VERSIONS_NAME), "a", encoding="utf-8") as log:
+        log.write(', "ner": "none"}\n')
+    assert store.versions()["aa01"] == ("v2", NO_ENTITIES)
+
+    other.compact_versions()
+    other.set_versions([("cc03", "v3", NO_ENTITIES)])
+    # Read from the start again: the unstored key is gone and the line after the compaction is there
+    assert store.versions() == {"aa01": ("v2", NO_ENTITIES), "bb02": ("v2", NO_ENTITIES),
+                                "cc03": ("v3", NO_ENTITIES)}
+
+
+# --- Reprocessing ---
+def test_reprocess_rewrites_only_documents_whose_keywords_changed(store, config_path, monkeypatch):
+    written = []
+    write = store._write
+    monkeypatch.setattr(store, "_write", lambda key, record: (written.append(key), write(key, record)))
+    index = RecordingIndex()
+
+    summary = reprocess(store, "v2", NO_ENTITIES, EXCLUDE, config_path, skill_index=index, workers=1)
+
+    assert {k: summary[k] for k in ("stale", "retagged", "changed", "errors")} == {
+        "stale": 2, "retagged": 2, "changed": 1, "errors": 0}
+    assert written == ["bb02"]
+    assert sorted(store.get("bb02")["rule_based_skills"]) == ["docker", "python"]
+    assert [(key, sorted(keywords), filename) for key, keywords, filename, _ in index.added] == [
+        ("bb02", ["docker", "python"], "Docker.pdf")]
+    assert store.stale("v2") == []
+
+
+def test_a_record_that_disappears_mid_reprocess_is_an_error_for_that_key(store, config_path, monkeypatch):
+    retag_batch = ocr_store.retag_batch
+
+    def retag_then_lose_record(directory, keys, exclude_types):
+        results = retag_batch(directory, keys, exclude_types)
+        os.remove(store._path("bb02"))
+        return results
+    monkeypatch.setattr(ocr_store, "retag_batch", retag_then_lose_record)
+
+    summary = reprocess(store, "v2", NO_ENTITIES, EXCLUDE, config_path, workers=1)
+
+    assert {k: summary[k] for k in ("retagged", "changed", "errors")} == {"retagged": 1, "changed": 0, "errors": 1}
+    assert store.versions()["aa01"] == ("v2", NO_ENTITIES)
+    assert store.versions()["bb02"] == ("v1", NO_ENTITIES)
+    assert "bb02" not in store
+
+
+def test_entities_from_another_backend_need_a_detector(store, config_path):
+    summary = reprocess(store, "v2", "spacy:model", EXCLUDE, config_path, workers=1)
+    assert summary["errors"] == 2 and summary["retagged"] == 0
+
+    detected = []
+    summary = reprocess(store, "v2", "spacy:model", EXCLUDE, config_path, workers=1,
+                        detect_entities=lambda text: detected.append(text) or [])
+    assert summary["entities_redetected"] == 2 and summary["retagged"] == 2
+    assert sorted(detected) == ["Docker and Python", "Python developer"]
+    assert store.get("bb02")["comprehend_entities"] == []
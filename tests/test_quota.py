@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+import multiprocessing
+
+import pytest
+from botocore.exceptions import ClientError
+
+from quota import (PRIORITY_BULK, PRIORITY_INTERACTIVE, QuotaExceeded, QuotaScheduler, SlotPool, TokenBucket,
+                   priority)
+
+# flock'd state is per open file, so forked children contend with us like separate workers do
+fork = multiprocessing.get_context("fork")
+
+
+def throttling_error():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "DetectDocumentText")
+
+
+def wait_for_queue(scheduler, name, length, timeout=5.0):
+    deadline = time.time() + timeout
+    while scheduler.snapshot()[name]["waiting"] < length:
+        assert time.time() < deadline, f"{length} callers never queued for {name}"
+        time.sleep(0.005)
+
+
+# --- Admission ---
+def test_interactive_callers_go_ahead_of_queued_bulk_work():
+    scheduler = QuotaScheduler({"textract": 20})
+    scheduler._buckets["textract"].hold_off(0.2)
+    order = []
+
+    def call(label, level):
+        with priority(level):
+            scheduler.call("textract", order.append, label)
+
+    threads = []
+    for label, level in [("bulk-1", PRIORITY_BULK), ("bulk-2", PRIORITY_BULK), ("bulk-3", PRIORITY_BULK),
+                         ("interactive-1", PRIORITY_INTERACTIVE), ("interactive-2", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=call, args=(label, level))
+        thread.start()
+        threads.append(thread)
+        # Queued one after the other, so arrival order is known
+        wait_for_queue(scheduler, "textract", len(threads))
+    for thread in threads:
+        thread.join(10)
+
+    assert order == ["interactive-1", "interactive-2", "bulk-1", "bulk-2", "bulk-3"]
+    assert scheduler.snapshot()["textract"]["admitted"] == 5
+
+
+def test_callers_that_cannot_be_admitted_in_time_get_retry_after():
+    scheduler = QuotaScheduler({"comprehend": 1}, max_wait={PRIORITY_INTERACTIVE: 0.5, PRIORITY_BULK: 0.5})
+    scheduler._buckets["comprehend"].hold_off(5)
+
+    with pytest.raises(QuotaExceeded) as booked:
+        scheduler.acquire("comprehend")
+    with pytest.raises(QuotaExceeded) as busy:
+        scheduler.try_call("comprehend", lambda: "never")
+
+    assert booked.value.retry_after >= 5
+    assert busy.value.retry_after >= 5
+    assert scheduler.snapshot()["comprehend"]["rejected"] == 2
+
+
+def test_throttling_holds_the_bucket_off_for_everyone():
+    scheduler = QuotaScheduler({"textract_get": 10}, base_backoff=0.5)
+
+    def throttled():
+        raise throttling_error()
+
+    with pytest.raises(ClientError):
+        scheduler.try_call("textract_get", throttled)
+
+    assert scheduler._buckets["textract_get"].level() < 0
+    with pytest.raises(QuotaExceeded):
+        scheduler.try_call("textract_get", lambda: "too soon")
+    assert scheduler.snapshot()["textract_get"]["throttled"] == 1
+
+
+def test_throttled_calls_are_retried_then_given_up_on():
+    scheduler = QuotaScheduler({"textract": 100}, max_attempts=3, base_backoff=0.01, max_backoff=0.05)
+    responses = iter([throttling_error(), "blocks"])
+
+    def flaky():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert scheduler.call("textract", flaky) == "blocks"
+
+    def always_throttled():
+        raise throttling_error()
+
+    with pytest.raises(QuotaExceeded) as given_up:
+        scheduler.call("textract", always_throttled)
+    assert isinstance(given_up.value.__cause__, ClientError)
+    assert scheduler.snapshot()["textract"]["throttled"] == 4
+
+
+def test_other_errors_are_not_retried():
+    scheduler = QuotaScheduler({"textract": 100})
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad document")
+
+    with pytest.raises(ValueError):
+        scheduler.call("textract", broken)
+    assert calls == [1]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_slots_are_released_when_the_holder_raises(tmp_path, shared):
+    scheduler = QuotaScheduler({}, slots={"textract_jobs": 1}, state_dir=str(tmp_path) if shared else None,
+                               max_wait={PRIORITY_INTERACTIVE: 0.2, PRIORITY_BULK: 0.2}, slot_poll_interval=0.01)
+
+    with pytest.raises(RuntimeError):
+        with scheduler.slot("textract_jobs"):
+            with pytest.raises(QuotaExceeded):
+                scheduler.acquire("textract_jobs")
+            raise RuntimeError("job failed")
+
+    handle = scheduler.acquire("textract_jobs")
+    scheduler.release("textract_jobs", handle)
+
+
+# --- Across processes ---
+def take_token(path):
+    os._exit(0 if TokenBucket(0.01, burst=1, path=path).try_take() == 0 else 1)
+
+
+def test_processes_share_one_token_bucket(tmp_path):
+    path = str(tmp_path / "textract.bucket")
+    child = fork.Process(target=take_token, args=(path,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+
+    # The child took the only token; the next is 100 s away
+    assert TokenBucket(0.01, burst=1, path=path).try_take() > 50
+
+
+def hold_slot(directory, holding, done):
+    pool = SlotPool(1, directory)
+    handle = pool.try_acquire()
+    holding.set()
+    done.wait(10)
+    # Exits without releasing, as a killed worker would
+    os._exit(0 if handle is not None else 1)
+
+
+def test_a_dead_process_frees_its_slot(tmp_path):
+    holding, done = fork.Event(), fork.Event()
+    child = fork.Process(target=hold_slot, args=(str(tmp_path), holding, done))
+    child.start()
+    assert holding.wait(10)
+    pool = SlotPool(1, str(tmp_path))
+
+    assert pool.try_acquire() is None
+    done.set()
+    child.join(10)
+    assert child.exitcode == 0
+    handle = pool.try_acquire()
+    assert handle is not None
+    pool.release(handle)
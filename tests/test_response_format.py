@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import response_format
+from response_format import (COMPACT_FIELDS, NotAcceptable, ResponseFormat, ResponseFormatError, coding_quality,
+                             parse_quality)
+
+needs_zstd = pytest.mark.skipif(response_format.zstandard is None, reason="zstandard is not installed")
+
+
+def negotiate(accept_encoding=None, **args):
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding is not None else {}
+    return ResponseFormat.from_request(MultiDict(args), headers)
+
+
+# --- Header parsing ---
+def test_parse_quality_reads_tokens_and_q_values():
+    assert parse_quality("GZIP;q=0.5, zstd , br;level=4;q=0.2, identity;q=oops,") == {
+        "gzip": 0.5, "zstd": 1.0, "br": 0.2, "identity": 0.0}
+    assert parse_quality(None) == {}
+    assert parse_quality("") == {}
+
+
+def test_an_explicit_entry_overrides_the_wildcard():
+    encodings = parse_quality("gzip;q=0, *;q=0.8")
+    assert coding_quality(encodings, "gzip") == 0.0
+    assert coding_quality(encodings, "br") == 0.8
+    assert coding_quality(encodings, "identity") == 0.8
+
+
+def test_identity_is_acceptable_unless_refused():
+    assert coding_quality({}, "identity") == 1.0
+    assert coding_quality({}, "gzip") == 0.0
+    assert coding_quality(parse_quality("identity;q=0"), "identity") == 0.0
+    assert coding_quality(parse_quality("*;q=0"), "identity") == 0.0
+
+
+# --- Negotiation ---
+@needs_zstd
+@pytest.mark.parametrize("header, expected", [
+    ("gzip;q=1, zstd;q=0.1", "gzip"),
+    ("gzip;q=0.5, zstd", "zstd"),
+    ("gzip, zstd", "zstd"),
+    ("zstd;q=0, gzip", "gzip"),
+    ("*", "gzip"),
+    ("gzip;q=0.2, identity", None),
+    ("gzip", "gzip"),
+    ("", None),
+])
+def test_the_highest_quality_coding_is_chosen(header, expected):
+    assert negotiate(header).content_encoding == expected
+
+
+def test_refusing_identity_compresses_even_small_bodies():
+    fmt = negotiate("identity;q=0, gzip;q=0.5")
+    assert fmt.content_encoding == "gzip" and fmt.identity_allowed is False
+    body, headers = fmt.encode({"cache_hit": True})
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == b'{"cache_hit":true}'
+
+
+@pytest.mark.parametrize("header", ["identity;q=0", "*;q=0", "gzip;q=0, identity;q=0"])
+def test_nothing_acceptable_is_a_406(header):
+    with pytest.raises(NotAcceptable) as refused:
+        negotiate(header)
+    assert refused.value.status == 406
+
+
+def test_fields_are_projected_and_unknown_ones_rejected():
+    assert negotiate(compact="true").fields == COMPACT_FIELDS
+    assert negotiate(fields="combined_keywords,cache_hit").project(
+        {"combined_keywords": ["python"], "cache_hit": False, "s3_path": "s3://b/k"}) == {
+        "combined_keywords": ["python"], "cache_hit": False}
+    with pytest.raises(ResponseFormatError) as unknown:
+        negotiate(fields="secrets")
+    assert unknown.value.status == 400 and not isinstance(unknown.value, NotAcceptable)
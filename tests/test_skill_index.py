@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from skill_index import QueryError, SkillIndex, decode_postings, encode_postings, parse_query
+
+
+@pytest.mark.parametrize("doc_ids", [
+    [],
+    [0],
+    [0, 1, 2, 3],
+    [5, 127, 128, 255, 16_383, 16_384, 2_097_151, 2_097_152, 4_000_000_000],
+    sorted(np.random.default_rng(7).choice(10_000_000, size=5_000, replace=False).tolist()),
+])
+def test_postings_round_trip(doc_ids):
+    encoded = encode_postings(doc_ids)
+    assert decode_postings(encoded).tolist() == doc_ids
+
+
+def test_postings_use_one_byte_per_small_gap():
+    assert len(encode_postings(range(1000))) == 1000
+    assert len(encode_postings([0, 128])) == 3  # the second gap needs two bytes
+
+
+def test_not_binds_tighter_than_and_tighter_than_or():
+    assert parse_query("a OR b AND NOT c") == ("or", ("term", "a"), ("and", ("term", "b"), ("not", ("term", "c"))))
+    assert parse_query("(a OR b) AND c") == ("and", ("or", ("term", "a"), ("term", "b")), ("term", "c"))
+    assert parse_query("NOT NOT a") == ("not", ("not", ("term", "a")))
+
+
+def test_bare_words_form_a_phrase_and_other_operands_are_anded():
+    assert parse_query("Machine   Learning") == ("term", "machine learning")
+    assert parse_query('"deep learning" python') == ("and", ("term", "deep learning"), ("term", "python"))
+    assert parse_query("aws (python OR go)") == ("and", ("term", "aws"), ("or", ("term", "python"), ("term", "go")))
+    assert parse_query("machine learning AND aws") == ("and", ("term", "machine learning"), ("term", "aws"))
+
+
+@pytest.mark.parametrize("query", ["", "   ", "AND", "python AND", "(python", "python)", "NOT"])
+def test_malformed_queries_raise(query):
+    with pytest.raises(QueryError):
+        parse_query(query)
+
+
+def build_index(directory):
+    index = SkillIndex(str(directory), compact_after=0)
+    index.add_many([
+        ("a", ["python", "aws", "docker"], "a.pdf", "ENGINEERING"),
+        ("b", ["python", "gcp"], "b.pdf", "ENGINEERING"),
+        ("c", ["java", "aws"], "c.pdf", "ENGINEERING"),
+        ("d", ["python", "aws", "machine learning"], "d.pdf", "DATA-SCIENCE"),
+        ("e", ["excel"], "e.pdf", "ACCOUNTANT"),
+    ])
+    return index
+
+
+def keys(result):
+    return [r["key"] for r in result["results"]]
+
+
+def test_search_is_the_same_before_and_after_compaction(tmp_path):
+    index = build_index(tmp_path)
+    queries = ["python AND (aws OR gcp) AND NOT java", "aws", "machine learning", "NOT python", "rust"]
+    before = [index.search(q) for q in queries]
+    index.compact()
+    assert index.stats()["pending_documents"] == 0
+    assert [index.search(q) for q in queries] == before
+    # Another process opening the directory sees the compacted segment
+    assert [SkillIndex(str(tmp_path)).search(q) for q in queries] == before
+
+
+def test_search_ranks_rarer_matches_higher(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    result = index.search("python AND (aws OR gcp) AND NOT java")
+    assert result["total"] == 3
+    assert sorted(keys(result)) == ["a", "b", "d"]
+    # gcp is in one resume and aws in three, so matching gcp counts for more
+    assert keys(result)[0] == "b"
+    assert result["results"][0]["matched"] == ["python", "gcp"]
+    assert index.search("rust") == {"total": 0, "results": []}
+
+
+def test_category_filter_and_paging(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    assert sorted(keys(index.search("python", categories=["DATA-SCIENCE"]))) == ["d"]
+    everything = keys(index.search("NOT rust", limit=10))
+    assert len(everything) == 5
+    assert keys(index.search("NOT rust", limit=2, offset=2)) == everything[2:4]
+
+
+def test_re_adding_a_key_replaces_it_across_compaction(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    index.add("c", ["rust"], "c-v2.pdf", "ENGINEERING")
+    assert "c" not in keys(index.search("java"))
+    assert keys(index.search("rust")) == ["c"]
+    index.compact()
+    assert index.search("java")["total"] == 0
+    assert index.search("rust")["results"][0]["name"] == "c-v2.pdf"
+    assert index.stats()["documents"] == 5
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from process_corpus import ShardWriter, iter_corpus_records
+from skill_matrix import KIND_COMPREHEND, KIND_RULE, RECORD_COLUMNS, SkillMatrix
+
+pytest.importorskip("pyarrow")
+
+
+def record(doc_id, category, skills, entities=(), error=None):
+    return {"doc_id": doc_id, "category": category, "source": f"{doc_id}.pdf", "content_sha256": f"sha-{doc_id}",
+            "rule_based_skills": list(skills), "comprehend_entities": json.dumps(list(entities)),
+            "error": error, "extracted_text": "the whole document " * 20}
+
+
+def write_shards(out_dir, *shards):
+    writer = ShardWriter(str(out_dir), shard_size=100, fmt="parquet")
+    for records in shards:
+        for r in records:
+            writer.add(r)
+        writer.flush()
+    writer.close()
+
+
+def test_parquet_shards_are_read_only_for_the_matrix_columns(tmp_path):
+    write_shards(tmp_path, [record("IT/1.pdf", "IT", ["Python"]), record("IT/2.pdf", "IT", [], error="boom")])
+
+    records = [r for _, r in iter_corpus_records(str(tmp_path), columns=RECORD_COLUMNS)]
+
+    assert len(records) == 1
+    assert set(records[0]) == {*RECORD_COLUMNS, "error"}
+
+
+def test_build_save_and_load_with_a_reprocessed_document(tmp_path):
+    out = tmp_path / "run"
+    write_shards(out,
+                 [record("IT/1.pdf", "IT", ["Python", "SQL"],
+                         [{"Text": "Jane Doe", "Type": "PERSON"}, {"Text": "AWS", "Type": "COMMERCIAL_ITEM"}]),
+                  record("HR/2.pdf", "HR", ["Python"], [{"Text": "python", "Type": "OTHER"}])],
+                 # IT/1.pdf again, re-processed: its new row replaces the old one
+                 [record("IT/1.pdf", "IT", ["Python", "Docker"])])
+    skills = SkillMatrix()
+
+    assert skills.ingest(str(out)) == 3
+    path = str(tmp_path / "skills.npz")
+    skills.save(path)
+    loaded = SkillMatrix.load(path)
+
+    assert loaded.matrix.shape == (2, 4)
+    assert loaded.doc_ids == ["HR/2.pdf", "IT/1.pdf"]
+    assert loaded.categories == ["IT", "HR"]
+    # SQL and AWS stay in the vocabulary, though only the dropped row had them
+    assert loaded.terms == ["python", "sql", "aws", "docker"]
+    assert dict(zip(loaded.terms, loaded.term_kind.tolist())) == {
+        "python": KIND_RULE | KIND_COMPREHEND, "sql": KIND_RULE, "aws": KIND_COMPREHEND, "docker": KIND_RULE}
+    assert loaded.shards == {"part-00000.parquet", "part-00001.parquet"}
+    terms, counts = loaded.cooccurrence(["python", "docker", "sql"])
+    assert terms == ["python", "docker", "sql"]
+    np.testing.assert_array_equal(counts, [[2, 1, 0], [1, 1, 0], [0, 0, 0]])
+    assert (loaded.matrix != skills.matrix).nnz == 0
+
+    # Only shards written since the last build are read
+    assert loaded.ingest(str(out)) == 0
+    write_shards(out, [record("HR/3.pdf", "HR", ["Docker"])])
+    assert loaded.ingest(str(out)) == 1
+    assert loaded.frequencies("HR") == [("python", 1, 0.5), ("docker", 1, 0.5)]
@@ -0,0 +1,121 @@
+import time
+import threading
+
+from botocore.exceptions import ClientError
+
+from textract_poller import InMemoryNotificationChannel, TextractPoller
+
+
+class FakeTextract:
+    """Answers status checks from a script of responses; the last one repeats."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.polled_at = []
+
+    def get_document_text_detection(self, JobId, MaxResults):
+        self.polled_at.append(time.time())
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return {"JobStatus": response}
+
+
+def throttled():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                       "GetDocumentTextDetection")
+
+
+def wait_in_background(poller, job_id, timeout=10):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.setdefault("succeeded", poller.wait(job_id, timeout=timeout)))
+    thread.start()
+    while job_id not in poller._waiters:
+        time.sleep(0.005)
+    return thread, outcome
+
+
+# --- Notifications ---
+def test_notifications_complete_jobs_without_polling():
+    channel = InMemoryNotificationChannel()
+    textract = FakeTextract("IN_PROGRESS")
+    poller = TextractPoller(textract, notification_channel=channel, fallback_delay=60)
+    thread, outcome = wait_in_background(poller, "job-1")
+
+    channel.publish("job-1", "SUCCEEDED")
+    thread.join(5)
+
+    assert outcome == {"succeeded": True}
+    assert textract.polled_at == []
+    assert poller.snapshot()["notifications"] == 1
+
+
+def test_completions_for_unknown_jobs_are_held_until_they_are_waited_on():
+    channel = InMemoryNotificationChannel()
+    channel.publish("early", "SUCCEEDED")
+    channel.publish("other", "FAILED")
+
+    assert channel.receive(wait_seconds=0.01, known_job_ids={"other"}) == [("other", "FAILED")]
+    assert channel.receive(wait_seconds=0.01, known_job_ids={"other"}) == []
+    assert channel.receive(wait_seconds=0.01, known_job_ids={"early"}) == [("early", "SUCCEEDED")]
+
+
+def test_a_job_finishing_before_its_waiter_registers_is_not_left_to_the_fallback_poll():
+    channel = InMemoryNotificationChannel()
+    textract = FakeTextract("IN_PROGRESS")
+    poller = TextractPoller(textract, notification_channel=channel, fallback_delay=60)
+    thread, _ = wait_in_background(poller, "slow")
+    # Published while only 'slow' is waited on: the poller drains it from the channel
+    channel.publish("fast", "SUCCEEDED")
+    time.sleep(1.5)
+
+    start = time.time()
+    assert poller.wait("fast", timeout=10) is True
+    assert time.time() - start < 5
+    assert textract.polled_at == []
+    channel.publish("slow", "SUCCEEDED")
+    thread.join(5)
+
+
+# --- Polling ---
+def test_throttled_polls_back_off_and_the_job_still_completes():
+    textract = FakeTextract(throttled(), throttled(), "SUCCEEDED")
+    poller = TextractPoller(textract, min_delay=0.05, max_delay=0.2, initial_seconds_per_page=0.01)
+
+    assert poller.wait("job-1", timeout=10) is True
+
+    assert poller.snapshot()["throttled"] == 2
+    assert poller.snapshot()["polls"] == 3
+    gaps = [later - earlier for earlier, later in zip(textract.polled_at, textract.polled_at[1:])]
+    # A throttled poll doubles the wait before the next one
+    assert all(gap >= 2 * 0.05 - 0.01 for gap in gaps)
+
+
+def test_failed_status_checks_fail_only_their_job():
+    textract = FakeTextract(RuntimeError("connection reset"))
+    poller = TextractPoller(textract, min_delay=0.01, initial_seconds_per_page=0.01)
+    assert poller.wait("job-1", timeout=5) is False
+    textract.responses = ["SUCCEEDED"]
+    assert poller.wait("job-2", timeout=5) is True
+
+
+def test_poller_thread_survives_an_exception():
+    class BrokenOnceChannel(InMemoryNotificationChannel):
+        calls = 0
+
+        def receive(self, wait_seconds=1.0, known_job_ids=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("channel hiccup")
+            return super().receive(wait_seconds, known_job_ids)
+
+    channel = BrokenOnceChannel()
+    poller = TextractPoller(FakeTextract("IN_PROGRESS"), min_delay=0.01, notification_channel=channel,
+                            fallback_delay=60)
+    thread, outcome = wait_in_background(poller, "job-1")
+    channel.publish("job-1", "SUCCEEDED")
+    thread.join(5)
+
+    assert outcome == {"succeeded": True}
+    assert channel.calls >= 2
+    assert poller._thread.is_alive()